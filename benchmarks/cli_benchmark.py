@@ -0,0 +1,293 @@
+"""
+End-to-end benchmark of the CLI commands against a local stand-in for the MBTA API (test/fake_mbta_server.py) with
+simulated network latency, over the small test system, synthetic networks scaled up to thousands of routes and stops,
+and optionally responses recorded from the real API.
+
+For every network it measures:
+    * cold and warm wall time of question-1, question-2 and find-path (question 3)
+    * time to build the route-level and stop-level graphs
+    * find-path query throughput, by routes and by stops
+
+Results are compared with benchmarks/baseline.json and any metric more than --tolerance worse is flagged as a
+regression (exit code 1). Timings are machine dependent, so refresh the baseline on the machine you compare on.
+
+To record responses from the real API, run any command with a cache directory, then replay it here e.g.
+    python src/main.py --refresh --cache-dir recorded question-2
+    python benchmarks/cli_benchmark.py --replay recorded
+
+Usage (from the root of the repo):
+    python benchmarks/cli_benchmark.py [--latency-ms 20] [--networks small,100x20,1000x20] [--update-baseline]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "test"))
+
+import main as cli  # noqa: E402
+import mbta_client  # noqa: E402
+import path_finding  # noqa: E402
+from fake_mbta_server import (  # noqa: E402
+    SMALL_SYSTEM_ROUTES,
+    SMALL_SYSTEM_STOPS,
+    FakeMbtaServer,
+    FakeMbtaSystem,
+)
+from snapshot_cache import SnapshotCache, SnapshotUnavailableError  # noqa: E402
+from stop_routing import StopGraph  # noqa: E402
+from transit_graph import TransitGraph  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_NETWORKS = "small,100x20,1000x20"
+QUERIES = 1000
+QUERY_SECONDS = 0.5
+ROUNDS = 3
+
+# metrics where bigger is better, everything else is a duration
+THROUGHPUT_UNIT = "queries/s"
+# durations can also get this much slower before being flagged, so sub-millisecond (warm) timings aren't just noise
+NOISE_FLOOR_MS = 1.0
+
+
+def synthetic_system(
+    route_count: int, stops_per_route: int, seed: int = 0
+) -> FakeMbtaSystem:
+    """
+    Builds a connected network where most stops belong to a single route, like a real one.
+    Every route starts at a stop of an earlier route, and ~10% of the rest of its stops are shared with other routes.
+    :param route_count: number of routes
+    :param stops_per_route: stops on each route
+    :param seed: seed for the random choices, so networks are reproducible
+    :return: the system
+    """
+    rng = random.Random(seed)
+    stop_ids: list[str] = []
+    routes: dict[str, tuple[str, list[list[str]]]] = {}
+
+    def new_stop() -> str:
+        stop_ids.append(f"stop-{len(stop_ids)}")
+        return stop_ids[-1]
+
+    for i in range(route_count):
+        sequence = [rng.choice(stop_ids) if stop_ids else new_stop()]
+        while len(sequence) < stops_per_route:
+            stop_id = rng.choice(stop_ids) if rng.random() < 0.1 else new_stop()
+            if stop_id not in sequence:
+                sequence.append(stop_id)
+        routes[f"route-{i}"] = (f"Route {i:05d}", [sequence])
+    return FakeMbtaSystem(routes, {s: f"Stop {s[5:]}" for s in stop_ids})
+
+
+class RecordedMbtaSystem:
+    """Replays responses recorded from the real API, as snapshots in a snapshot cache directory."""
+
+    def __init__(self, directory: Path | str):
+        self._snapshots = SnapshotCache(directory, offline=True)
+
+    def document_for(self, path: str, params: dict[str, str]) -> dict | None:
+        # pages are cut from the whole recorded document
+        params = {k: v for k, v in params.items() if not k.startswith("page[")}
+        try:
+            return self._snapshots.load(SnapshotCache.key_for(path, params))
+        except SnapshotUnavailableError:
+            return None
+
+
+def _network(name: str, replay: str | None) -> FakeMbtaSystem | RecordedMbtaSystem:
+    if name == "small":
+        return FakeMbtaSystem(SMALL_SYSTEM_ROUTES, SMALL_SYSTEM_STOPS)
+    if name == "recorded":
+        return RecordedMbtaSystem(replay)
+    route_count, stops_per_route = name.split("x")
+    return synthetic_system(int(route_count), int(stops_per_route))
+
+
+def _clear_caches() -> None:
+    mbta_client.clear_caches()
+    path_finding.get_subway_transit_graph.cache_clear()
+    path_finding.get_subway_stop_graph.cache_clear()
+
+
+def _time(func: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    return (time.perf_counter() - start) * 1000
+
+
+def _throughput(query: Callable[[str, str], object], pairs: list) -> float:
+    # best of a few rounds, each cycling through the pairs for QUERY_SECONDS
+    best = 0.0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        elapsed = 0.0
+        for count, (start_id, end_id) in enumerate(itertools.cycle(pairs), start=1):
+            query(start_id, end_id)
+            elapsed = time.perf_counter() - start
+            if elapsed > QUERY_SECONDS:
+                break
+        best = max(best, count / elapsed)
+    return best
+
+
+def benchmark_network(seed: int = 0) -> dict[str, dict]:
+    """
+    Runs every measurement against the network mbta_client is pointed at.
+    :param seed: seed for picking the stops to query
+    :return: mapping of metric name to {"value", "unit"}
+    """
+    metrics = {}
+
+    def record(name: str, value: float, unit: str = "ms") -> None:
+        metrics[name] = {"value": round(value, 3), "unit": unit}
+
+    stops = mbta_client.get_subway_stops()
+    rng = random.Random(seed)
+    start_name, end_name = (s.name for s in rng.sample(stops, 2))
+    # parsed like the CLI's so options added later get their defaults
+    _, find_path_args = cli.parse_args(
+        ["find-path", "--start", start_name, "--end", end_name]
+    )
+    _clear_caches()
+
+    commands = {
+        "question_1": cli.question_1,
+        "question_2": cli.question_2,
+        "question_3": lambda: cli.question_3(find_path_args),
+    }
+    for name, command in commands.items():
+        _clear_caches()
+        record(f"{name}.cold", _time(command))
+        record(f"{name}.warm", _time(command))
+
+    mapping = mbta_client.get_subway_stop_to_routes_mapping()
+    patterns = mbta_client.get_subway_route_patterns()
+    routes = mbta_client.get_subway_routes()
+
+    graph = None
+
+    def build_transit_graph() -> None:
+        nonlocal graph
+        graph = TransitGraph.from_stop_to_routes_mapping(mapping)
+        graph.precompute_transfers()
+
+    record("transit_graph.build", _time(build_transit_graph))
+    stop_graph = None
+
+    def build_stop_graph() -> None:
+        nonlocal stop_graph
+        stop_graph = StopGraph(routes, stops, patterns)
+
+    record("stop_graph.build", _time(build_stop_graph))
+
+    stop_ids = [s.id for s in mapping]
+    pairs = [tuple(rng.sample(stop_ids, 2)) for _ in range(QUERIES)]
+    record(
+        "find_path.routes",
+        _throughput(lambda a, b: graph.find_path(a, b), pairs),
+        THROUGHPUT_UNIT,
+    )
+    record(
+        "find_path.stops",
+        _throughput(lambda a, b: stop_graph.find_itinerary([a], [b]), pairs),
+        THROUGHPUT_UNIT,
+    )
+    return metrics
+
+
+def find_regressions(
+    results: dict[str, dict], baseline: dict[str, dict], tolerance: float
+) -> list[str]:
+    """
+    :param results: network name -> metric name -> {"value", "unit"}
+    :param baseline: the same, as previously stored
+    :param tolerance: fraction a metric can get worse by before it's a regression e.g. 0.5
+    :return: descriptions of the regressions
+    """
+    regressions = []
+    for network, metrics in results.items():
+        for name, metric in metrics.items():
+            expected = baseline.get(network, {}).get(name)
+            if expected is None:
+                continue
+            if metric["unit"] == THROUGHPUT_UNIT:
+                regressed = metric["value"] < expected["value"] / (1 + tolerance)
+            else:
+                regressed = (
+                    metric["value"]
+                    > expected["value"] * (1 + tolerance) + NOISE_FLOOR_MS
+                )
+            if regressed:
+                regressions.append(
+                    f"{network} {name}: {metric['value']:,.1f} {metric['unit']} "
+                    f"(baseline {expected['value']:,.1f})"
+                )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument(
+        "--networks",
+        default=DEFAULT_NETWORKS,
+        help="Comma separated: 'small', ROUTESxSTOPS for a synthetic network (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="DIR",
+        help="Also benchmark the responses recorded in this snapshot cache directory",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store these results as the new baseline instead of comparing with it",
+    )
+    args = parser.parse_args()
+
+    networks = args.networks.split(",") + (["recorded"] if args.replay else [])
+    mbta_client.configure_snapshot_cache(None)  # every cold run goes to the server
+
+    results = {}
+    for name in networks:
+        with FakeMbtaServer(
+            _network(name, args.replay), latency=args.latency_ms / 1000
+        ) as server:
+            mbta_client.MBTA_API_BASE_URL = server.url
+            _clear_caches()
+            results[name] = benchmark_network()
+
+        print(f"\n{name}")
+        for metric, result in results[name].items():
+            print(f"  {metric:<22} {result['value']:>12,.1f} {result['unit']}")
+
+    if args.update_baseline:
+        BASELINE_PATH.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nBaseline written to {BASELINE_PATH}")
+        return
+
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    regressions = find_regressions(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nRegressions (more than {args.tolerance:.0%} worse than baseline):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Compares the cold-start wall time of fetching the stops of every route one after another versus with the
+bounded fan-out in fetch_engine, as the number of routes grows. Network latency is simulated with a sleep
+so the numbers are repeatable and don't touch the real API.
+
+Usage (from the root of the repo):
+    python benchmarks/fan_out_benchmark.py [--latency-ms 80] [--max-concurrency 8]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from fetch_engine import DEFAULT_MAX_CONCURRENCY, fetch_concurrently  # noqa: E402
+
+ROUTE_COUNTS = [1, 4, 8, 16, 32, 64]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    def fetch(route_id: str) -> str:
+        time.sleep(args.latency_ms / 1000)
+        return route_id
+
+    print(f"{'Routes':>6} {'Sequential (s)':>15} {'Concurrent (s)':>15} {'Speedup':>8}")
+    for count in ROUTE_COUNTS:
+        route_ids = [f"route_{i}" for i in range(count)]
+
+        start = time.perf_counter()
+        for route_id in route_ids:
+            fetch(route_id)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fetch_concurrently(fetch, route_ids, max_concurrency=args.max_concurrency)
+        concurrent = time.perf_counter() - start
+
+        print(
+            f"{count:>6} {sequential:>15.3f} {concurrent:>15.3f} {sequential / concurrent:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
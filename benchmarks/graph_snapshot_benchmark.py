@@ -0,0 +1,103 @@
+"""
+Compares what every worker process pays to get a graph to query: building the transit graph from the stop to routes
+mapping, against mapping a graph snapshot written once. The Python heap allocated by each (with tracemalloc) is what
+every worker holds privately, the mapped pages of a snapshot are shared by every process mapping it.
+
+Usage (from the root of the repo):
+    python benchmarks/graph_snapshot_benchmark.py [--networks small,100x20,1000x20] [--queries 2000]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "test"))
+
+from cli_benchmark import _network  # noqa: E402
+from graph_snapshot import GraphSnapshot, write_snapshot  # noqa: E402
+from models import Route, Stop  # noqa: E402
+from transit_graph import TransitGraph  # noqa: E402
+
+
+def _measure(func: Callable[[], object]) -> tuple[object, float, int]:
+    """
+    :return: what the function returned, the milliseconds it took and the bytes it left allocated
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = (time.perf_counter() - start) * 1000
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, allocated
+
+
+def _queries_per_second(find_path: Callable[[str, str], object], pairs: list) -> float:
+    start = time.perf_counter()
+    for a, b in pairs:
+        find_path(a, b)
+    return len(pairs) / (time.perf_counter() - start)
+
+
+def benchmark_network(name: str, path: Path, queries: int, seed: int = 0) -> None:
+    system = _network(name, None)
+    stops = [Stop(id=s, name=stop_name) for s, stop_name in system.stops.items()]
+    stops_by_id = {s.id: s for s in stops}
+    stop_to_routes = {}
+    for route_id, (route_name, sequences) in system.routes.items():
+        route = Route(id=route_id, long_name=route_name)
+        for sequence in sequences:
+            for stop_id in sequence:
+                stop_to_routes.setdefault(stops_by_id[stop_id], set()).add(route)
+
+    graph, build_ms, graph_bytes = _measure(
+        lambda: TransitGraph.from_stop_to_routes_mapping(stop_to_routes)
+    )
+    start = time.perf_counter()
+    write_snapshot(path, graph, stops)
+    write_ms = (time.perf_counter() - start) * 1000
+    snapshot, open_ms, snapshot_bytes = _measure(lambda: GraphSnapshot(path))
+
+    rng = random.Random(seed)
+    pairs = [tuple(rng.sample(graph.stop_ids, 2)) for _ in range(queries)]
+
+    print(f"  {'snapshot size':<26} {path.stat().st_size / 1024:>12,.1f} KiB")
+    print(f"  {'write snapshot':<26} {write_ms:>12,.1f} ms")
+    print(
+        f"  {'build graph':<26} {build_ms:>12,.1f} ms {graph_bytes / 1024:>10,.1f} KiB"
+    )
+    print(
+        f"  {'open snapshot':<26} {open_ms:>12,.1f} ms {snapshot_bytes / 1024:>10,.1f} KiB"
+    )
+    print(
+        f"  {'graph queries':<26} {_queries_per_second(graph.find_path, pairs):>12,.0f} queries/s"
+    )
+    print(
+        f"  {'snapshot queries':<26} {_queries_per_second(snapshot.find_path, pairs):>12,.0f} queries/s"
+    )
+    snapshot.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--networks", default="small,100x20,1000x20")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.networks.split(","):
+            print(f"\n{name}")
+            benchmark_network(name, Path(directory) / f"{name}.bin", args.queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares the network analytics done over dicts of sets (transit_system_info, helpers, path_finding) with the same
+analytics on the NumPy incidence matrix (incidence.py), over synthetic networks of up to thousands of routes.
+Needs NumPy (pip install "mbta-challenge[analytics]").
+
+Usage (from the root of the repo):
+    python benchmarks/incidence_benchmark.py [--networks 100x20,1000x20,2000x40]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "test"))
+
+from bulk_loader import build_route_stop_mappings  # noqa: E402
+from cli_benchmark import synthetic_system  # noqa: E402
+from helpers import find_multi_value_items  # noqa: E402
+from incidence import IncidenceMatrix  # noqa: E402
+from models import Route, Stop  # noqa: E402
+from path_finding import build_adjacency_list  # noqa: E402
+from transit_system_info import find_longest_and_shortest_route  # noqa: E402
+
+
+def _time(func: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+
+def benchmark_network(route_count: int, stops_per_route: int) -> None:
+    system = synthetic_system(route_count, stops_per_route)
+    routes = [Route(id=r, long_name=name) for r, (name, _) in system.routes.items()]
+    stops = [Stop(id=s, name=name) for s, name in system.stops.items()]
+    sequences = {r: seqs for r, (_, seqs) in system.routes.items()}
+    route_to_stops, stop_to_routes = build_route_stop_mappings(routes, stops, sequences)
+
+    def with_dicts() -> None:
+        find_longest_and_shortest_route(route_to_stops)
+        find_multi_value_items(stop_to_routes)
+        build_adjacency_list(stop_to_routes)
+
+    matrix = None
+
+    def build() -> None:
+        nonlocal matrix
+        matrix = IncidenceMatrix(route_to_stops)
+
+    def with_matrix() -> None:
+        matrix.longest_and_shortest_route()
+        matrix.multi_route_stops()
+        matrix.route_adjacency()
+
+    print(f"  {'dicts of sets':<28} {_time(with_dicts):>10,.1f} ms")
+    print(f"  {'matrix build':<28} {_time(build):>10,.1f} ms")
+    print(f"  {'matrix analytics':<28} {_time(with_matrix):>10,.1f} ms")
+    print(f"  {'matrix components':<28} {_time(matrix.components):>10,.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--networks", default="100x20,1000x20,2000x40")
+    args = parser.parse_args()
+
+    for name in args.networks.split(","):
+        route_count, stops_per_route = name.split("x")
+        print(f"\n{name}")
+        benchmark_network(int(route_count), int(stops_per_route))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compares the parse, hash and memory costs of the slotted models in models.py against the frozen pydantic models
+they replaced, over a synthetic network of stop records.
+The pydantic side is skipped if pydantic isn't installed (pip install pydantic).
+
+Usage (from the root of the repo):
+    python benchmarks/models_benchmark.py [--records 20000]
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import models  # noqa: E402
+
+try:
+    from pydantic import BaseModel, ConfigDict
+except ImportError:
+    BaseModel = None
+
+
+def _pydantic_stop_class() -> type | None:
+    if BaseModel is None:
+        return None
+
+    # the model as it was before the switch to slotted classes
+    class PydanticStop(BaseModel):
+        model_config = ConfigDict(frozen=True)
+
+        id: str
+        name: str
+
+        @classmethod
+        def from_mbta_json(cls, data: dict):
+            try:
+                return cls(id=data["id"], name=data["attributes"]["name"])
+            except KeyError as e:
+                raise ValueError("Unexpected format returned from MBTA API") from e
+
+    return PydanticStop
+
+
+def _time(func: Callable[[], object], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _peak_memory(func: Callable[[], object]) -> int:
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=20_000)
+    args = parser.parse_args()
+
+    records = [
+        {"id": f"place-{i}", "attributes": {"name": f"Stop {i}"}}
+        for i in range(args.records)
+    ]
+
+    candidates = {"slotted": models.Stop}
+    pydantic_stop = _pydantic_stop_class()
+    if pydantic_stop is not None:
+        candidates["pydantic"] = pydantic_stop
+    else:
+        print("pydantic not installed, only measuring the slotted models\n")
+
+    def run_slotted_unvalidated() -> list:
+        models.set_validation(False)
+        try:
+            return [models.Stop.from_mbta_json(r) for r in records]
+        finally:
+            models.set_validation(True)
+
+    print(
+        f"{'Model':<22} {'Parse (ms)':>11} {'Hash into set (ms)':>19} {'Peak memory (KiB)':>18}"
+    )
+    rows = [
+        (name, lambda cls=cls: [cls.from_mbta_json(r) for r in records])
+        for name, cls in candidates.items()
+    ]
+    rows.append(("slotted, no validation", run_slotted_unvalidated))
+    for name, parse in rows:
+        instances = parse()
+        parse_seconds = _time(parse)
+        hash_seconds = _time(lambda: {s: None for s in instances})
+        peak = _peak_memory(parse)
+        print(
+            f"{name:<22} {parse_seconds * 1000:>11.1f} {hash_seconds * 1000:>19.1f} {peak / 1024:>18.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measures how long it takes to build the timetable of a GTFS feed and how many earliest-arrival (RAPTOR) queries per
+second it answers, over synthetic networks with a trip every few minutes all day.
+
+Usage (from the root of the repo):
+    python benchmarks/raptor_benchmark.py [--networks small,100x20] [--trips 120] [--queries 2000]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "test"))
+
+from cli_benchmark import _network  # noqa: E402
+from fake_gtfs_feed import FIRST_DEPARTURE_MINUTES, HEADWAY_MINUTES  # noqa: E402
+from fake_gtfs_feed import write_feed  # noqa: E402
+from gtfs_source import load_feed  # noqa: E402
+from raptor import Timetable  # noqa: E402
+
+
+def benchmark_feed(path: Path, trips: int, queries: int, seed: int = 0) -> None:
+    start = time.perf_counter()
+    network = load_feed(path, include_trips=True)
+    loaded = time.perf_counter()
+    timetable = Timetable(network.routes, network.stops, network.trips)
+    built = time.perf_counter()
+
+    rng = random.Random(seed)
+    stop_ids = [s.id for s in network.stops]
+    last_departure = FIRST_DEPARTURE_MINUTES + trips * HEADWAY_MINUTES
+    pairs = [
+        (
+            *rng.sample(stop_ids, 2),
+            rng.randrange(FIRST_DEPARTURE_MINUTES, last_departure) * 60,
+        )
+        for _ in range(queries)
+    ]
+    query_start = time.perf_counter()
+    found = sum(
+        bool(timetable.earliest_arrivals([a], [b], depart_at))
+        for a, b, depart_at in pairs
+    )
+    elapsed = time.perf_counter() - query_start
+
+    print(f"  {'trips':<22} {len(network.trips):>12,}")
+    print(f"  {'load feed':<22} {(loaded - start) * 1000:>12,.1f} ms")
+    print(f"  {'build timetable':<22} {(built - loaded) * 1000:>12,.1f} ms")
+    print(f"  {'queries':<22} {queries / elapsed:>12,.1f} queries/s")
+    print(f"  {'journeys found':<22} {found / queries:>12.0%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--networks", default="small,100x20")
+    parser.add_argument(
+        "--trips", type=int, default=120, help="Trips per pattern and direction"
+    )
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in args.networks.split(","):
+            path = write_feed(
+                _network(name, None), Path(directory) / f"{name}.zip", args.trips
+            )
+            print(f"\n{name}")
+            benchmark_feed(path, args.trips, args.queries)
+
+
+if __name__ == "__main__":
+    main()
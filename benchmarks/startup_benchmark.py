@@ -0,0 +1,90 @@
+"""
+Measures how long the CLI takes to answer question-1 from a warm snapshot cache, against how long the bare interpreter
+takes to start, and flags the difference going over a budget (exit code 1).
+The interpreter's own startup depends on the machine and the site-packages (.pth files etc.) installed, so the budget
+is on what the CLI adds on top of it: imports, argument parsing, reading the snapshot and printing the answer.
+
+Bytecode is written and used as normal, so the first run (which compiles the modules) is discarded.
+
+Usage (from the root of the repo):
+    python benchmarks/startup_benchmark.py [--runs 20] [--budget-ms 50]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "test"))
+
+import mbta_client  # noqa: E402
+from fake_mbta_server import (  # noqa: E402
+    SMALL_SYSTEM_ROUTES,
+    SMALL_SYSTEM_STOPS,
+    FakeMbtaServer,
+    FakeMbtaSystem,
+)
+from snapshot_cache import SnapshotCache  # noqa: E402
+
+DEFAULT_BUDGET_MS = 50.0
+
+
+def _median_ms(command: list[str], runs: int, env: dict[str, str]) -> float:
+    subprocess.run(command, cwd=ROOT / "src", env=env, capture_output=True)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            command, cwd=ROOT / "src", env=env, capture_output=True, check=True
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONDONTWRITEBYTECODE"}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        system = FakeMbtaSystem(SMALL_SYSTEM_ROUTES, SMALL_SYSTEM_STOPS)
+        with FakeMbtaServer(system) as server:
+            mbta_client.MBTA_API_BASE_URL = server.url
+            mbta_client.configure_snapshot_cache(SnapshotCache(cache_dir))
+            mbta_client.get_subway_routes()
+
+        interpreter = _median_ms([sys.executable, "-c", "pass"], args.runs, env)
+        cli = _median_ms(
+            [
+                sys.executable,
+                "main.py",
+                "--offline",
+                "--cache-dir",
+                cache_dir,
+                "question-1",
+            ],
+            args.runs,
+            env,
+        )
+
+    overhead = cli - interpreter
+    print(f"interpreter startup  {interpreter:8.1f} ms")
+    print(f"question-1 (warm)    {cli:8.1f} ms")
+    print(f"overhead             {overhead:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if overhead > args.budget_ms:
+        print("\nOver the startup budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Compares the peak memory and time of parsing stop responses of growing size into Stop models the old way
+(the whole body, then ``json.loads``, then the models) versus streaming them with json_stream.JsonApiStream.
+The models are counted rather than kept, as when they are folded straight into a mapping.
+
+Usage (from the root of the repo):
+    python benchmarks/streaming_benchmark.py [--chunk-kib 64]
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from json_stream import JsonApiStream  # noqa: E402
+from models import Stop  # noqa: E402
+
+STOP_COUNTS = [1_000, 10_000, 100_000]
+
+
+def _measure(func: Callable[[], int]) -> tuple[float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunk-kib", type=int, default=64)
+    args = parser.parse_args()
+    chunk_size = args.chunk_kib * 1024
+
+    print(
+        f"{'Stops':>7} {'Body (KiB)':>11} {'Whole (ms)':>11} {'Whole peak (KiB)':>17} "
+        f"{'Stream (ms)':>12} {'Stream peak (KiB)':>18}"
+    )
+    for count in STOP_COUNTS:
+        body = json.dumps(
+            {
+                "data": [
+                    {
+                        "type": "stop",
+                        "id": f"place-{i}",
+                        "attributes": {"name": f"Stop {i}"},
+                    }
+                    for i in range(count)
+                ]
+            }
+        ).encode()
+
+        # stands in for response.iter_content(), the body itself is not counted against either approach
+        def chunks() -> Iterator[bytes]:
+            for i in range(0, len(body), chunk_size):
+                yield body[i : i + chunk_size]
+
+        def parse_whole() -> int:
+            document = json.loads(b"".join(chunks()))
+            return len([Stop.from_mbta_json(item) for item in document["data"]])
+
+        def parse_streaming() -> int:
+            return sum(
+                1 for item in JsonApiStream(chunks()) if Stop.from_mbta_json(item)
+            )
+
+        whole_seconds, whole_peak = _measure(parse_whole)
+        stream_seconds, stream_peak = _measure(parse_streaming)
+        print(
+            f"{count:>7} {len(body) / 1024:>11.0f} {whole_seconds * 1000:>11.1f} {whole_peak / 1024:>17.0f} "
+            f"{stream_seconds * 1000:>12.1f} {stream_peak / 1024:>18.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from transit_graph import TransitGraph
+
+# the effects of the alerts that take stops out of service, other effects (delays, detours, ...) don't change the paths
+DISRUPTIVE_EFFECTS = frozenset({"SUSPENSION", "SHUTTLE"})
+
+DEFAULT_RECONNECT_SECONDS = 1.0
+DEFAULT_MAX_RECONNECT_SECONDS = 60.0
+
+
+def iter_server_sent_events(lines: Iterable[str]) -> Iterator[tuple[str, str]]:
+    """
+    Parses a server-sent event stream, as the lines come in.
+    :param lines: lines of the stream, without their line endings
+    :return: the type (``message`` if not given) and data of every event
+    """
+    event, data = "", []
+    for line in lines:
+        if not line:
+            if data:
+                yield event or "message", "\n".join(data)
+            event, data = "", []
+            continue
+        if line.startswith(":"):
+            continue  # a comment, e.g. to keep the connection alive
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+
+
+def _parse_time(value: str | None) -> float | None:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+class Disruption(NamedTuple):
+    """
+    An alert taking stops out of service, by id.
+    """
+
+    id: str
+    effect: str
+    routes: frozenset[str]  # routes suspended as a whole
+    route_stops: frozenset[tuple[str, str]]  # (route id, stop id) no longer served
+    stops: frozenset[str]  # stops closed on every route
+    # (start, end) timestamps, None for an open end. No periods means always
+    active_periods: tuple[tuple[float | None, float | None], ...]
+
+    @classmethod
+    def from_mbta_json(cls, data: dict) -> "Disruption | None":
+        """
+        :param data: an alert resource from the API
+        :return: the disruption, None if the alert doesn't take stops out of service
+        """
+        try:
+            attributes = data["attributes"]
+            if attributes["effect"] not in DISRUPTIVE_EFFECTS:
+                return None
+            routes, route_stops, stops = set(), set(), set()
+            for entity in attributes["informed_entity"]:
+                route_id, stop_id = entity.get("route"), entity.get("stop")
+                if route_id and stop_id:
+                    route_stops.add((route_id, stop_id))
+                elif route_id:
+                    routes.add(route_id)
+                elif stop_id:
+                    stops.add(stop_id)
+            active_periods = tuple(
+                (_parse_time(p.get("start")), _parse_time(p.get("end")))
+                for p in attributes.get("active_period") or ()
+            )
+            return cls(
+                id=data["id"],
+                effect=attributes["effect"],
+                routes=frozenset(routes),
+                route_stops=frozenset(route_stops),
+                stops=frozenset(stops),
+                active_periods=active_periods,
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError("Unexpected format returned from MBTA API") from e
+
+    def is_active(self, now: float) -> bool:
+        return not self.active_periods or any(
+            (start is None or start <= now) and (end is None or now < end)
+            for start, end in self.active_periods
+        )
+
+
+class DisruptionTracker:
+    """
+    Keeps the disruptions in effect from the events of the alerts stream. The stops they close are applied to a graph
+    with ``close_stops``, and kept by the caller along with that graph.
+    Events are handled one at a time, the disruptions are replaced as a whole so they can be read meanwhile.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        """
+        :param clock: wall clock (alerts have timestamps), injectable for testing
+        """
+        self._clock = clock
+        self.disruptions: dict[str, Disruption] = {}
+
+    def handle_event(self, event: str, data: str) -> bool:
+        """
+        :param event: type of the event: ``reset``, ``add``, ``update`` or ``remove``
+        :param data: JSON data of the event
+        :return: whether the disruptions changed
+        :raises ValueError: if the data isn't an alert (or list of alerts)
+        """
+        try:
+            payload = json.loads(data)
+        except ValueError as e:
+            raise ValueError("Unexpected format returned from MBTA API") from e
+
+        disruptions = {} if event == "reset" else dict(self.disruptions)
+        if event == "reset":
+            for alert in payload:
+                self._put(disruptions, alert)
+        elif event in ("add", "update"):
+            self._put(disruptions, payload)
+        elif event == "remove":
+            if not isinstance(payload, dict) or not isinstance(payload.get("id"), str):
+                raise ValueError("Unexpected format returned from MBTA API")
+            disruptions.pop(payload["id"], None)
+        changed = disruptions != self.disruptions
+        self.disruptions = disruptions
+        return changed
+
+    @staticmethod
+    def _put(disruptions: dict[str, Disruption], alert: dict) -> None:
+        disruption = Disruption.from_mbta_json(alert)
+        if disruption is None:
+            # e.g. a suspension updated into a delay
+            disruptions.pop(alert.get("id"), None)
+        else:
+            disruptions[disruption.id] = disruption
+
+    def closures(self, route_stop_ids: dict[str, set[str]]) -> dict[str, set[str]]:
+        """
+        :param route_stop_ids: the stops of every route as loaded, by route id
+        :return: the stops closed by the disruptions in effect now, by route id
+        """
+        now = self._clock()
+        closed = defaultdict(set)
+        for disruption in self.disruptions.values():
+            if not disruption.is_active(now):
+                continue
+            for route_id in disruption.routes:
+                closed[route_id] |= route_stop_ids.get(route_id, set())
+            for route_id, stop_id in disruption.route_stops:
+                if stop_id in route_stop_ids.get(route_id, ()):
+                    closed[route_id].add(stop_id)
+            if disruption.stops:
+                for route_id, stop_ids in route_stop_ids.items():
+                    closed[route_id] |= stop_ids & disruption.stops
+        return {route_id: stops for route_id, stops in closed.items() if stops}
+
+    def seconds_to_next_change(self) -> float | None:
+        """
+        :return: seconds until one of the disruptions starts or ends, by the tracker's clock, None if none will. No
+            event comes in then, so the closures are applied again
+        """
+        now = self._clock()
+        changes = [
+            t
+            for disruption in self.disruptions.values()
+            for period in disruption.active_periods
+            for t in period
+            if t is not None and t > now
+        ]
+        return min(changes) - now if changes else None
+
+    def summary(self, closed_stops: dict[str, set[str]]) -> dict:
+        """
+        :param closed_stops: the stops closed on the graph, by route id
+        :return: JSON serializable description of the disruptions and the stops they close
+        """
+        return {
+            "disruptions": {
+                d.id: d.effect for _, d in sorted(self.disruptions.items())
+            },
+            "closed_stops": {
+                route_id: sorted(stops)
+                for route_id, stops in sorted(closed_stops.items())
+            },
+        }
+
+
+def close_stops(
+    graph: TransitGraph, before: dict[str, set[str]], after: dict[str, set[str]]
+) -> list[str]:
+    """
+    Closes the stops newly closed on the graph and reopens those no longer closed, only touching what changed.
+    e.g. ``close_stops(graph, closed, {})`` reopens every closed stop, before the graph is brought up to date with a
+    reload of the system.
+    :param graph: the graph
+    :param before: the stops closed on the graph, by route id
+    :param after: the stops to close, by route id, from ``DisruptionTracker.closures``
+    :return: ids of the routes whose adjacent routes changed
+    """
+    changes = {}
+    for route_id in before.keys() | after.keys():
+        closed_before = before.get(route_id, set())
+        closed_after = after.get(route_id, set())
+        if closed_before != closed_after:
+            changes[route_id] = (
+                closed_before - closed_after,
+                closed_after - closed_before,
+            )
+    return graph.update_routes({}, (), changes) if changes else []
+
+
+class AlertSubscriber:
+    """
+    Follows the alerts stream on a background thread, handing every event to a callback. Reconnects when the stream
+    drops, backing off while it keeps failing. Every connection starts with a ``reset`` of all the alerts, so nothing
+    missed while disconnected is lost.
+    """
+
+    def __init__(
+        self,
+        on_event: Callable[[str, str], None],
+        open_stream: Callable[[], Iterator[tuple[str, str]]] | None = None,
+        reconnect_seconds: float = DEFAULT_RECONNECT_SECONDS,
+        max_reconnect_seconds: float = DEFAULT_MAX_RECONNECT_SECONDS,
+    ):
+        """
+        :param on_event: called with the type and data of every event, from the subscriber's thread
+        :param open_stream: connects to the stream, ``mbta_client.iter_subway_alert_events`` by default
+        :param reconnect_seconds: wait before reconnecting, doubled after every failed connection
+        :param max_reconnect_seconds: cap on the wait before reconnecting
+        """
+        if open_stream is None:
+            from mbta_client import iter_subway_alert_events
+
+            open_stream = iter_subway_alert_events
+        self._on_event = on_event
+        self._open_stream = open_stream
+        self.reconnect_seconds = reconnect_seconds
+        self.max_reconnect_seconds = max_reconnect_seconds
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _follow(self) -> None:
+        delay = self.reconnect_seconds
+        while not self._stopping.is_set():
+            try:
+                for event, data in self._open_stream():
+                    if self._stopping.is_set():
+                        return
+                    delay = self.reconnect_seconds
+                    try:
+                        self._on_event(event, data)
+                    except ValueError as e:
+                        print(f"Ignoring an alert event: {e}", file=sys.stderr)
+            except Exception as e:
+                print(f"Lost the alerts stream: {e}", file=sys.stderr)
+            if self._stopping.wait(delay):
+                return
+            delay = min(delay * 2, self.max_reconnect_seconds)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._follow, name="alerts", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops following the stream once the next event (or the end of the connection) comes in.
+        """
+        self._stopping.set()
@@ -0,0 +1,89 @@
+import json
+import time
+from typing import Iterable, TextIO
+
+from stop_name_index import StopNameIndex, UnknownStopError
+from transit_graph import TransitGraph
+
+
+def parse_pair(line: str) -> tuple[str, str]:
+    """
+    Parses one line of batch input, either a JSON object with "start" and "end" or "start<TAB>end".
+    :param line: line of input
+    :return: tuple of the start and end stop names
+    """
+    if line.lstrip().startswith("{"):
+        error = 'Expected a JSON object with "start" and "end" stop names'
+        try:
+            pair = json.loads(line)
+        except ValueError as e:
+            raise ValueError(error) from e
+        names = (pair.get("start"), pair.get("end"))
+        # e.g. null or a number isn't a name
+        if not all(isinstance(name, str) and name.strip() for name in names):
+            raise ValueError(error)
+        return names
+
+    parts = line.rstrip("\r\n").split("\t")
+    if len(parts) != 2:
+        raise ValueError("Expected a start and end stop name separated by a tab")
+    return parts[0], parts[1]
+
+
+def find_path_for_line(
+    line: str, name_index: StopNameIndex, graph: TransitGraph
+) -> dict:
+    """
+    Answers a single batch line. Problems with the line are reported in the result rather than raised.
+    :param line: line of input
+    :param name_index: index to resolve the stop names with
+    :param graph: graph to find the path with
+    :return: JSON serializable result for the line
+    """
+    try:
+        start_name, end_name = parse_pair(line)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    result = {"start": start_name, "end": end_name}
+    try:
+        start_ids, end_ids = name_index.resolve_pair(start_name, end_name)
+    except UnknownStopError as e:
+        result["error"] = str(e)
+        result["suggestions"] = e.suggestions
+        return result
+
+    try:
+        result["path"] = graph.find_path_between(start_ids, end_ids)
+    except ValueError as e:
+        result["error"] = str(e)
+    return result
+
+
+def run_batch(
+    lines: Iterable[str],
+    output: TextIO,
+    name_index: StopNameIndex,
+    graph: TransitGraph,
+) -> tuple[int, float]:
+    """
+    Finds the path for every origin/destination pair and streams the results as JSON lines, in input order.
+    Blank lines are skipped, each result carries the (1-based) line number it came from.
+    :param lines: lines of input
+    :param output: where to write the JSON lines to
+    :param name_index: index to resolve the stop names with, shared by every pair
+    :param graph: warm graph shared by every pair
+    :return: tuple of the number of pairs processed and the seconds it took
+    """
+    start_time = time.perf_counter()
+    count = 0
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+
+        result = {"line": line_number}
+        result.update(find_path_for_line(line, name_index, graph))
+        output.write(json.dumps(result) + "\n")
+        count += 1
+
+    return count, time.perf_counter() - start_time
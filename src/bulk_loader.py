@@ -0,0 +1,92 @@
+from collections import defaultdict
+from typing import Iterable
+
+from models import Route, RoutePattern, Stop
+
+
+def parse_route_patterns(document: dict) -> list[RoutePattern]:
+    """
+    Pulls the ordered stops of every route pattern out of a ``/route_patterns?include=representative_trip.stops`` document.
+    Trip stops are platforms, so they are resolved to their parent station to line up with the ids from ``/stops``.
+    :param document: JSON:API document with the route patterns as ``data`` and the trips + stops as ``included``
+    :return: the route patterns, in document order
+    """
+    try:
+        trips = {}
+        station_of_stop = {}
+        for item in document.get("included", []):
+            if item["type"] == "trip":
+                trips[item["id"]] = item
+            elif item["type"] == "stop":
+                parent = (
+                    item.get("relationships", {}).get("parent_station", {}).get("data")
+                )
+                station_of_stop[item["id"]] = parent["id"] if parent else item["id"]
+
+        patterns = []
+        for pattern in document["data"]:
+            relationships = pattern["relationships"]
+            route_id = relationships["route"]["data"]["id"]
+            trip = trips.get(relationships["representative_trip"]["data"]["id"])
+            if trip is None:
+                continue
+
+            sequence = []
+            for stop_ref in trip["relationships"]["stops"]["data"]:
+                station_id = station_of_stop.get(stop_ref["id"], stop_ref["id"])
+                # consecutive platforms of the same station collapse into one stop
+                if not sequence or sequence[-1] != station_id:
+                    sequence.append(station_id)
+            patterns.append(
+                RoutePattern(
+                    route_id=route_id,
+                    direction_id=pattern.get("attributes", {}).get("direction_id", 0),
+                    stop_ids=tuple(sequence),
+                )
+            )
+    except (KeyError, TypeError) as e:
+        raise ValueError("Unexpected format returned from MBTA API") from e
+
+    return patterns
+
+
+def route_stop_sequences(
+    patterns: Iterable[RoutePattern],
+) -> dict[str, list[list[str]]]:
+    """
+    :param patterns: route patterns e.g. from ``parse_route_patterns``
+    :return: mapping of route id to its stop id sequences, one per route pattern
+    """
+    sequences = defaultdict(list)
+    for pattern in patterns:
+        sequences[pattern.route_id].append(list(pattern.stop_ids))
+    return dict(sequences)
+
+
+def build_route_stop_mappings(
+    routes: list[Route],
+    stops: list[Stop],
+    sequences: dict[str, list[list[str]]],
+) -> tuple[dict[Route, set[Stop]], dict[Stop, set[Route]]]:
+    """
+    Builds both directions of the route <-> stop incidence in a single pass over the route patterns.
+    Stop ids that aren't in ``stops`` (e.g. non-subway stops) are ignored.
+    :param routes: the routes to build the mappings for
+    :param stops: all known stops
+    :param sequences: mapping of route id to its stop id sequences
+    :return: tuple of the route to stops mapping and the stop to routes mapping
+    """
+    stops_by_id = {s.id: s for s in stops}
+    route_to_stops = {}
+    stop_to_routes = defaultdict(set)
+    for route in routes:
+        route_stops = set()
+        for sequence in sequences.get(route.id, []):
+            for stop_id in sequence:
+                stop = stops_by_id.get(stop_id)
+                if stop is not None:
+                    route_stops.add(stop)
+                    stop_to_routes[stop].add(route)
+        route_to_stops[route] = route_stops
+
+    return route_to_stops, dict(stop_to_routes)
@@ -0,0 +1,292 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import update_wrapper
+from typing import Any, Callable, Hashable, NamedTuple
+
+# separates the positional from the keyword arguments in a cache key
+_KWARGS_MARK = object()
+
+# seconds a stale value is served without trying to refresh it again after a background refresh failed
+DEFAULT_REVALIDATION_COOLDOWN_SECONDS = 10.0
+
+
+class CacheInfo(NamedTuple):
+    hits: int  # including the stale values served while revalidating
+    misses: int
+    maxsize: int | None
+    currsize: int
+    # calls that waited on another caller's call instead of making their own
+    coalesced: int
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "revalidation_failed_at")
+
+    def __init__(self, value: Any, stored_at: float):
+        self.value = value
+        self.stored_at = stored_at
+        self.revalidation_failed_at: float | None = None
+
+
+class _Flight:
+    """
+    A call in progress, the callers of the same arguments wait on it instead of making their own.
+    """
+
+    def __init__(self, generation: int, replaces: "_Entry | None" = None):
+        self.generation = generation
+        # the expired entry the call refreshes, if any
+        self.replaces = replaces
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._callbacks: list[Callable[["_Flight"], None]] = []
+        self.value: Any = None
+        self.error: BaseException | None = None
+
+    def finish(self, value: Any = None, error: BaseException | None = None) -> None:
+        with self._lock:
+            self.value, self.error = value, error
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback: Callable[["_Flight"], None]) -> None:
+        """
+        :param callback: called with the flight once it finishes, from the thread that finished it (or now if it has)
+        """
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def result(self) -> Any:
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class CachedFunction:
+    """
+    A function wrapped by ``cached``. Call it as the function, or ``await`` ``call_async`` from a coroutine.
+    """
+
+    def __init__(
+        self,
+        function: Callable,
+        maxsize: int | None,
+        ttl: float | None,
+        stale_ttl: float,
+        clock: Callable[[], float],
+    ):
+        update_wrapper(self, function)
+        self._function = function
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.revalidation_cooldown = DEFAULT_REVALIDATION_COOLDOWN_SECONDS
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._flights: dict[Hashable, _Flight] = {}
+        # bumped by cache_clear so calls that were in flight don't store what they return
+        self._generation = 0
+        self._hits = self._misses = self._coalesced = 0
+        self._reload_callbacks: list[Callable[[], None]] = []
+
+    def __call__(self, *args, **kwargs) -> Any:
+        key = _make_key(args, kwargs)
+        value, flight, leads = self._lookup(key, args, kwargs)
+        if flight is None:
+            return value
+        if leads:
+            return self._run(key, flight, args, kwargs)
+        return flight.result()
+
+    async def call_async(self, *args, **kwargs) -> Any:
+        """
+        Calls the function from a coroutine without blocking the event loop: a call of its own runs in the loop's
+        default executor, and waiting on another caller's call takes no thread at all.
+        """
+        # imported here as only callers already running an event loop need it
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        key = _make_key(args, kwargs)
+        value, flight, leads = self._lookup(key, args, kwargs)
+        if flight is None:
+            return value
+        if leads:
+            return await loop.run_in_executor(
+                None, lambda: self._run(key, flight, args, kwargs)
+            )
+
+        waiter = loop.create_future()
+
+        def settle(finished: _Flight) -> None:
+            if waiter.cancelled():
+                return
+            if finished.error is not None:
+                waiter.set_exception(finished.error)
+            else:
+                waiter.set_result(finished.value)
+
+        flight.add_done_callback(lambda f: loop.call_soon_threadsafe(settle, f))
+        return await waiter
+
+    def _lookup(
+        self, key: Hashable, args: tuple, kwargs: dict
+    ) -> tuple[Any, _Flight | None, bool]:
+        """
+        :return: the cached value and no flight on a hit, else the flight to wait on and whether this caller makes it
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                now = self._clock()
+                age = now - entry.stored_at
+                if self.ttl is None or age < self.ttl:
+                    self._hits += 1
+                    self._entries.move_to_end(key)
+                    return entry.value, None, False
+                if age < self.ttl + self.stale_ttl:
+                    self._hits += 1
+                    self._entries.move_to_end(key)
+                    failed_at = entry.revalidation_failed_at
+                    if key not in self._flights and (
+                        failed_at is None
+                        or now - failed_at >= self.revalidation_cooldown
+                    ):
+                        self._revalidate(key, args, kwargs, entry)
+                    return entry.value, None, False
+                del self._entries[key]
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._coalesced += 1
+                return None, flight, False
+            self._misses += 1
+            flight = self._flights[key] = _Flight(self._generation, replaces=entry)
+            return None, flight, True
+
+    def _revalidate(
+        self, key: Hashable, args: tuple, kwargs: dict, entry: _Entry
+    ) -> None:
+        """
+        Refreshes a stale value in the background, the stale one is served until it's done. Called under the lock.
+        If the refresh fails, the stale value is served without trying again for ``revalidation_cooldown`` seconds,
+        so a failing call isn't made again (on a new thread) by every caller.
+        """
+        flight = self._flights[key] = _Flight(self._generation, replaces=entry)
+
+        def refresh() -> None:
+            try:
+                self._run(key, flight, args, kwargs)
+            except Exception:
+                # the stale value is kept, the next call after it expires makes the call again
+                with self._lock:
+                    entry.revalidation_failed_at = self._clock()
+
+        threading.Thread(target=refresh, name="cache-revalidate", daemon=True).start()
+
+    def _run(self, key: Hashable, flight: _Flight, args: tuple, kwargs: dict) -> Any:
+        try:
+            value = self._function(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.finish(error=e)
+            raise
+
+        reloaded = False
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if flight.generation == self._generation:
+                self._entries[key] = _Entry(value, self._clock())
+                self._entries.move_to_end(key)
+                if self.maxsize is not None and len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                reloaded = (
+                    flight.replaces is not None and flight.replaces.value != value
+                )
+            callbacks = list(self._reload_callbacks) if reloaded else []
+        for callback in callbacks:
+            callback()
+        flight.finish(value)
+        return value
+
+    def add_reload_callback(self, callback: Callable[[], None]) -> None:
+        """
+        :param callback: called once a value that expired is replaced by a different one (not on a first load), from
+            the thread that loaded it, e.g. to drop what was built from the old value
+        """
+        with self._lock:
+            self._reload_callbacks.append(callback)
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                self._hits,
+                self._misses,
+                self.maxsize,
+                len(self._entries),
+                self._coalesced,
+            )
+
+    def cache_clear(self) -> None:
+        """
+        Drops every value and resets the statistics. Calls in flight still answer their callers, but aren't cached.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._flights.clear()
+            self._generation += 1
+            self._hits = self._misses = self._coalesced = 0
+
+    def cache_invalidate(self, *args, **kwargs) -> bool:
+        """
+        Drops the value for some arguments, the next call with them makes the call again.
+        :return: whether there was a value (or a call in flight) for the arguments
+        """
+        key = _make_key(args, kwargs)
+        with self._lock:
+            flight = self._flights.pop(key, None)
+            if flight is not None:
+                # so it doesn't store what it returns, without affecting the other keys' calls
+                flight.generation = -1
+            return self._entries.pop(key, None) is not None or flight is not None
+
+
+def _make_key(args: tuple, kwargs: dict) -> Hashable:
+    if not kwargs:
+        return args
+    return (*args, _KWARGS_MARK, *sorted(kwargs.items()))
+
+
+def cached(
+    maxsize: int | None = 128,
+    ttl: float | None = None,
+    stale_ttl: float = 0.0,
+    clock: Callable[[], float] = time.monotonic,
+) -> Callable[[Callable], CachedFunction]:
+    """
+    Like ``functools.lru_cache``, for functions that are slow because they fetch something, and are called from several
+    threads (or tasks): concurrent calls with the same arguments share a single call instead of each making their own.
+    e.g. ``@cached(maxsize=1, ttl=3600, stale_ttl=60)``
+    :param maxsize: most values to keep, the least recently used is dropped first. None for no limit
+    :param ttl: seconds a value is fresh for, None for as long as it isn't dropped
+    :param stale_ttl: seconds after the ttl during which the stale value is still served while a single background
+        call refreshes it, so expiry doesn't make callers wait
+    :param clock: time source, injectable for testing
+    :return: decorator
+    """
+
+    def decorator(function: Callable) -> CachedFunction:
+        return CachedFunction(function, maxsize, ttl, stale_ttl, clock)
+
+    return decorator
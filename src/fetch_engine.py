@@ -0,0 +1,70 @@
+from typing import Callable, Hashable, Iterable, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+class FetchError(Exception):
+    """Raised when several keys of a fan-out fetch failed. Holds the error of each failed key."""
+
+    def __init__(self, errors: dict):
+        self.errors = errors
+        super().__init__(
+            f"Failed to fetch {len(errors)} item(s): {', '.join(map(str, errors))}"
+        )
+
+
+def fetch_concurrently(
+    fetch: Callable[[K], V],
+    keys: Iterable[K],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> dict[K, V]:
+    """
+    Calls ``fetch`` for every key using a bounded pool of threads (the work is I/O bound so the GIL isn't a concern).
+    :param fetch: function to fetch the value for a single key
+    :param keys: keys to fetch, duplicates are only fetched once
+    :param max_concurrency: upper bound on the number of in-flight fetches, keeps us under the API rate limits
+    :return: mapping of key to fetched value, in the same order as ``keys`` regardless of completion order
+    :raises Exception: the error of the fetch, after every fetch has finished, if only one of them failed
+    :raises FetchError: after every fetch has finished, if several of them failed
+    """
+    # imported here as it is slow to import and the CLI only needs it on a cold start
+    from concurrent.futures import ThreadPoolExecutor
+
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    unique_keys = list(dict.fromkeys(keys))
+    if not unique_keys:
+        return {}
+
+    results = {}
+    errors = {}
+    with ThreadPoolExecutor(
+        max_workers=min(max_concurrency, len(unique_keys))
+    ) as executor:
+        futures = [(key, executor.submit(fetch, key)) for key in unique_keys]
+        for key, future in futures:
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+
+    if len(errors) == 1:
+        # so callers can handle it as if they had made the call themselves
+        raise next(iter(errors.values()))
+    if errors:
+        raise FetchError(errors) from next(iter(errors.values()))
+    return results
+
+
+def failures(error: Exception) -> list[Exception]:
+    """
+    :param error: an error raised by ``fetch_concurrently`` (or any other call)
+    :return: the error of every failed key of a ``FetchError``, else just the error
+    """
+    if isinstance(error, FetchError):
+        return list(error.errors.values())
+    return [error]
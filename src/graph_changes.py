@@ -0,0 +1,138 @@
+from typing import Iterable, NamedTuple
+
+from models import Route, Stop
+from stop_name_index import StopNameIndex
+from transit_graph import TransitGraph
+
+
+class ChangeReport(NamedTuple):
+    """
+    What changed between two loads of the system, by id.
+    """
+
+    added_routes: dict[str, str]  # route id -> long name
+    removed_routes: dict[str, str]
+    renamed_routes: dict[str, tuple[str, str]]  # route id -> (old name, new name)
+    # route id -> (ids of the stops added to the route, ids of the stops removed from it), for routes in both loads
+    route_stops: dict[str, tuple[set[str], set[str]]]
+    added_stops: dict[str, Stop]  # stops no route served before
+    removed_stops: dict[str, Stop]  # stops no route serves any more
+    renamed_stops: dict[str, tuple[Stop, Stop]]  # stop id -> (old stop, new stop)
+
+    @property
+    def is_empty(self) -> bool:
+        return not any(self)
+
+    def summary(self) -> dict:
+        """
+        :return: JSON serializable description of the changes
+        """
+        return {
+            "added_routes": sorted(self.added_routes),
+            "removed_routes": sorted(self.removed_routes),
+            "renamed_routes": {
+                route_id: name
+                for route_id, (_, name) in sorted(self.renamed_routes.items())
+            },
+            "route_stops": {
+                route_id: {"added": sorted(added), "removed": sorted(removed)}
+                for route_id, (added, removed) in sorted(self.route_stops.items())
+            },
+            "added_stops": sorted(self.added_stops),
+            "removed_stops": sorted(self.removed_stops),
+            "renamed_stops": {
+                stop_id: new.name
+                for stop_id, (_, new) in sorted(self.renamed_stops.items())
+            },
+        }
+
+
+def diff_route_stops(
+    old: dict[Route, set[Stop]], new: dict[Route, set[Stop]]
+) -> ChangeReport:
+    """
+    Compares two route to stops mappings, e.g. from ``mbta_client.get_subway_route_to_stops_mapping`` before and after
+    reloading the system.
+    :param old: the mapping the held graph was built from
+    :param new: the freshly loaded mapping
+    :return: the changes from old to new
+    """
+    old_routes = {r.id: r for r in old}
+    new_routes = {r.id: r for r in new}
+    old_stops = {s.id: s for stops in old.values() for s in stops}
+    new_stops = {s.id: s for stops in new.values() for s in stops}
+
+    route_stops = {}
+    for route_id in old_routes.keys() & new_routes.keys():
+        before = {s.id for s in old[old_routes[route_id]]}
+        after = {s.id for s in new[new_routes[route_id]]}
+        if before != after:
+            route_stops[route_id] = (after - before, before - after)
+
+    return ChangeReport(
+        added_routes={
+            r: new_routes[r].long_name for r in new_routes.keys() - old_routes.keys()
+        },
+        removed_routes={
+            r: old_routes[r].long_name for r in old_routes.keys() - new_routes.keys()
+        },
+        renamed_routes={
+            r: (old_routes[r].long_name, new_routes[r].long_name)
+            for r in old_routes.keys() & new_routes.keys()
+            if old_routes[r].long_name != new_routes[r].long_name
+        },
+        route_stops=route_stops,
+        added_stops={s: new_stops[s] for s in new_stops.keys() - old_stops.keys()},
+        removed_stops={s: old_stops[s] for s in old_stops.keys() - new_stops.keys()},
+        renamed_stops={
+            s: (old_stops[s], new_stops[s])
+            for s in old_stops.keys() & new_stops.keys()
+            if old_stops[s].name != new_stops[s].name
+        },
+    )
+
+
+def apply_changes(
+    report: ChangeReport,
+    new: dict[Route, set[Stop]],
+    graph: TransitGraph,
+) -> list[str]:
+    """
+    Brings a graph built from the old mapping up to date with the new one in place, doing work in proportion to the
+    changes rather than to the size of the network.
+    :param report: the changes, from ``diff_route_stops``
+    :param new: the freshly loaded mapping
+    :param graph: the graph built from the old mapping (or updated to it)
+    :return: ids of the routes whose adjacent routes changed
+    """
+    route_stop_changes = dict(report.route_stops)
+    for route, stops in new.items():
+        if route.id in report.added_routes:
+            route_stop_changes[route.id] = ({s.id for s in stops}, set())
+
+    return graph.update_routes(
+        {
+            **report.added_routes,
+            **{r: name for r, (_, name) in report.renamed_routes.items()},
+        },
+        report.removed_routes,
+        route_stop_changes,
+    )
+
+
+def update_name_index(
+    name_index: StopNameIndex, old: Iterable[Stop], new: Iterable[Stop]
+) -> None:
+    """
+    Brings a name index built from the old stops up to date with the new ones in place, e.g. from
+    ``mbta_client.get_subway_stops`` before and after reloading the system, so it matches an index built from scratch.
+    A renamed stop is removed under its old name and added under the new one.
+    :param name_index: the name index built from the old stops (or updated to them)
+    :param old: the stops the index has
+    :param new: the freshly loaded stops
+    """
+    old, new = set(old), set(new)
+    for stop in sorted(old - new, key=lambda s: (s.id, s.name)):
+        name_index.remove_stop(stop)
+    for stop in sorted(new - old, key=lambda s: (s.id, s.name)):
+        name_index.add_stop(stop)
@@ -0,0 +1,481 @@
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Iterable, Sequence
+
+from models import Stop
+from stop_name_index import StopNameIndex, UnknownStopError, normalize_stop_name
+from transit_graph import TransitGraph, _bits
+
+MAGIC = b"MBTAGRPH"
+# Bump whenever the layout changes so old snapshots are rejected instead of misread
+FORMAT_VERSION = 1
+
+# magic, format version, generation, number of routes, stops and name keys
+_HEADER = struct.Struct("<8sIQIII")
+_SECTIONS = (
+    "strings_offsets",
+    "strings",
+    "stop_routes_offsets",
+    "stop_routes",
+    "route_adjacency_offsets",
+    "route_adjacency",
+    "key_stops_offsets",
+    "key_stops",
+)
+# offset and length of every section, after the header
+_SECTION = struct.Struct("<QQ")
+# sections start on 8 byte boundaries so they can be cast to arrays in place
+_ALIGNMENT = 8
+_TABLE_END = _HEADER.size + _SECTION.size * len(_SECTIONS)
+
+
+class SnapshotFormatError(ValueError):
+    """Raised when a file isn't a graph snapshot this version can read."""
+
+
+def _uint32(values: Iterable[int]) -> bytes:
+    values = array("I", values)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(
+    path: Path | str,
+    graph: TransitGraph,
+    stops: Iterable[Stop],
+    generation: int | None = None,
+) -> int:
+    """
+    Writes the graph and the stop names as a snapshot, to a temporary file first that is then renamed over ``path``,
+    so readers never see a partial snapshot and the ones mapping the previous file keep it until they swap.
+    The layout (all integers little endian uint32, unless stated otherwise):
+        * header - magic, format version, generation (uint64), number of routes, stops and name keys
+        * section table - offset and length (uint64) of each section, in the order of ``_SECTIONS``
+        * ``strings_offsets``/``strings`` - interned string table: route ids, route names, stop ids (sorted, like
+          the graph's), normalized name keys (sorted) and their display names, string ``i`` is the UTF-8 bytes
+          between offsets ``i`` and ``i + 1``
+        * ``stop_routes_offsets``/``stop_routes`` - CSR rows of the routes of every stop
+        * ``route_adjacency_offsets``/``route_adjacency`` - CSR rows of the routes sharing a stop with every route
+        * ``key_stops_offsets``/``key_stops`` - CSR rows of the stops of every name key
+    :param path: where to write the snapshot
+    :param graph: the graph to snapshot
+    :param stops: the stops, for their names
+    :param generation: increases with every snapshot written so readers can tell a newer one, defaults to the time
+    :return: the generation written
+    """
+    if generation is None:
+        generation = time.time_ns()
+
+    stop_index = graph.stop_index
+    key_stops: dict[str, list[int]] = {}
+    key_names: dict[str, str] = {}
+    for stop in stops:
+        if stop.id not in stop_index:
+            continue
+        key = normalize_stop_name(stop.name)
+        if stop_index[stop.id] not in key_stops.setdefault(key, []):
+            key_stops[key].append(stop_index[stop.id])
+        key_names.setdefault(key, stop.name)
+    keys = sorted(key_stops)
+
+    strings = [
+        s.encode()
+        for s in (
+            *graph.route_ids,
+            *graph.route_names,
+            *graph.stop_ids,
+            *keys,
+            *(key_names[k] for k in keys),
+        )
+    ]
+    string_offsets = [0]
+    for s in strings:
+        string_offsets.append(string_offsets[-1] + len(s))
+
+    def csr(rows: Iterable[Iterable[int]]) -> tuple[bytes, bytes]:
+        offsets, values = [0], []
+        for row in rows:
+            values.extend(row)
+            offsets.append(len(values))
+        return _uint32(offsets), _uint32(values)
+
+    sections = [
+        _uint32(string_offsets),
+        b"".join(strings),
+        *csr(_bits(mask) for mask in graph.stop_routes),
+        *csr(_bits(mask) for mask in graph.route_adjacency),
+        *csr(key_stops[k] for k in keys),
+    ]
+
+    position = -(-_TABLE_END // _ALIGNMENT) * _ALIGNMENT
+    table, body = [], bytearray()
+    for section in sections:
+        table.append(_SECTION.pack(position, len(section)))
+        padding = -len(section) % _ALIGNMENT
+        body += section + b"\0" * padding
+        position += len(section) + padding
+
+    path = Path(path)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temporary, "wb") as f:
+            f.write(
+                _HEADER.pack(
+                    MAGIC,
+                    FORMAT_VERSION,
+                    generation,
+                    len(graph.route_ids),
+                    len(graph.stop_ids),
+                    len(keys),
+                )
+            )
+            f.write(b"".join(table))
+            f.write(b"\0" * (-_TABLE_END % _ALIGNMENT))
+            f.write(body)
+            # on disk before the rename, so a crash can't leave a truncated snapshot under the path
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    return generation
+
+
+def read_generation(path: Path | str) -> int:
+    """
+    :param path: the snapshot
+    :return: the generation of the snapshot, only reading its header
+    :raises SnapshotFormatError: if the file isn't a snapshot of this format version
+    :raises OSError: if the file can't be read
+    """
+    with open(path, "rb") as f:
+        return _unpack_header(f.read(_HEADER.size))[2]
+
+
+def _unpack_header(data: bytes) -> tuple:
+    if len(data) < _HEADER.size:
+        raise SnapshotFormatError("Truncated graph snapshot")
+    header = _HEADER.unpack_from(data)
+    if header[0] != MAGIC:
+        raise SnapshotFormatError("Not a graph snapshot")
+    if header[1] != FORMAT_VERSION:
+        raise SnapshotFormatError(
+            f"Graph snapshot format version {header[1]}, expected {FORMAT_VERSION}"
+        )
+    return header
+
+
+class _Strings(Sequence[str]):
+    """A slice of the string table, decoded on access, so it can be indexed and binary searched in place."""
+
+    def __init__(
+        self, offsets: memoryview, strings: memoryview, start: int, count: int
+    ):
+        self._offsets = offsets
+        self._strings = strings
+        self._start = start
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if not -self._count <= i < self._count:
+            raise IndexError(i)
+        i = self._start + i % self._count
+        return str(self._strings[self._offsets[i] : self._offsets[i + 1]], "utf-8")
+
+    def index_of(self, value: str) -> int | None:
+        """
+        :return: the index of a string in the slice, which must be sorted, None if it isn't there
+        """
+        i = bisect_left(self, value)
+        return i if i < self._count and self[i] == value else None
+
+
+class GraphSnapshot:
+    """
+    A graph snapshot mapped read-only into memory. Nothing is copied or built when it's opened: the strings are decoded
+    and the CSR rows read straight from the mapped pages, which the OS shares between every process mapping the file.
+    Answers route path and stop name queries like ``TransitGraph``, and ``StopNameIndex`` (as ``name_index``).
+    """
+
+    def __init__(self, path: Path | str):
+        """
+        :param path: the snapshot
+        :raises SnapshotFormatError: if the file isn't a snapshot of this format version
+        :raises OSError: if the file can't be read
+        """
+        if sys.byteorder != "little":
+            # the arrays are cast in place, which needs them in the byte order of the machine
+            raise SnapshotFormatError(
+                "Graph snapshots can only be read on little endian machines"
+            )
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            header = f.read(_TABLE_END)
+            _, _, self.generation, route_count, stop_count, key_count = _unpack_header(
+                header
+            )
+            if len(header) < _TABLE_END:
+                raise SnapshotFormatError("Truncated graph snapshot")
+            # validated up front, as the mapping can't be closed any more once it has been sliced
+            table = {
+                name: _SECTION.unpack_from(header, _HEADER.size + i * _SECTION.size)
+                for i, name in enumerate(_SECTIONS)
+            }
+            size = os.fstat(f.fileno()).st_size
+            for name, (offset, length) in table.items():
+                if offset + length > size or (name != "strings" and length % 4):
+                    raise SnapshotFormatError("Truncated graph snapshot")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        sections = {}
+        for name, (offset, length) in table.items():
+            section = view[offset : offset + length]
+            sections[name] = section if name == "strings" else section.cast("I")
+        view.release()
+        self._sections = sections
+
+        offsets, strings = sections["strings_offsets"], sections["strings"]
+        self.route_ids = _Strings(offsets, strings, 0, route_count)
+        self.route_names = _Strings(offsets, strings, route_count, route_count)
+        self.stop_ids = _Strings(offsets, strings, 2 * route_count, stop_count)
+        self.name_index = SnapshotNameIndex(
+            _Strings(offsets, strings, 2 * route_count + stop_count, key_count),
+            _Strings(
+                offsets, strings, 2 * route_count + stop_count + key_count, key_count
+            ),
+            sections["key_stops_offsets"],
+            sections["key_stops"],
+            self.stop_ids,
+        )
+
+    def close(self) -> None:
+        """
+        Unmaps the snapshot, it can't be queried afterwards.
+        """
+        for section in self._sections.values():
+            section.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "GraphSnapshot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _row(self, name: str, i: int) -> memoryview:
+        offsets = self._sections[f"{name}_offsets"]
+        return self._sections[name][offsets[i] : offsets[i + 1]]
+
+    def routes_for_stop(self, stop_id: str) -> list[str]:
+        """
+        :param stop_id: id of the stop
+        :return: ids of the routes serving the stop
+        """
+        i = self.stop_ids.index_of(stop_id)
+        if i is None:
+            return []
+        return [self.route_ids[r] for r in self._row("stop_routes", i)]
+
+    def find_path(self, start_stop_id: str, end_stop_id: str) -> list[str] | None:
+        """
+        Same as ``TransitGraph.find_path``.
+        """
+        return self.find_path_between([start_stop_id], [end_stop_id])
+
+    def find_path_between(
+        self, start_stop_ids: Iterable[str], end_stop_ids: Iterable[str]
+    ) -> list[str] | None:
+        """
+        Same as ``TransitGraph.find_path_between`` (and the same path), a breadth-first search one whole level
+        (transfer) at a time over the CSR route adjacency.
+        :param start_stop_ids: IDs of the stops the path may start from.
+        :param end_stop_ids: IDs of the stops the path may end at.
+        :return: List of route names forming the path, or None if no path exists.
+        :raises ValueError: if either stop has no routes
+        """
+        starts, ends = set(), set()
+        for stop_ids, routes in ((start_stop_ids, starts), (end_stop_ids, ends)):
+            for stop_id in stop_ids:
+                i = self.stop_ids.index_of(stop_id)
+                if i is not None:
+                    routes.update(self._row("stop_routes", i))
+        if not (starts and ends):
+            raise ValueError("Routes not found for both stops.")
+
+        levels = [starts]
+        visited = set(starts)
+        frontier = starts
+        while not frontier & ends:
+            frontier = {
+                adjacent
+                for route in frontier
+                for adjacent in self._row("route_adjacency", route)
+                if adjacent not in visited
+            }
+            if not frontier:
+                return None
+            visited |= frontier
+            levels.append(frontier)
+
+        # walk back through the levels, picking the lowest indexed adjacent route each time
+        route = min(frontier & ends)
+        path = [route]
+        for level in reversed(levels[:-1]):
+            route = min(r for r in self._row("route_adjacency", route) if r in level)
+            path.append(route)
+        path.reverse()
+        return [self.route_names[r] for r in path]
+
+
+class SnapshotNameIndex:
+    """
+    The stop names of a snapshot, resolved by binary search over the sorted name keys in place.
+    Suggestions for names that don't resolve build a ``StopNameIndex`` on first use, they're only needed on errors.
+    """
+
+    def __init__(
+        self,
+        keys: _Strings,
+        names: _Strings,
+        key_stops_offsets: memoryview,
+        key_stops: memoryview,
+        stop_ids: _Strings,
+    ):
+        self._keys = keys
+        self._names = names
+        self._key_stops_offsets = key_stops_offsets
+        self._key_stops = key_stops
+        self._stop_ids = stop_ids
+        self._suggestions_index: StopNameIndex | None = None
+        self._lock = threading.Lock()
+
+    def _stops_for_key(self, i: int) -> list[str]:
+        start, end = self._key_stops_offsets[i], self._key_stops_offsets[i + 1]
+        return [self._stop_ids[s] for s in self._key_stops[start:end]]
+
+    def _prefix_keys(self, key: str, limit: int) -> list[int]:
+        matches = []
+        i = bisect_left(self._keys, key)
+        while (
+            i < len(self._keys)
+            and len(matches) < limit
+            and self._keys[i].startswith(key)
+        ):
+            matches.append(i)
+            i += 1
+        return matches
+
+    def resolve(self, name: str) -> list[str]:
+        """
+        Same as ``StopNameIndex.resolve``.
+        """
+        key = normalize_stop_name(name)
+        if not key:
+            return []
+        i = self._keys.index_of(key)
+        if i is not None:
+            return self._stops_for_key(i)
+
+        prefix_matches = self._prefix_keys(key, limit=2)
+        if len(prefix_matches) == 1:
+            return self._stops_for_key(prefix_matches[0])
+        return []
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        """
+        Same as ``StopNameIndex.complete``.
+        """
+        key = normalize_stop_name(prefix)
+        return [self._names[i] for i in self._prefix_keys(key, limit)] if key else []
+
+    def suggest(self, name: str, limit: int = 5) -> list[str]:
+        """
+        Same as ``StopNameIndex.suggest``.
+        """
+        with self._lock:
+            if self._suggestions_index is None:
+                self._suggestions_index = StopNameIndex(
+                    Stop(id=str(i), name=self._names[i]) for i in range(len(self._keys))
+                )
+        return self._suggestions_index.suggest(name, limit)
+
+    def resolve_pair(
+        self, start_name: str, end_name: str
+    ) -> tuple[list[str], list[str]]:
+        """
+        Same as ``StopNameIndex.resolve_pair``.
+        :raises UnknownStopError: if either name can't be resolved
+        """
+        start_ids = self.resolve(start_name)
+        end_ids = self.resolve(end_name)
+        unresolved = [
+            name
+            for name, ids in ((start_name, start_ids), (end_name, end_ids))
+            if not ids
+        ]
+        if unresolved:
+            raise UnknownStopError(
+                {name: self.suggest(name, limit=3) for name in unresolved}
+            )
+        return start_ids, end_ids
+
+
+class SnapshotWatcher:
+    """
+    Hands out the latest snapshot at a path, for long running workers: when a newer generation has been written
+    (renamed over the path) it maps the new file and swaps it in. Queries already holding the previous snapshot keep
+    a consistent view, it's unmapped once nothing refers to it any more.
+    """
+
+    def __init__(self, path: Path | str):
+        """
+        :param path: the snapshot
+        :raises SnapshotFormatError: if the file isn't a snapshot of this format version
+        :raises OSError: if the file can't be read
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._snapshot = GraphSnapshot(self.path)
+        self._file_id = self._stat()
+
+    def _stat(self) -> tuple[int, int, int]:
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def current(self) -> GraphSnapshot:
+        """
+        Checks (with a stat of the path) whether the snapshot has been replaced, swapping in a newer generation.
+        A replacement that can't be read, or isn't newer, is ignored and the current snapshot kept.
+        :return: the latest snapshot
+        """
+        try:
+            file_id = self._stat()
+        except OSError:
+            return self._snapshot
+        if file_id == self._file_id:
+            return self._snapshot
+
+        with self._lock:
+            if file_id != self._file_id:
+                self._file_id = file_id
+                try:
+                    if read_generation(self.path) > self._snapshot.generation:
+                        self._snapshot = GraphSnapshot(self.path)
+                except (OSError, SnapshotFormatError) as e:
+                    print(f"Failed to swap in the graph snapshot: {e}", file=sys.stderr)
+        return self._snapshot
@@ -0,0 +1,371 @@
+import csv
+import io
+import zipfile
+from collections import Counter
+from datetime import date
+from pathlib import Path
+from typing import IO, Collection, Iterator, NamedTuple
+
+from helpers import parse_time
+from models import Route, RoutePattern, Stop
+
+# GTFS route types of the subway, the same ones the API requests are filtered on: 0 = Light Rail, 1 = Heavy Rail
+SUBWAY_ROUTE_TYPES = frozenset({"0", "1"})
+
+# an opened feed zip, or a directory with the extracted files of one
+Feed = zipfile.ZipFile | Path
+
+
+class ScheduledTrip(NamedTuple):
+    trip_id: str
+    route_id: str
+    # stations called at, in order
+    stop_ids: tuple[str, ...]
+    # seconds since midnight of the service day at each station
+    arrivals: tuple[int, ...]
+    departures: tuple[int, ...]
+
+
+class GtfsNetwork(NamedTuple):
+    """The parts of a GTFS static feed the app uses, in the shapes mbta_client returns from the API."""
+
+    # sorted by long name
+    routes: list[Route]
+    # the stations the routes call at
+    stops: list[Stop]
+    # grouped by route (in route order) then direction, the stop sequences run by the most trips first
+    route_patterns: list[RoutePattern]
+    # only loaded when asked for
+    trips: list[ScheduledTrip]
+
+
+def _open_table(feed: Feed, name: str) -> IO[str]:
+    try:
+        if isinstance(feed, Path):
+            return open(feed / name, encoding="utf-8-sig", newline="")
+        return io.TextIOWrapper(feed.open(name), encoding="utf-8-sig", newline="")
+    except (KeyError, FileNotFoundError) as e:
+        raise ValueError(f"GTFS feed has no {name}") from e
+
+
+def _has_table(feed: Feed, name: str) -> bool:
+    if isinstance(feed, Path):
+        return (feed / name).is_file()
+    return name in feed.namelist()
+
+
+def _iter_table(
+    feed: Feed,
+    name: str,
+    columns: tuple[str, ...],
+    optional: Collection[str] = (),
+) -> Iterator[list[str]]:
+    """
+    Streams the rows of a table of the feed one at a time, so even stop_times.txt is never held in memory.
+    :param feed: the feed to read from
+    :param name: file name of the table e.g. "stops.txt"
+    :param columns: columns to return from every row, in order
+    :param optional: columns that may be missing from the table, returned as ""
+    :return: the values of the requested columns for every row
+    :raises ValueError: if the table or one of the other columns is missing
+    """
+    with _open_table(feed, name) as f:
+        reader = csv.reader(f)
+        header = [column.strip() for column in next(reader, [])]
+        indexes = []
+        for column in columns:
+            if column in header:
+                indexes.append(header.index(column))
+            elif column in optional:
+                indexes.append(None)
+            else:
+                raise ValueError(f"{name} has no {column} column")
+
+        for row in reader:
+            if row:
+                yield [
+                    row[i] if i is not None and i < len(row) else "" for i in indexes
+                ]
+
+
+def _active_service_ids(feed: Feed, service_date: date) -> set[str] | None:
+    """
+    :return: the services running on the date according to calendar.txt and calendar_dates.txt,
+        or None if the feed has neither (every service runs every day)
+    """
+    has_calendar = _has_table(feed, "calendar.txt")
+    has_calendar_dates = _has_table(feed, "calendar_dates.txt")
+    if not has_calendar and not has_calendar_dates:
+        return None
+
+    weekday = service_date.strftime("%A").lower()
+    day = service_date.strftime("%Y%m%d")
+    active = set()
+    if has_calendar:
+        for service_id, runs, start, end in _iter_table(
+            feed, "calendar.txt", ("service_id", weekday, "start_date", "end_date")
+        ):
+            if runs == "1" and start <= day <= end:
+                active.add(service_id)
+    if has_calendar_dates:
+        for service_id, exception_day, exception_type in _iter_table(
+            feed, "calendar_dates.txt", ("service_id", "date", "exception_type")
+        ):
+            if exception_day != day:
+                continue
+            if exception_type == "1":
+                active.add(service_id)
+            else:
+                active.discard(service_id)
+    return active
+
+
+def _read_routes(feed: Feed, route_types: Collection[str]) -> list[Route]:
+    routes = [
+        Route(id=route_id, long_name=long_name or short_name)
+        for route_id, route_type, long_name, short_name in _iter_table(
+            feed,
+            "routes.txt",
+            ("route_id", "route_type", "route_long_name", "route_short_name"),
+            optional=("route_long_name", "route_short_name"),
+        )
+        if route_type in route_types
+    ]
+    routes.sort(key=lambda r: r.long_name)
+    return routes
+
+
+def _read_trips(
+    feed: Feed, route_ids: Collection[str], service_date: date | None
+) -> dict[str, tuple[str, int]]:
+    """
+    :return: mapping of trip id to its route id and direction id, for the trips of the routes (running on the date)
+    """
+    service_ids = None
+    if service_date is not None:
+        service_ids = _active_service_ids(feed, service_date)
+
+    trips = {}
+    for trip_id, route_id, direction_id, service_id in _iter_table(
+        feed,
+        "trips.txt",
+        ("trip_id", "route_id", "direction_id", "service_id"),
+        optional=("direction_id", "service_id"),
+    ):
+        if route_id in route_ids and (service_ids is None or service_id in service_ids):
+            trips[trip_id] = (route_id, int(direction_id or 0))
+    return trips
+
+
+def _read_stop_sequences(
+    feed: Feed, trip_ids: Collection[str]
+) -> dict[str, tuple[str, ...]]:
+    """
+    Reads the stops the given trips call at from stop_times.txt.
+    The rows of a trip are normally contiguous, so only the rows of the trip being read are held as a list, and trips
+    calling at the same stops share one tuple: memory grows with the trips and their distinct stop sequences, not with
+    the rows of the file. Rows don't have to be contiguous or in order for the result to be right.
+    :param feed: the feed to read from
+    :param trip_ids: the trips to read
+    :return: mapping of trip id to its stop ids, in stop sequence order
+    """
+    distinct: dict[tuple, tuple] = {}
+    rows_of_trip: dict[str, tuple[tuple[int, str], ...]] = {}
+    trip_id, rows = None, []
+    for row_trip_id, stop_sequence, stop_id in _iter_table(
+        feed, "stop_times.txt", ("trip_id", "stop_sequence", "stop_id")
+    ):
+        if row_trip_id not in trip_ids:
+            continue
+        if row_trip_id != trip_id:
+            if trip_id is not None:
+                finished = tuple(sorted(rows))
+                rows_of_trip[trip_id] = distinct.setdefault(finished, finished)
+            # picks up where the trip left off if its rows aren't contiguous
+            trip_id, rows = row_trip_id, list(rows_of_trip.pop(row_trip_id, ()))
+        rows.append((int(stop_sequence), stop_id))
+    if trip_id is not None:
+        finished = tuple(sorted(rows))
+        rows_of_trip[trip_id] = distinct.setdefault(finished, finished)
+
+    stop_ids_of = {}
+    for rows in rows_of_trip.values():
+        if rows not in stop_ids_of:
+            stop_ids_of[rows] = tuple(stop_id for _, stop_id in rows)
+    return {trip_id: stop_ids_of[rows] for trip_id, rows in rows_of_trip.items()}
+
+
+def _read_stop_times(
+    feed: Feed, trip_ids: Collection[str]
+) -> dict[str, list[tuple[int, str, int, int]]]:
+    """
+    Reads the full schedule of the given trips from stop_times.txt.
+    :param feed: the feed to read from
+    :param trip_ids: the trips to read
+    :return: mapping of trip id to its (stop sequence, stop id, arrival, departure) rows, in stop sequence order
+    """
+    rows_of_trip = {}
+    # a schedule only has so many distinct times, parse each once
+    seconds_of = {"": -1}
+    for trip_id, stop_sequence, stop_id, arrival, departure in _iter_table(
+        feed,
+        "stop_times.txt",
+        ("trip_id", "stop_sequence", "stop_id", "arrival_time", "departure_time"),
+    ):
+        if trip_id not in trip_ids:
+            continue
+        for time in (arrival, departure):
+            if time not in seconds_of:
+                seconds_of[time] = parse_time(time)
+        # times may only be given at timepoints (-1 if not), the others are interpolated below
+        rows_of_trip.setdefault(trip_id, []).append(
+            (
+                int(stop_sequence),
+                stop_id,
+                seconds_of[arrival or departure],
+                seconds_of[departure or arrival],
+            )
+        )
+
+    for rows in rows_of_trip.values():
+        rows.sort()
+        _interpolate_times(rows)
+    return rows_of_trip
+
+
+def _interpolate_times(rows: list[tuple[int, str, int, int]]) -> None:
+    timed = [i for i, row in enumerate(rows) if row[2] >= 0]
+    if not timed:
+        raise ValueError(
+            f"stop_times.txt has no times for a trip calling at {rows[0][1]}"
+        )
+    # before the first and after the last timepoint the trip is assumed to be there at the same time
+    for i in range(timed[0]):
+        rows[i] = (*rows[i][:2], rows[timed[0]][2], rows[timed[0]][2])
+    for i in range(timed[-1] + 1, len(rows)):
+        rows[i] = (*rows[i][:2], rows[timed[-1]][3], rows[timed[-1]][3])
+    for before, after in zip(timed, timed[1:]):
+        start, end = rows[before][3], rows[after][2]
+        for i in range(before + 1, after):
+            time = start + (end - start) * (i - before) // (after - before)
+            rows[i] = (*rows[i][:2], time, time)
+
+
+def _read_stations(
+    feed: Feed, called_at: Collection[str]
+) -> tuple[dict[str, str], dict[str, str]]:
+    """
+    Trips call at platforms, which are resolved to their parent station like the API does.
+    :return: mapping of called at stop id to its station id, and mapping of station id to its name
+    """
+    station_of, names = {}, {}
+    for stop_id, name, location_type, parent_station in _iter_table(
+        feed,
+        "stops.txt",
+        ("stop_id", "stop_name", "location_type", "parent_station"),
+        optional=("location_type", "parent_station"),
+    ):
+        if stop_id in called_at:
+            station_of[stop_id] = parent_station or stop_id
+            names[stop_id] = name
+        elif location_type == "1":
+            names[stop_id] = name
+    return station_of, names
+
+
+def _load(
+    feed: Feed,
+    route_types: Collection[str],
+    service_date: date | None,
+    include_trips: bool,
+) -> GtfsNetwork:
+    routes = _read_routes(feed, route_types)
+    trips = _read_trips(feed, {r.id for r in routes}, service_date)
+
+    if include_trips:
+        stop_times = _read_stop_times(feed, trips)
+        stop_sequences = {
+            trip_id: tuple(stop_id for _, stop_id, _, _ in rows)
+            for trip_id, rows in stop_times.items()
+        }
+    else:
+        stop_times = {}
+        stop_sequences = _read_stop_sequences(feed, trips)
+    trip_counts = Counter(
+        (*trips[trip_id], stop_ids) for trip_id, stop_ids in stop_sequences.items()
+    )
+
+    called_at = {stop_id for _, _, stop_ids in trip_counts for stop_id in stop_ids}
+    station_of, names = _read_stations(feed, called_at)
+
+    pattern_counts = Counter()
+    for (route_id, direction_id, stop_ids), count in trip_counts.items():
+        stations = []
+        for stop_id in stop_ids:
+            station_id = station_of.get(stop_id, stop_id)
+            # consecutive platforms of the same station collapse into one stop
+            if not stations or stations[-1] != station_id:
+                stations.append(station_id)
+        pattern_counts[(route_id, direction_id, tuple(stations))] += count
+
+    route_order = {r.id: i for i, r in enumerate(routes)}
+    ordered = sorted(
+        pattern_counts.items(),
+        key=lambda item: (route_order[item[0][0]], item[0][1], -item[1], item[0][2]),
+    )
+    route_patterns = [
+        RoutePattern(route_id=route_id, direction_id=direction_id, stop_ids=stations)
+        for (route_id, direction_id, stations), _ in ordered
+    ]
+
+    served = dict.fromkeys(s for pattern in route_patterns for s in pattern.stop_ids)
+    stops = [Stop(id=s, name=names[s]) for s in served if s in names]
+
+    scheduled_trips = []
+    for trip_id, rows in stop_times.items():
+        stations, arrivals, departures = [], [], []
+        for _, stop_id, arrival, departure in rows:
+            station_id = station_of.get(stop_id, stop_id)
+            if stations and stations[-1] == station_id:
+                departures[-1] = departure
+                continue
+            stations.append(station_id)
+            arrivals.append(arrival)
+            departures.append(departure)
+        scheduled_trips.append(
+            ScheduledTrip(
+                trip_id=trip_id,
+                route_id=trips[trip_id][0],
+                stop_ids=tuple(stations),
+                arrivals=tuple(arrivals),
+                departures=tuple(departures),
+            )
+        )
+    return GtfsNetwork(routes, stops, route_patterns, scheduled_trips)
+
+
+def load_feed(
+    path: Path | str,
+    route_types: Collection[str] = SUBWAY_ROUTE_TYPES,
+    service_date: date | None = None,
+    include_trips: bool = False,
+) -> GtfsNetwork:
+    """
+    Loads the routes of the given types out of a GTFS static feed (routes.txt, trips.txt, stop_times.txt and
+    stops.txt) in one streamed pass over each table, with no network access.
+    :param path: the feed zip, or a directory of its extracted files
+    :param route_types: GTFS route types to load, the subway by default
+    :param service_date: only load the trips running on this date according to calendar.txt and calendar_dates.txt,
+        None for every trip in the feed
+    :param include_trips: also load the schedule of every trip, for timetable routing
+    :return: the routes, the stations they call at, their route patterns and (if asked for) their trips
+    :raises ValueError: if the feed isn't a zip, or a table or column it needs is missing
+    """
+    path = Path(path)
+    if path.is_dir():
+        return _load(path, route_types, service_date, include_trips)
+    try:
+        with zipfile.ZipFile(path) as feed:
+            return _load(feed, route_types, service_date, include_trips)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"{path} is not a GTFS feed zip") from e
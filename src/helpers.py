@@ -11,3 +11,25 @@ def find_multi_value_items(mapping: Dict[K, V]) -> Dict[K, V]:
     :return: filtered dictionary - returns a new dictionary, not editing in place
     """
     return {k: v for k, v in mapping.items() if len(v) >= 2}
+
+
+def parse_time(text: str) -> int:
+    """
+    Parses a time of day as used by GTFS schedules, which can be past 24:00:00 for trips running past midnight.
+    :param text: "H:MM:SS" or "H:MM"
+    :return: seconds since midnight
+    :raises ValueError: if the time isn't in either format
+    """
+    parts = text.strip().split(":")
+    if len(parts) not in (2, 3) or not all(p.isdigit() for p in parts):
+        raise ValueError(f"Invalid time {text!r}, expected H:MM or H:MM:SS")
+    hours, minutes, seconds = (int(p) for p in (*parts, "0")[:3])
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def format_time(seconds: int) -> str:
+    """
+    :param seconds: seconds since midnight
+    :return: the time as "HH:MM", past 24:00 for times past midnight
+    """
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
@@ -0,0 +1,167 @@
+from typing import Tuple
+
+from models import Route, Stop
+
+# NumPy is an optional extra (pip install "mbta-challenge[analytics]"), only needed for this module
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class IncidenceMatrix:
+    """
+    The route x stop incidence matrix ``A`` of a network (``A[r, s]`` is 1 if route ``r`` calls at stop ``s``), built
+    once so the network analytics are whole-array operations instead of walks over dicts of sets:
+        * route sizes are the row sums, and the number of routes at each stop the column sums
+        * routes are adjacent when they share a stop, i.e. where ``A @ A.T`` is non zero off the diagonal
+    Most stops of a network belong to a single route, so ``A`` is stored sparse, as the row and column of every 1 in
+    ``route_rows``/``stop_columns`` (sorted by route), and never multiplied out densely.
+    """
+
+    def __init__(self, route_to_stops_mapping: dict[Route, set[Stop]]):
+        """
+        :param route_to_stops_mapping: mapping of every route to its stops e.g. from
+            ``mbta_client.get_subway_route_to_stops_mapping``
+        :raises ImportError: if NumPy isn't installed
+        """
+        if np is None:
+            raise ImportError(
+                'The incidence matrix needs NumPy, install it with pip install "mbta-challenge[analytics]"'
+            )
+
+        self.routes = list(route_to_stops_mapping)
+        stop_index = {}
+        columns = [
+            stop_index.setdefault(stop, len(stop_index))
+            for stops in route_to_stops_mapping.values()
+            for stop in stops
+        ]
+        self.stops = list(stop_index)
+        self.route_rows = np.repeat(
+            np.arange(len(self.routes), dtype=np.int32),
+            [len(stops) for stops in route_to_stops_mapping.values()],
+        )
+        self.stop_columns = np.array(columns, dtype=np.int32)
+
+    def to_dense(self) -> "np.ndarray":
+        """
+        :return: the matrix as a dense routes x stops array of 0/1
+        """
+        dense = np.zeros((len(self.routes), len(self.stops)), dtype=np.uint8)
+        dense[self.route_rows, self.stop_columns] = 1
+        return dense
+
+    def route_sizes(self) -> "np.ndarray":
+        """
+        :return: the number of stops of every route, in route order
+        """
+        return np.bincount(self.route_rows, minlength=len(self.routes))
+
+    def routes_per_stop(self) -> "np.ndarray":
+        """
+        :return: the number of routes calling at every stop, in stop order
+        """
+        return np.bincount(self.stop_columns, minlength=len(self.stops))
+
+    def longest_and_shortest_route(
+        self,
+    ) -> Tuple[Tuple[Route, int], Tuple[Route, int]] | None:
+        """
+        Same as ``transit_system_info.find_longest_and_shortest_route``, ties go to the route that comes first.
+        :return: a tuple of the longest route and its number of stops, and the same for the shortest route
+        """
+        if not self.routes:
+            return None
+        sizes = self.route_sizes()
+        longest, shortest = int(sizes.argmax()), int(sizes.argmin())
+        return (self.routes[longest], int(sizes[longest])), (
+            self.routes[shortest],
+            int(sizes[shortest]),
+        )
+
+    def multi_route_stops(self) -> dict[Stop, set[Route]]:
+        """
+        Same as ``helpers.find_multi_value_items`` over the stop to routes mapping.
+        :return: mapping of every stop used by several routes to those routes
+        """
+        columns, rows = self._shared_stop_entries()
+        result = {}
+        for column, row in zip(columns.tolist(), rows.tolist()):
+            result.setdefault(self.stops[column], set()).add(self.routes[row])
+        return result
+
+    def route_pairs(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        The non zero entries of ``A @ A.T`` off the diagonal, found by pairing up the routes of every shared stop
+        rather than multiplying out, so it costs the number of pairs and not routes squared.
+        :return: the two route indexes of every pair of routes sharing a stop, both ways round and without duplicates
+        """
+        columns, rows = self._shared_stop_entries()
+        if not len(rows):
+            return rows, rows
+        # every entry is paired with every entry of its stop (the entries are grouped by stop)
+        group_sizes = np.bincount(columns)[columns]
+        group_starts = np.searchsorted(columns, columns)
+        offsets = np.repeat(np.cumsum(group_sizes) - group_sizes, group_sizes)
+        partners = (
+            np.repeat(group_starts, group_sizes)
+            + np.arange(int(group_sizes.sum()))
+            - offsets
+        )
+        firsts, seconds = np.repeat(rows, group_sizes), rows[partners]
+
+        # routes sharing several stops are paired once per stop
+        distinct = firsts != seconds
+        pairs = np.unique(
+            firsts[distinct].astype(np.int64) * len(self.routes) + seconds[distinct]
+        )
+        return pairs // len(self.routes), pairs % len(self.routes)
+
+    def route_adjacency(self) -> "np.ndarray":
+        """
+        :return: square boolean matrix of the routes sharing at least one stop with each other route (not with itself)
+        """
+        adjacency = np.zeros((len(self.routes), len(self.routes)), dtype=bool)
+        adjacency[self.route_pairs()] = True
+        return adjacency
+
+    def adjacency_list(self) -> dict[str, set[str]]:
+        """
+        Same as ``path_finding.build_adjacency_list``.
+        :return: mapping of route id to the ids of its adjacent routes, for the routes with any
+        """
+        result = {}
+        for first, second in zip(*(p.tolist() for p in self.route_pairs())):
+            result.setdefault(self.routes[first].id, set()).add(self.routes[second].id)
+        return result
+
+    def components(self) -> list[list[Route]]:
+        """
+        Groups the routes into connected components, routes being connected when they share a stop (transitively).
+        Every route starts labelled with its own index and takes the smallest label of its neighbours until nothing
+        changes, so it takes as many passes over the route pairs as the widest component has transfers.
+        :return: the components (each in route order), largest first
+        """
+        firsts, seconds = self.route_pairs()
+        labels = np.arange(len(self.routes))
+        while True:
+            new_labels = labels.copy()
+            np.minimum.at(new_labels, firsts, labels[seconds])
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+
+        components = {}
+        for route, label in zip(self.routes, labels.tolist()):
+            components.setdefault(label, []).append(route)
+        return sorted(components.values(), key=len, reverse=True)
+
+    def _shared_stop_entries(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        :return: the column and row of every entry of a stop with several routes, grouped by stop
+        """
+        shared = self.routes_per_stop()[self.stop_columns] >= 2
+        columns, rows = self.stop_columns[shared], self.route_rows[shared]
+        order = np.argsort(columns, kind="stable")
+        return columns[order], rows[order]
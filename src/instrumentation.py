@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+# called with the kind of every event ("request" or "phase") and its details, e.g. to forward them to a metrics backend
+Hook = Callable[[str, dict[str, Any]], None]
+
+
+class _Timing:
+    __slots__ = ("count", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def to_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "total_seconds": round(self.total_seconds, 6),
+            "max_seconds": round(self.max_seconds, 6),
+        }
+
+
+class MetricsRegistry:
+    """
+    Collects what the hot paths report: every HTTP request (timing, status, bytes), counters, phase timings
+    (graph builds, searches, ...) and the hit/miss counts of the registered caches. Safe to use from several threads.
+    Recording is cheap (a clock read and a dict update), so it is always on.
+    """
+
+    def __init__(self, window: int = 10_000):
+        """
+        :param window: number of most recent requests to keep the details of (the totals cover every request)
+        """
+        self._lock = threading.Lock()
+        self._requests: deque[dict[str, Any]] = deque(maxlen=window)
+        self._request_totals = _Timing()
+        self._request_bytes = 0
+        self._counters: dict[str, int] = defaultdict(int)
+        self._phases: dict[str, _Timing] = defaultdict(_Timing)
+        self._caches: dict[str, Callable] = {}
+        self._hooks: list[Hook] = []
+
+    def add_hook(self, hook: Hook) -> None:
+        """
+        :param hook: called with every event as it is recorded, from the thread that recorded it
+        """
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        with self._lock:
+            self._hooks.remove(hook)
+
+    def _emit(self, kind: str, event: dict[str, Any]) -> None:
+        for hook in list(self._hooks):
+            hook(kind, event)
+
+    def register_cache(self, cached: Callable) -> Callable:
+        """
+        Registers a ``functools.lru_cache`` (or ``caching.cached``) wrapped function so its hits and misses are reported.
+        :param cached: the cached function
+        :return: the same function
+        """
+        with self._lock:
+            self._caches[f"{cached.__module__}.{cached.__qualname__}"] = cached
+        return cached
+
+    def record_request(
+        self, path: str, status: int, seconds: float, num_bytes: int
+    ) -> None:
+        """
+        :param path: URL path of the request
+        :param status: HTTP status of the response
+        :param seconds: from sending the request to having read the whole body
+        :param num_bytes: size of the body as received
+        """
+        event = {
+            "path": path,
+            "status": status,
+            "seconds": round(seconds, 6),
+            "bytes": num_bytes,
+        }
+        with self._lock:
+            self._requests.append(event)
+            self._request_totals.add(seconds)
+            self._request_bytes += num_bytes
+        self._emit("request", event)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Times the body of a ``with`` block as one occurrence of a phase, e.g. ``with metrics.phase("graph.build"):``
+        :param name: name of the phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._phases[name].add(seconds)
+            self._emit("phase", {"name": name, "seconds": round(seconds, 6)})
+
+    def report(self) -> dict[str, Any]:
+        """
+        :return: everything recorded so far, as a JSON serializable dict
+        """
+        with self._lock:
+            report = {
+                "requests": {
+                    **self._request_totals.to_dict(),
+                    "total_bytes": self._request_bytes,
+                    "recent": list(self._requests),
+                },
+                "counters": dict(self._counters),
+                "phases": {
+                    name: timing.to_dict() for name, timing in self._phases.items()
+                },
+                "caches": {},
+            }
+            caches = dict(self._caches)
+
+        for name, cached in caches.items():
+            info = cached.cache_info()
+            report["caches"][name] = {
+                "hits": info.hits,
+                "misses": info.misses,
+                "size": info.currsize,
+            }
+            if hasattr(info, "coalesced"):
+                report["caches"][name]["coalesced"] = info.coalesced
+        return report
+
+    def reset(self) -> None:
+        """
+        Forgets everything recorded, but keeps the registered caches and hooks.
+        """
+        with self._lock:
+            self._requests.clear()
+            self._request_totals = _Timing()
+            self._request_bytes = 0
+            self._counters.clear()
+            self._phases.clear()
+
+
+# the registry the library reports to
+metrics = MetricsRegistry()
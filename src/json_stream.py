@@ -0,0 +1,131 @@
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JsonApiStream:
+    """
+    Incremental parser for a JSON:API document that arrives in chunks (e.g. ``response.iter_content()``).
+    Iterating yields the resources of the ``data`` member one at a time as soon as each is complete, so neither the
+    raw body nor the whole decoded tree is ever held in memory at once.
+    The other top level members (``included``, ``links``, ...) are decoded whole into ``members``, which is complete
+    once the stream has been consumed.
+    """
+
+    def __init__(self, chunks: Iterable[bytes | str], member: str = "data"):
+        """
+        :param chunks: the document, in pieces of any size (bytes are decoded as UTF-8)
+        :param member: the top level member whose array items are streamed
+        """
+        self.members: dict[str, Any] = {}
+        self._member = member
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+        else:
+            while True:
+                key = self._value()
+                if not isinstance(key, str):
+                    raise ValueError("Malformed JSON document: expected a member name")
+                self._expect(":")
+                if key == self._member and self._peek() == "[":
+                    self._pos += 1
+                    yield from self._items()
+                else:
+                    self.members[key] = self._value()
+                if self._separator("}"):
+                    break
+
+        if self._peek():
+            raise ValueError("Malformed JSON document: unexpected data after it")
+
+    def _items(self) -> Iterator[Any]:
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._separator("]"):
+                return
+
+    def _fill(self) -> bool:
+        """
+        Appends the next chunk to the buffer.
+        :return: False once the stream is exhausted
+        """
+        if self._eof:
+            return False
+        # drop the parsed text so the buffer only ever holds what is still to be parsed
+        if self._pos:
+            self._buffer = self._buffer[self._pos :]
+            self._pos = 0
+        for chunk in self._chunks:
+            text = chunk if isinstance(chunk, str) else self._utf8.decode(chunk)
+            if text:
+                self._buffer += text
+                return True
+        self._buffer += self._utf8.decode(b"", final=True)
+        self._eof = True
+        return False
+
+    def _grow(self) -> bool:
+        # at least double the unparsed text before retrying a decode, so a large value is reparsed O(log n) times
+        target = 2 * (len(self._buffer) - self._pos) + 1
+        if not self._fill():
+            return False
+        while len(self._buffer) - self._pos < target and self._fill():
+            pass
+        return True
+
+    def _peek(self) -> str:
+        """
+        Skips whitespace.
+        :return: the next character, without consuming it, or "" at the end of the stream
+        """
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise ValueError(f"Malformed JSON document: expected '{char}'")
+        self._pos += 1
+
+    def _separator(self, closing: str) -> bool:
+        """
+        Consumes the separator after a member or item.
+        :return: True if it was the closing bracket, False if it was a comma
+        """
+        char = self._peek()
+        if char not in (",", closing):
+            raise ValueError(f"Malformed JSON document: expected ',' or '{closing}'")
+        self._pos += 1
+        return char == closing
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                end = None  # incomplete so far, or malformed
+            # a value is only complete once something follows it, e.g. the 12 of a 123 split across chunks
+            if end is not None and (end < len(self._buffer) or self._eof):
+                self._pos = end
+                return value
+            if not self._grow() and end is None:
+                raise ValueError("Malformed or truncated JSON document")
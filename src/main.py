@@ -1,16 +1,45 @@
 import argparse
+import json
 import sys
-from typing import Tuple
+from datetime import date
+from typing import TYPE_CHECKING, Tuple
 
 from mbta_client import (
+    configure_gtfs_feed,
+    configure_max_concurrency,
+    configure_page_limit,
+    configure_snapshot_cache,
     get_subway_routes,
     get_subway_route_to_stops_mapping,
     get_subway_stop_to_routes_mapping,
-    get_subway_stop_name_to_id_mapping,
+    get_subway_stop_name_index,
+    get_subway_stops,
 )
-from path_finding import find_shortest_subway_path
+from batch import run_batch
+from path_finding import (
+    find_shortest_subway_path_between,
+    find_subway_paths_between,
+    find_subway_itinerary,
+    find_subway_journeys,
+    get_subway_transit_graph,
+)
+from stop_name_index import StopNameIndex, UnknownStopError
+from raptor import Journey
+from stop_routing import OBJECTIVES, Itinerary
 from transit_system_info import find_longest_and_shortest_route
-from helpers import find_multi_value_items
+from helpers import find_multi_value_items, format_time, parse_time
+from instrumentation import metrics
+from fetch_engine import DEFAULT_MAX_CONCURRENCY, FetchError, failures
+from snapshot_cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_TTL_SECONDS,
+    SnapshotCache,
+    SnapshotUnavailableError,
+)
+
+# graph_snapshot is only imported by the commands reading or writing snapshots
+if TYPE_CHECKING:
+    from graph_snapshot import GraphSnapshot
 
 
 def question_1() -> None:
@@ -57,51 +86,306 @@ def question_2() -> None:
         print(f"{stop.name:<25} {', '.join(sorted(r.long_name for r in routes))}")
 
 
-def handle_question_3_args(start_name: str, end_name: str) -> Tuple[str, str]:
+def handle_question_3_args(
+    start_name: str, end_name: str, name_index: StopNameIndex | None = None
+) -> Tuple[list[str], list[str]]:
     """
     Helper to take the stop names as args and make sure they can be resolved to valid stop ids before trying to find a path.
+    A name can resolve to several stops, and an unambiguous prefix (e.g. "forest") resolves to the stop it starts.
     :param start_name: Name of the starting stop
     :param end_name:  Name of the ending stop
-    :return: Tuple of the ids - but will error out the program if they both can't be resolved.
+    :param name_index: index to resolve the names with, defaults to the one of the loaded system
+    :return: Tuple of the ids - but will error out the program (suggesting alternatives) if they both can't be resolved.
     """
-    name_to_id_mapping = get_subway_stop_name_to_id_mapping()
-
-    start_id = name_to_id_mapping.get(start_name.title().strip())
-    end_id = name_to_id_mapping.get(end_name.title().strip())
-
-    invalid_stops = []
-    if not start_id:
-        invalid_stops.append(start_name)
-    if not end_id:
-        invalid_stops.append(end_name)
-
-    # If one or both stops don't resolve, we have to stop and report
-    if invalid_stops:
-        print(
-            f"Unable to identify the stop(s) {', '.join(invalid_stops)}",
-            file=sys.stderr,
-        )
+    if name_index is None:
+        name_index = get_subway_stop_name_index()
+    try:
+        return name_index.resolve_pair(start_name, end_name)
+    except UnknownStopError as e:
+        # If one or both stops don't resolve, we have to stop and report
+        print(e, file=sys.stderr)
         sys.exit(2)
 
-    return start_id, end_id
-
 
 def question_3(args: argparse.Namespace) -> None:
     """
     Extend your program again such that the user can provide any two stops on the subway routes you listed for question 1.
     List a rail route you could travel to get from one stop to the other.
     """
+    if args.graph_snapshot and not uses_full_system(args):
+        with open_graph_snapshot(args.graph_snapshot) as snapshot:
+            start, end = handle_question_3_args(
+                args.start, args.end, snapshot.name_index
+            )
+            print_path(args, snapshot.find_path_between(start, end))
+        return
+
     start, end = handle_question_3_args(args.start, args.end)
 
-    path = find_shortest_subway_path(start, end)
+    if args.depart is not None:
+        print_journeys(args, find_subway_journeys(start, end, args.depart, args.date))
+        return
+
+    if args.by in OBJECTIVES:
+        print_itinerary(args, find_subway_itinerary(start, end, args.by))
+        return
+
+    if args.alternatives or args.all_minimal or args.avoid:
+        limit = None if args.all_minimal else args.alternatives or 1
+        try:
+            paths = find_subway_paths_between(
+                start, end, limit, args.all_minimal, args.avoid
+            )
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            sys.exit(2)
+        print_paths(args, paths)
+        return
+
+    print_path(args, find_shortest_subway_path_between(start, end))
+
+
+def uses_full_system(args: argparse.Namespace) -> bool:
+    """
+    :return: whether find-path needs more than a graph snapshot has, i.e. anything but the default search for lines
+    """
+    return bool(
+        args.by != "routes"
+        or args.depart is not None
+        or args.alternatives
+        or args.all_minimal
+        or args.avoid
+    )
+
+
+def open_graph_snapshot(path: str) -> "GraphSnapshot":
+    """
+    Maps a graph snapshot, exiting the program if it can't be read.
+    """
+    # imported here, like the other modules only some commands need, to keep startup fast
+    from graph_snapshot import GraphSnapshot, SnapshotFormatError
+
+    try:
+        return GraphSnapshot(path)
+    except (OSError, SnapshotFormatError) as e:
+        print(f"Unable to read the graph snapshot: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def print_path(args: argparse.Namespace, path: list[str] | None) -> None:
+    """
+    Prints the lines to take, if there is a path.
+    """
     if path is None:
         print("I'm sorry, no viable path exists between those two subway stops")
     else:
         print(f"{args.start.title()} to {args.end.title()}: {' -> '.join(path)}")
 
 
-def main() -> None:
+def print_paths(args: argparse.Namespace, paths: list[list[str]]) -> None:
+    """
+    Prints alternative route sequences one per line, fewest transfers first.
+    """
+    if not paths:
+        print("I'm sorry, no viable path exists between those two subway stops")
+        return
+
+    print(f"{args.start.title()} to {args.end.title()}:")
+    for i, path in enumerate(paths, start=1):
+        print(f" {i}. {' -> '.join(path)} ({len(path) - 1} transfer(s))")
+
+
+def print_itinerary(args: argparse.Namespace, itinerary: Itinerary | None) -> None:
+    """
+    Prints a stop-level itinerary one leg per line.
+    """
+    if itinerary is None:
+        print("I'm sorry, no viable path exists between those two subway stops")
+        return
+
+    print(
+        f"{args.start.title()} to {args.end.title()}: "
+        f"{itinerary.stops} stops, {itinerary.transfers} transfer(s)"
+    )
+    for leg in itinerary.legs:
+        print(
+            f" - {leg.route_name} from {leg.board_stop_name} to {leg.alight_stop_name} ({leg.stops} stops)"
+        )
+
+
+def print_journeys(args: argparse.Namespace, journeys: list[Journey]) -> None:
+    """
+    Prints the scheduled journeys, earliest arrival first, one leg per line.
+    """
+    if not journeys:
+        print("I'm sorry, no scheduled trips get between those two subway stops")
+        return
+
+    print(
+        f"{args.start.title()} to {args.end.title()}, leaving from {format_time(args.depart)}:"
+    )
+    for journey in reversed(journeys):
+        print(
+            f"Arrive at {format_time(journey.arrival)}, {journey.transfers} transfer(s)"
+        )
+        for leg in journey.legs:
+            print(
+                f" - {format_time(leg.departure)} {leg.route_name} from {leg.board_stop_name} "
+                f"to {leg.alight_stop_name}, arriving {format_time(leg.arrival)}"
+            )
+
+
+def find_path_batch(args: argparse.Namespace) -> None:
+    """
+    Runs find-path for every pair of stops in the batch input, streaming the results as JSON lines to stdout.
+    Everything is loaded once up front and shared by every pair.
+    """
+    if args.graph_snapshot:
+        graph = open_graph_snapshot(args.graph_snapshot)
+        name_index = graph.name_index
+    else:
+        name_index = get_subway_stop_name_index()
+        graph = get_subway_transit_graph()
+        with metrics.phase("transit_graph.precompute_transfers"):
+            graph.precompute_transfers()
+
+    if args.batch == "-":
+        count, seconds = run_batch(sys.stdin, sys.stdout, name_index, graph)
+    else:
+        with open(args.batch, encoding="utf-8") as f:
+            count, seconds = run_batch(f, sys.stdout, name_index, graph)
+
+    pairs_per_second = count / seconds if seconds else float("inf")
+    print(
+        f"Processed {count} pairs in {seconds:.3f}s ({pairs_per_second:,.0f} pairs/s)",
+        file=sys.stderr,
+    )
+
+
+def write_graph_snapshot(args: argparse.Namespace) -> None:
+    """
+    Writes the graph and stop names of the system as a snapshot for --graph-snapshot.
+    """
+    from graph_snapshot import write_snapshot
+
+    graph = get_subway_transit_graph()
+    with metrics.phase("graph_snapshot.write"):
+        generation = write_snapshot(args.path, graph, get_subway_stops())
+    print(
+        f"Wrote {len(graph.route_ids)} routes and {len(graph.stop_ids)} stops to {args.path} (generation {generation})"
+    )
+
+
+def run_command(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.command == "question-1":
+        question_1()
+    elif args.command == "question-2":
+        question_2()
+    elif args.command == "find-path" and args.batch:
+        find_path_batch(args)
+    elif args.command == "find-path":
+        question_3(args)
+    elif args.command == "serve":
+        # imported here, like the other heavy modules only some commands need, to keep startup fast
+        from server import DEFAULT_REFRESH_INTERVAL_SECONDS, serve
+
+        refresh_interval = args.refresh_interval
+        if refresh_interval is None:
+            refresh_interval = DEFAULT_REFRESH_INTERVAL_SECONDS
+        serve(args.host, args.port, refresh_interval, args.graph_snapshot, args.alerts)
+    elif args.command == "write-graph-snapshot":
+        write_graph_snapshot(args)
+    else:
+        parser.print_help()
+
+
+def write_metrics(path: str) -> None:
+    """
+    Writes the metrics recorded during the command as JSON.
+    :param path: file to write to, "-" for stderr
+    """
+    report = json.dumps(metrics.report(), indent=2)
+    if path == "-":
+        print(report, file=sys.stderr)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+
+def parse_args(
+    argv: list[str] | None = None,
+) -> tuple[argparse.ArgumentParser, argparse.Namespace]:
+    """
+    Parses and checks the command line, exiting with a usage error if it isn't valid.
+    :param argv: the arguments, None for the process's own
+    :return: the parser and the parsed args, with the defaults of every option not given
+    """
     parser = argparse.ArgumentParser(description="MBTA CLI Tool")
+
+    # snapshot cache options, shared by every command
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument(
+        "--offline",
+        action="store_true",
+        help="Only use the on-disk snapshot, never call the MBTA API",
+    )
+    cache_mode.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore the on-disk snapshot and refetch everything from the MBTA API",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        default=DEFAULT_TTL_SECONDS,
+        help="Seconds a snapshot stays fresh before it is refetched (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=str(DEFAULT_CACHE_DIR),
+        help="Directory to store snapshots in (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--gtfs-feed",
+        metavar="PATH",
+        help="Load the system from this GTFS static feed (a zip, or a directory of its extracted files) "
+        "instead of the MBTA API, with no network access",
+    )
+    parser.add_argument(
+        "--graph-snapshot",
+        metavar="PATH",
+        help="Find paths of lines (find-path, and serve's /find-path) with the graph snapshot at PATH, written by "
+        "write-graph-snapshot, instead of loading the system. Workers sharing a snapshot share its memory, and serve "
+        "switches to a newer snapshot written to the same path",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="Maximum number of concurrent requests to the MBTA API (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=None,
+        help="Records to request per page from the MBTA API, pages after the first are fetched concurrently "
+        "(default: let the API decide)",
+    )
+    parser.add_argument(
+        "--metrics",
+        nargs="?",
+        const="-",
+        metavar="PATH",
+        help="Write request timings and sizes, cache hits and misses and phase timings as JSON to PATH "
+        "(stderr if no PATH is given) when the command finishes",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Profile the command with cProfile and dump the stats to PATH (read them with pstats or snakeviz)",
+    )
+
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     # question 1
@@ -127,16 +411,140 @@ def main() -> None:
         type=str,
         help="Name of the ending subway stop (casing does not matter)",
     )
+    parser_find_path.add_argument(
+        "--by",
+        choices=("routes", *OBJECTIVES),
+        default="routes",
+        help="What to optimize for: 'routes' lists the lines to take with the fewest transfers, "
+        "'stops' and 'transfers' give a stop-by-stop itinerary with the fewest stops or fewest transfers (default: %(default)s)",
+    )
+    alternatives = parser_find_path.add_mutually_exclusive_group()
+    alternatives.add_argument(
+        "--alternatives",
+        type=int,
+        metavar="K",
+        help="List up to K alternative paths of lines, fewest transfers first",
+    )
+    alternatives.add_argument(
+        "--all-minimal",
+        action="store_true",
+        help="List every path of lines with the fewest transfers",
+    )
+    parser_find_path.add_argument(
+        "--avoid",
+        action="append",
+        default=[],
+        metavar="ROUTE",
+        help="Don't use this line (id or name, e.g. for a planned outage), can be repeated",
+    )
+    parser_find_path.add_argument(
+        "--depart",
+        type=parse_time,
+        metavar="HH:MM",
+        help="Find the scheduled journeys leaving at or after this time instead: the earliest arrival, and any with "
+        "fewer transfers arriving later. Needs --gtfs-feed",
+    )
+    parser_find_path.add_argument(
+        "--date",
+        type=date.fromisoformat,
+        default=date.today(),
+        metavar="YYYY-MM-DD",
+        help="Day of travel for --depart (default: today)",
+    )
+    parser_find_path.add_argument(
+        "--batch",
+        type=str,
+        metavar="FILE",
+        help='Find paths for many pairs instead: a file (or "-" for stdin) with one {"start": ..., "end": ...} JSON object '
+        "or tab separated start and end per line. Results are written to stdout as JSON lines",
+    )
 
-    args = parser.parse_args()
-    if args.command == "question-1":
-        question_1()
-    elif args.command == "question-2":
-        question_2()
-    elif args.command == "find-path":
-        question_3(args)
-    else:
-        parser.print_help()
+    # serve
+    parser_serve = subparsers.add_parser(
+        "serve",
+        help="Serve question-1, question-2 and find-path over a local HTTP API with the data kept warm in memory",
+    )
+    parser_serve.add_argument("--host", type=str, default="127.0.0.1")
+    parser_serve.add_argument("--port", type=int, default=8000)
+    parser_serve.add_argument(
+        "--refresh-interval",
+        type=float,
+        default=None,
+        help="Seconds between background reloads of the data, 0 to never reload (default: an hour)",
+    )
+    parser_serve.add_argument(
+        "--alerts",
+        action="store_true",
+        help="Follow the live alerts stream and route /find-path around the stops of suspensions and shuttles",
+    )
+
+    # write graph snapshot
+    parser_write_snapshot = subparsers.add_parser(
+        "write-graph-snapshot",
+        help="Write the graph of subway routes and the stop names to a file for --graph-snapshot",
+    )
+    parser_write_snapshot.add_argument("path", metavar="PATH")
+
+    args = parser.parse_args(argv)
+    if args.command == "find-path" and not args.batch and not (args.start and args.end):
+        parser_find_path.error("--start and --end are required unless using --batch")
+    if args.command == "find-path" and (
+        args.alternatives or args.all_minimal or args.avoid
+    ):
+        if args.by != "routes" or args.depart is not None or args.batch:
+            parser_find_path.error(
+                "--alternatives, --all-minimal and --avoid only work with --by routes"
+            )
+        if args.alternatives is not None and args.alternatives < 1:
+            parser_find_path.error("--alternatives must be at least 1")
+    if args.command == "serve" and args.alerts:
+        if args.graph_snapshot:
+            parser_serve.error("--alerts can't be applied to a --graph-snapshot")
+        if args.offline:
+            parser_serve.error("--alerts follows a live stream, it can't be --offline")
+    if args.command == "find-path" and args.depart is not None and not args.gtfs_feed:
+        parser_find_path.error(
+            "--depart needs the schedules of a GTFS feed, use --gtfs-feed"
+        )
+    return parser, args
+
+
+def main() -> None:
+    parser, args = parse_args()
+    configure_max_concurrency(args.max_concurrency)
+    configure_page_limit(args.page_size)
+    configure_snapshot_cache(
+        SnapshotCache(
+            directory=args.cache_dir,
+            ttl_seconds=args.cache_ttl,
+            offline=args.offline,
+            refresh=args.refresh,
+        )
+    )
+    if args.gtfs_feed:
+        configure_gtfs_feed(args.gtfs_feed)
+
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        with metrics.phase(f"command.{args.command}"):
+            run_command(parser, args)
+    except (SnapshotUnavailableError, FetchError) as e:
+        # the stops of every route are fetched concurrently, and can all be missing
+        if not all(isinstance(f, SnapshotUnavailableError) for f in failures(e)):
+            raise
+        print(failures(e)[0], file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.metrics:
+            write_metrics(args.metrics)
 
 
 if __name__ == "__main__":
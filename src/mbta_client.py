@@ -1,87 +1,609 @@
 import os
+import sys
+import threading
+import time
 from collections import defaultdict
-from functools import lru_cache
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator
+from urllib.parse import parse_qs, urlparse
 
-from dotenv import load_dotenv
-from requests import get
+from bulk_loader import (
+    build_route_stop_mappings,
+    parse_route_patterns,
+    route_stop_sequences,
+)
+from caching import cached
+from fetch_engine import DEFAULT_MAX_CONCURRENCY, failures, fetch_concurrently
+from instrumentation import metrics
+from json_stream import JsonApiStream
+from models import Route, RoutePattern, Stop
+from snapshot_cache import SnapshotCache
+from stop_name_index import StopNameIndex
 
-from models import Route, Stop
+# requests (via transport) takes longer to import than answering from a snapshot does, so it's only imported to make
+# the first request. Nothing here touches the environment, the disk or the network at import time either.
+if TYPE_CHECKING:
+    from requests import Response
 
-load_dotenv(dotenv_path="../.secrets.env")
-MBTA_API_KEY = os.getenv("MBTA_API_KEY")
-if not MBTA_API_KEY:
-    print(
-        "Warning: no 'MBTA_API_KEY' set in .secrets.env, you may get rate limited...\n"
+    from gtfs_source import GtfsNetwork, ScheduledTrip
+    from transport import MbtaTransport
+
+SECRETS_PATH = Path(__file__).resolve().parent.parent / ".secrets.env"
+
+# overridable so the client can be pointed at a local stand-in for the API
+MBTA_API_BASE_URL = os.getenv("MBTA_API_BASE_URL", "https://api-v3.mbta.com")
+
+# bytes read from the network at a time when streaming a response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_snapshot_cache: SnapshotCache | None = SnapshotCache()
+_max_concurrency = DEFAULT_MAX_CONCURRENCY
+# None lets the API decide (it currently sends everything in one page)
+_page_limit: int | None = None
+
+# when set, the system is loaded from this GTFS static feed instead of the API
+_gtfs_feed_path: Path | None = None
+
+# set by configure_cache_ttl, for the fetchers and the caches of what is built from them
+_cache_ttl: float | None = None
+_cache_stale_ttl = 0.0
+
+# built on first use by _get_transport
+_transport: "MbtaTransport | None" = None
+_transport_lock = threading.Lock()
+
+
+@cached(maxsize=1)
+def get_api_key() -> str | None:
+    """
+    Reads the API key on first use: the MBTA_API_KEY environment variable, which can be set in the .secrets.env file
+    at the root of the repo. Warns (once) if there isn't one.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=SECRETS_PATH)
+    api_key = os.getenv("MBTA_API_KEY")
+    if not api_key:
+        print(
+            "Warning: no 'MBTA_API_KEY' set in .secrets.env, you may get rate limited...\n",
+            file=sys.stderr,
+        )
+    return api_key
+
+
+def _get_transport() -> "MbtaTransport":
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            from transport import MbtaTransport
+
+            _transport = MbtaTransport(
+                api_key=get_api_key(), pool_size=_max_concurrency
+            )
+        return _transport
+
+
+def configure_max_concurrency(max_concurrency: int) -> None:
+    """
+    Sets the upper bound on concurrent requests made when fanning out over routes or pages.
+    :param max_concurrency: maximum number of in-flight requests
+    """
+    global _max_concurrency
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    _max_concurrency = max_concurrency
+    # rebuilt with a pool of the new size on the next request
+    configure_transport(None)
+
+
+def configure_transport(transport: "MbtaTransport | None") -> None:
+    """
+    Swaps the transport every request goes through, e.g. to change its retry policy.
+    :param transport: the transport to use, None to build the default one on the next request
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = transport
+
+
+def configure_page_limit(page_limit: int | None) -> None:
+    """
+    Sets the number of records requested per page, None to leave it to the API.
+    Pages after the first are fetched concurrently, up to the max concurrency at a time.
+    :param page_limit: records per page
+    """
+    global _page_limit
+    if page_limit is not None and page_limit < 1:
+        raise ValueError("page_limit must be at least 1")
+    _page_limit = page_limit
+
+
+def configure_snapshot_cache(cache: SnapshotCache | None) -> None:
+    """
+    Swaps the on-disk snapshot layer used by the fetchers (None disables it) and clears the in-process caches.
+    :param cache: the snapshot cache to use
+    """
+    global _snapshot_cache
+    _snapshot_cache = cache
+    clear_caches()
+
+
+def configure_gtfs_feed(path: Path | str | None) -> None:
+    """
+    Loads the system from a local GTFS static feed instead of the MBTA API, so nothing goes to the network.
+    Clears the in-process caches.
+    :param path: the feed zip (or a directory of its extracted files), None to go back to the API
+    """
+    global _gtfs_feed_path
+    _gtfs_feed_path = Path(path) if path is not None else None
+    clear_caches()
+
+
+def clear_caches() -> None:
+    """
+    Clears the in-process caches so the next call to each fetcher reloads (from the snapshot cache or the API), along
+    with the caches of what is built from them.
+    """
+    for fetcher in _CACHED_FETCHERS:
+        fetcher.cache_clear()
+    _clear_derived_caches()
+
+
+def _clear_gtfs_fetchers() -> None:
+    for fetcher in _CACHED_FETCHERS:
+        if fetcher is not _load_gtfs_network:
+            fetcher.cache_clear()
+
+
+def _clear_derived_caches() -> None:
+    for cached in _derived_caches:
+        cached.cache_clear()
+
+
+def expire_caches() -> None:
+    """
+    Like ``clear_caches``, but the snapshots are expired too, so the next call to each fetcher revalidates its snapshot
+    with the API (only fetching it again if it changed) and a reload picks up what changed upstream whatever the
+    snapshot ttl.
+    """
+    if _snapshot_cache is not None:
+        _snapshot_cache.expire()
+    clear_caches()
+
+
+def register_derived_cache(cached: Callable) -> Callable:
+    """
+    Registers the cache of something built from what the fetchers load, e.g. a graph, so it is cleared along with
+    theirs whenever the data (or where it comes from) changes, including when a fetcher's expired value is reloaded
+    and came back different.
+    It expires along with them too (see ``configure_cache_ttl``).
+    :param cached: the cached function
+    :return: the same function
+    """
+    cached.ttl, cached.stale_ttl = _cache_ttl, _cache_stale_ttl
+    _derived_caches.append(cached)
+    return cached
+
+
+def configure_cache_ttl(ttl: float | None, stale_ttl: float = 0.0) -> None:
+    """
+    Sets how long the in-process caches keep what the fetchers loaded, e.g. for a long running process.
+    Concurrent calls of a fetcher share a single load whatever the ttl.
+    What is built from what they load (see ``register_derived_cache``) expires the same way, so it goes back to the
+    fetchers, and is dropped once one of them reloads a value that changed, so it's rebuilt from the new one rather
+    than kept until it expires again.
+    :param ttl: seconds a loaded value is fresh for, None to keep it until the caches are cleared
+    :param stale_ttl: seconds after the ttl during which the stale value is served while it is reloaded in the
+        background
+    """
+    global _cache_ttl, _cache_stale_ttl
+    if ttl is not None and ttl <= 0:
+        raise ValueError("ttl must be positive")
+    if stale_ttl < 0:
+        raise ValueError("stale_ttl can't be negative")
+    _cache_ttl, _cache_stale_ttl = ttl, stale_ttl
+    for cached in (*_CACHED_FETCHERS, *_derived_caches):
+        cached.ttl, cached.stale_ttl = ttl, stale_ttl
+
+
+def _request(
+    url: str,
+    params: dict[str, str] | None,
+    validators: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+) -> "Response":
+    """
+    Opens a streamed response through the shared transport.
+    :param url: URL to request
+    :param params: query params for the request (None when they are already part of the URL)
+    :param validators: validators of a cached copy, to make the request conditional
+    :param headers: extra headers for the request
+    :return: the response, which is a 304 if the cached copy is still valid
+    :raises HTTPError: on an error status
+    """
+    response = _get_transport().get(
+        url, params=params, validators=validators, stream=True, headers=headers
     )
+    if response.status_code >= 400:
+        response.close()
+        response.raise_for_status()
+    return response
 
-MBTA_API_BASE_URL = "https://api-v3.mbta.com"
 
+def _stream_page(response: "Response", included: list[dict]) -> Iterator[dict]:
+    """
+    Streams the ``data`` records of a single page of an API response, without holding the whole body in memory.
+    :param response: the streamed response for the page
+    :param included: list the ``included`` records of the page are added to
+    :return: the ``links`` of the page, as the generator's return value
+    """
+    received = 0
 
-@lru_cache(maxsize=1)
-def get_subway_routes() -> list[Route]:
-    url = f"{MBTA_API_BASE_URL}/routes"
+    def counted(chunks: Iterator[bytes]) -> Iterator[bytes]:
+        nonlocal received
+        for chunk in chunks:
+            received += len(chunk)
+            yield chunk
+
+    start = time.perf_counter()
+    with response:
+        stream = JsonApiStream(counted(response.iter_content(STREAM_CHUNK_SIZE)))
+        yield from stream
+    # the time spent by the consumer between records is included, as the body is read as it is consumed
+    metrics.record_request(
+        urlparse(response.url).path,
+        response.status_code,
+        response.elapsed.total_seconds() + time.perf_counter() - start,
+        received,
+    )
+    included.extend(stream.members.get("included", []))
+    return stream.members.get("links") or {}
+
+
+def _read_page(url: str, params: dict[str, str]) -> tuple[list[dict], list[dict]]:
+    included = []
+    return list(_stream_page(_request(url, params), included)), included
+
+
+def _page_params(link: str | None) -> dict[str, str]:
+    if not link:
+        return {}
+    return {k: v[0] for k, v in parse_qs(urlparse(link).query).items()}
+
+
+def _remaining_page_offsets(links: dict) -> tuple[list[int], int] | None:
+    """
+    :param links: ``links`` of the first page
+    :return: the offsets of the remaining pages and the page limit, or None if the links don't say
+    """
+    next_params, last_params = _page_params(links.get("next")), _page_params(
+        links.get("last")
+    )
+    try:
+        limit = int(next_params["page[limit]"])
+        first = int(next_params["page[offset]"])
+        last = int(last_params["page[offset]"])
+    except (KeyError, ValueError):
+        return None
+    if limit < 1:
+        return None
+    return list(range(first, last + 1, limit)), limit
+
+
+def _iter_api_data(
+    url: str, params: dict[str, str], first_page: "Response", included: list[dict]
+) -> Iterator[dict]:
+    """
+    Streams the ``data`` records of an API request across every page of the response.
+    Once the first page gives the offset of the last one, the rest are fetched concurrently, a window at a time and
+    yielded in order. Otherwise the ``next`` links are followed one by one.
+    :param url: URL of the request
+    :param params: query params for the request
+    :param first_page: the already opened response for the first page
+    :param included: list the ``included`` records of every page are added to
+    :return: the number of pages, as the generator's return value
+    """
+    links = yield from _stream_page(first_page, included)
+    page_count = 1
+
+    remaining = _remaining_page_offsets(links)
+    if remaining is None:
+        while links.get("next"):
+            links = yield from _stream_page(_request(links["next"], None), included)
+            page_count += 1
+        return page_count
+
+    offsets, limit = remaining
+    for i in range(0, len(offsets), _max_concurrency):
+        pages = fetch_concurrently(
+            lambda offset: _read_page(
+                url, {**params, "page[offset]": str(offset), "page[limit]": str(limit)}
+            ),
+            offsets[i : i + _max_concurrency],
+            max_concurrency=_max_concurrency,
+        )
+        for data, page_included in pages.values():
+            included.extend(page_included)
+            yield from data
+    return page_count + len(offsets)
+
+
+def _iter_mbta_data(
+    path: str, params: dict[str, str], included: list[dict] | None = None
+) -> Iterator[dict]:
     """
+    Streams the ``data`` records for an API request, going through the snapshot cache when one is configured.
+    An expired snapshot is revalidated with a conditional request, so if nothing changed only headers are sent back.
+    :param path: API path e.g. "/routes"
+    :param params: query params for the request
+    :param included: optional list the ``included`` records of the response are added to
+    """
+    key = SnapshotCache.key_for(path, params)
+    revalidation = None
+    if _snapshot_cache is not None:
+        document = _snapshot_cache.load(key)
+        metrics.increment("snapshots.hits" if document else "snapshots.misses")
+        if document is not None:
+            if included is not None:
+                included.extend(document["included"])
+            yield from document["data"]
+            return
+        revalidation = _snapshot_cache.load_for_revalidation(key)
+
+    url = f"{MBTA_API_BASE_URL}{path}"
+    first_params = dict(params)
+    if _page_limit is not None:
+        first_params.update({"page[offset]": "0", "page[limit]": str(_page_limit)})
+    response = _request(url, first_params, revalidation[1] if revalidation else None)
+
+    if response.status_code == 304:
+        response.close()
+        metrics.record_request(path, 304, response.elapsed.total_seconds(), 0)
+        metrics.increment("snapshots.revalidated")
+        document, validators = revalidation
+        _snapshot_cache.store(key, document, validators)
+        if included is not None:
+            included.extend(document["included"])
+        yield from document["data"]
+        return
+
+    from transport import validators_for
+
+    # the snapshot needs the raw records, only keep hold of them when there is one to write
+    records = [] if _snapshot_cache is not None else None
+    validators = validators_for(response)
+    fetched_included = []
+    data = _iter_api_data(url, params, response, fetched_included)
+    while True:
+        try:
+            record = next(data)
+        except StopIteration as done:
+            page_count = done.value
+            break
+        if records is not None:
+            records.append(record)
+        yield record
+
+    if included is not None:
+        included.extend(fetched_included)
+    if _snapshot_cache is not None:
+        # the validators of the first page say nothing about the others
+        _snapshot_cache.store(
+            key,
+            {"data": records, "included": fetched_included},
+            validators if page_count == 1 else None,
+        )
+
+
+def _get_mbta_document(path: str, params: dict[str, str]) -> dict:
+    """
+    Fetches the whole JSON:API document for an API request.
+    :param path: API path e.g. "/routes"
+    :param params: query params for the request
+    :return: the document, trimmed down to its ``data`` and ``included`` members
+    """
+    included = []
+    data = list(_iter_mbta_data(path, params, included))
+    return {"data": data, "included": included}
+
+
+@cached(maxsize=1)
+def _load_gtfs_network() -> "GtfsNetwork":
+    # imported here as zipfile (and the compression modules it pulls in) is only needed for a GTFS feed
+    from gtfs_source import load_feed
+
+    with metrics.phase("gtfs.load"):
+        return load_feed(_gtfs_feed_path)
+
+
+@cached(maxsize=2)
+def get_subway_scheduled_trips(
+    service_date: date | None = None,
+) -> list["ScheduledTrip"]:
+    """
+    Loads the schedule of every subway trip, which is only available from a GTFS feed.
+    :param service_date: only the trips running on this date, None for every trip in the feed
+    :raises ValueError: if the system isn't loaded from a GTFS feed
+    """
+    if _gtfs_feed_path is None:
+        raise ValueError(
+            "Schedules are only available from a GTFS feed, use --gtfs-feed"
+        )
+    from gtfs_source import load_feed
+
+    with metrics.phase("gtfs.load_schedule"):
+        return load_feed(
+            _gtfs_feed_path, service_date=service_date, include_trips=True
+        ).trips
+
+
+def iter_subway_routes() -> Iterator[Route]:
+    """
+    Streams the subway routes from the API (or the GTFS feed), sorted by name, without caching them in process.
     Note: filtering at the API layer versus locally for several reasons:
         1. Reduces the amount to load from the server (less network traffic) and less to process locally.
         2. Presumably, the database table has an index that makes it a faster operation
         for the API to do then locally.
     """
-
     params = {
         "filter[type]": "0,1",
         "sort": "long_name",
     }  # type 0 = Light Rail, type 1 = Heavy Rail
-    headers = {"x-api-key": MBTA_API_KEY}
-    response = get(url=url, params=params, headers=headers)
-    response.raise_for_status()
-    return [Route.from_mbta_json(item) for item in response.json()["data"]]
+    if _gtfs_feed_path is not None:
+        yield from _load_gtfs_network().routes
+        return
+    for item in _iter_mbta_data("/routes", params):
+        yield Route.from_mbta_json(item)
 
 
-@lru_cache(maxsize=1)
-def get_subway_stops() -> list[Stop]:
-    url = f"{MBTA_API_BASE_URL}/stops"
+def iter_subway_stops() -> Iterator[Stop]:
+    """
+    Streams the subway stops from the API (or the GTFS feed), without caching them in process.
+    """
     params = {
         "filter[route_type]": "0,1",
     }  # type 0 = Light Rail, type 1 = Heavy Rail
-    headers = {"x-api-key": MBTA_API_KEY}
-    response = get(url=url, params=params, headers=headers)
-    response.raise_for_status()
-    return [Stop.from_mbta_json(item) for item in response.json()["data"]]
+    if _gtfs_feed_path is not None:
+        yield from _load_gtfs_network().stops
+        return
+    for item in _iter_mbta_data("/stops", params):
+        yield Stop.from_mbta_json(item)
 
 
-@lru_cache()
+def iter_subway_alert_events() -> Iterator[tuple[str, str]]:
+    """
+    Follows the streaming (server-sent events) interface of the subway alerts until the connection closes, without
+    polling or caching anything. The first event is a ``reset`` with every current alert, the rest ``add``, ``update``
+    or ``remove`` one alert as it changes.
+    :return: the type and (JSON) data of every event
+    :raises HTTPError: on an error status
+    """
+    # imported here as only services following the alerts need it
+    from alerts import iter_server_sent_events
+
+    params = {"filter[route_type]": "0,1"}  # type 0 = Light Rail, type 1 = Heavy Rail
+    response = _request(
+        f"{MBTA_API_BASE_URL}/alerts", params, headers={"Accept": "text/event-stream"}
+    )
+    # the stream is UTF-8 whatever the headers say
+    response.encoding = "utf-8"
+    with response:
+        for event in iter_server_sent_events(response.iter_lines(decode_unicode=True)):
+            metrics.increment("alerts.events")
+            yield event
+
+
+@cached(maxsize=1)
+def get_subway_routes() -> list[Route]:
+    return list(iter_subway_routes())
+
+
+@cached(maxsize=1)
+def get_subway_stops() -> list[Stop]:
+    return list(iter_subway_stops())
+
+
+@cached()
 def get_stops_for_route(route_id: str) -> list[Stop]:
-    url = f"{MBTA_API_BASE_URL}/stops"
+    if _gtfs_feed_path is not None:
+        network = _load_gtfs_network()
+        stop_ids = {
+            stop_id
+            for pattern in network.route_patterns
+            if pattern.route_id == route_id
+            for stop_id in pattern.stop_ids
+        }
+        return [s for s in network.stops if s.id in stop_ids]
     params = {"include": "route", "filter[route]": route_id}
-    headers = {"x-api-key": MBTA_API_KEY}
-    response = get(url=url, params=params, headers=headers)
-    response.raise_for_status()
-    return [Stop.from_mbta_json(item) for item in response.json()["data"]]
+    return [Stop.from_mbta_json(item) for item in _iter_mbta_data("/stops", params)]
 
 
-@lru_cache(maxsize=1)
-def get_subway_route_to_stops_mapping() -> dict[Route, set[Stop]]:
+@cached(maxsize=1)
+def get_subway_route_patterns() -> list[RoutePattern]:
+    """
+    Loads the ordered stops of every subway route pattern (each route has at least one per direction)
+    in a single request, instead of one request per route.
+    """
+    if _gtfs_feed_path is not None:
+        return list(_load_gtfs_network().route_patterns)
+    params = {
+        "filter[route]": ",".join(r.id for r in get_subway_routes()),
+        "include": "representative_trip.stops",
+    }
+    return parse_route_patterns(_get_mbta_document("/route_patterns", params))
+
+
+@cached(maxsize=1)
+def get_subway_route_stop_sequences() -> dict[str, list[list[str]]]:
+    """
+    :return: mapping of route id to its stop id sequences, one per route pattern
+    """
+    return route_stop_sequences(get_subway_route_patterns())
+
+
+def _load_subway_route_to_stops_per_route() -> dict[Route, set[Stop]]:
     routes = get_subway_routes()
-    return {r: set(get_stops_for_route(r.id)) for r in routes}
+    # fan out over the routes concurrently, results come back in route order
+    stops_by_route_id = fetch_concurrently(
+        get_stops_for_route, [r.id for r in routes], max_concurrency=_max_concurrency
+    )
+    return {r: set(stops_by_route_id[r.id]) for r in routes}
+
+
+@cached(maxsize=1)
+def _load_subway_route_stop_mappings() -> (
+    tuple[dict[Route, set[Stop]], dict[Stop, set[Route]]]
+):
+    """
+    Builds the route -> stops and stop -> routes mappings together from the bulk route pattern data:
+    3 requests (routes, stops, route patterns) no matter how large the system is.
+    Falls back to fetching the stops of each route if the API rejects the bulk request.
+    """
+    try:
+        sequences = get_subway_route_stop_sequences()
+    except Exception as e:
+        # requests is imported by the time a request fails
+        from requests import HTTPError
+
+        # the pages after the first are fetched concurrently, and can all be rejected
+        if not all(
+            isinstance(f, HTTPError)
+            and f.response is not None
+            and f.response.status_code == 400
+            for f in failures(e)
+        ):
+            raise
+        route_to_stops = _load_subway_route_to_stops_per_route()
+        stop_to_routes = defaultdict(set)
+        for route, stops in route_to_stops.items():
+            for stop in stops:
+                stop_to_routes[stop].add(route)
+        return route_to_stops, dict(stop_to_routes)
+
+    routes, stops = get_subway_routes(), get_subway_stops()
+    with metrics.phase("mappings.build"):
+        return build_route_stop_mappings(routes, stops, sequences)
+
+
+def get_subway_route_to_stops_mapping() -> dict[Route, set[Stop]]:
+    return _load_subway_route_stop_mappings()[0]
 
 
-@lru_cache(maxsize=1)
 def get_subway_stop_to_routes_mapping() -> dict[Stop, set[Route]]:
-    stop_to_routes_mapping = defaultdict(set)
-    for route, stops in get_subway_route_to_stops_mapping().items():
-        for stop in stops:
-            stop_to_routes_mapping[stop].add(route)
+    return _load_subway_route_stop_mappings()[1]
+
 
-    return stop_to_routes_mapping
+@cached(maxsize=1)
+def _get_subway_stop_id_to_routes_mapping() -> dict[str, set[Route]]:
+    return {s.id: routes for s, routes in get_subway_stop_to_routes_mapping().items()}
 
 
 def get_subway_routes_for_stop(stop_id: str) -> set[Route]:
-    url = f"{MBTA_API_BASE_URL}/routes"
-    params = {"filter[type]": "0,1", "filter[stop]": stop_id}
-    headers = {"x-api-key": MBTA_API_KEY}
-    response = get(url=url, params=params, headers=headers)
-    response.raise_for_status()
-    return {Route.from_mbta_json(item) for item in response.json()["data"]}
+    # answered from the bulk loaded mapping rather than a live request per stop
+    return set(_get_subway_stop_id_to_routes_mapping().get(stop_id, set()))
 
 
 def get_subway_route_id_to_name_mapping() -> dict[str, str]:
@@ -92,3 +614,40 @@ def get_subway_route_id_to_name_mapping() -> dict[str, str]:
 def get_subway_stop_name_to_id_mapping() -> dict[str, str]:
     stops = get_subway_stops()
     return {s.name: s.id for s in stops}
+
+
+@cached(maxsize=1)
+def get_subway_stop_name_index() -> StopNameIndex:
+    """
+    Unlike get_subway_stop_name_to_id_mapping, keeps every stop id of names shared by several stops
+    and supports prefix and fuzzy lookups.
+    """
+    return StopNameIndex(get_subway_stops())
+
+
+# registered with register_derived_cache
+_derived_caches: list[Callable] = []
+
+# what is loaded from the API (or the GTFS feed)
+_CACHED_FETCHERS = (
+    _load_gtfs_network,
+    get_subway_scheduled_trips,
+    get_subway_routes,
+    get_subway_stops,
+    get_stops_for_route,
+    get_subway_route_patterns,
+)
+for _fetcher in _CACHED_FETCHERS:
+    metrics.register_cache(_fetcher)
+    _fetcher.add_reload_callback(_clear_derived_caches)
+# fetchers loading from what another one loaded, so they aren't kept from the value it replaced
+_load_gtfs_network.add_reload_callback(_clear_gtfs_fetchers)
+get_subway_routes.add_reload_callback(get_subway_route_patterns.cache_clear)
+for _derived in (
+    get_subway_route_stop_sequences,
+    _load_subway_route_stop_mappings,
+    _get_subway_stop_id_to_routes_mapping,
+    get_subway_stop_name_index,
+):
+    metrics.register_cache(_derived)
+    register_derived_cache(_derived)
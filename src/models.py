@@ -1,12 +1,83 @@
-from pydantic import BaseModel, ConfigDict
+from typing import Any
 
+# Field type checks cost time in the hot parse path, turn them off with set_validation(False) once the input is trusted
+_validate = True
 
-class Route(BaseModel):
-    model_config = ConfigDict(frozen=True)
+
+def set_validation(enabled: bool) -> None:
+    """
+    Toggles the type checks done when constructing models.
+    :param enabled: whether to validate field types
+    """
+    global _validate
+    _validate = enabled
+
+
+class _FrozenModel:
+    """
+    Minimal immutable record: keyword construction, equality on every field and a hash cached at construction.
+    Uses ``__slots__`` so instances have no ``__dict__`` and stay small. Subclasses spell out ``__init__`` rather than
+    looping over ``_fields``, as construction is the hot path when parsing API responses.
+    """
+
+    __slots__ = ("_hash",)
+    _fields: tuple[str, ...] = ()
+
+    def _check(self, name: str, value: Any, field_type: type) -> None:
+        if not isinstance(value, field_type):
+            raise ValueError(
+                f"{type(self).__name__}.{name} should be a {field_type.__name__}"
+            )
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        if self is other:
+            return True
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._hash == other._hash and all(
+            getattr(self, name) == getattr(other, name) for name in self._fields
+        )
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({fields})"
+
+    def __reduce__(self):
+        return _rebuild, (
+            type(self),
+            {name: getattr(self, name) for name in self._fields},
+        )
+
+
+def _rebuild(cls: type, fields: dict[str, Any]) -> _FrozenModel:
+    return cls(**fields)
+
+
+class Route(_FrozenModel):
+    __slots__ = ("id", "long_name")
+    _fields = ("id", "long_name")
 
     id: str
     long_name: str
 
+    def __init__(self, *, id: str, long_name: str):
+        if _validate:
+            self._check("id", id, str)
+            self._check("long_name", long_name, str)
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "long_name", long_name)
+        # ids are unique, so hashing on them alone is enough and cheaper
+        object.__setattr__(self, "_hash", hash(id))
+
     def __lt__(self, other):
         return self.long_name < other.long_name
 
@@ -19,12 +90,22 @@ class Route(BaseModel):
             raise ValueError("Unexpected format returned from MBTA API") from e
 
 
-class Stop(BaseModel):
-    model_config = ConfigDict(frozen=True)
+class Stop(_FrozenModel):
+    __slots__ = ("id", "name")
+    _fields = ("id", "name")
 
     id: str
     name: str
 
+    def __init__(self, *, id: str, name: str):
+        if _validate:
+            self._check("id", id, str)
+            self._check("name", name, str)
+        object.__setattr__(self, "id", id)
+        object.__setattr__(self, "name", name)
+        # ids are unique, so hashing on them alone is enough and cheaper
+        object.__setattr__(self, "_hash", hash(id))
+
     def __lt__(self, other):
         return self.name < other.name
 
@@ -35,3 +116,22 @@ class Stop(BaseModel):
             return cls(id=data["id"], name=data["attributes"]["name"])
         except KeyError as e:
             raise ValueError("Unexpected format returned from MBTA API") from e
+
+
+class RoutePattern(_FrozenModel):
+    __slots__ = ("route_id", "direction_id", "stop_ids")
+    _fields = ("route_id", "direction_id", "stop_ids")
+
+    route_id: str
+    direction_id: int
+    stop_ids: tuple[str, ...]  # in the order the trips of the pattern visit them
+
+    def __init__(self, *, route_id: str, direction_id: int, stop_ids: tuple[str, ...]):
+        if _validate:
+            self._check("route_id", route_id, str)
+            self._check("direction_id", direction_id, int)
+            self._check("stop_ids", stop_ids, tuple)
+        object.__setattr__(self, "route_id", route_id)
+        object.__setattr__(self, "direction_id", direction_id)
+        object.__setattr__(self, "stop_ids", stop_ids)
+        object.__setattr__(self, "_hash", hash((route_id, direction_id, stop_ids)))
@@ -1,11 +1,21 @@
 from collections import defaultdict, deque
+from datetime import date
+from typing import Collection, Iterable
 
+from caching import cached
+from instrumentation import metrics
 from mbta_client import (
-    get_subway_routes_for_stop,
+    get_subway_route_patterns,
+    get_subway_routes,
+    get_subway_scheduled_trips,
     get_subway_stop_to_routes_mapping,
-    get_subway_route_id_to_name_mapping,
+    get_subway_stops,
+    register_derived_cache,
 )
 from models import Stop, Route
+from raptor import DEFAULT_MAX_TRANSFERS, Journey, Timetable
+from stop_routing import Itinerary, StopGraph
+from transit_graph import TransitGraph
 
 
 def build_adjacency_list(
@@ -21,9 +31,13 @@ def build_adjacency_list(
     for routes in stop_to_routes_mapping.values():
         # if the stop has multiple routes then those routes are connected
         if len(routes) > 1:
-            for route in routes:
-                connected_route_ids = {r.id for r in routes} - {route.id}
-                adj_list[route.id].update(connected_route_ids)
+            route_ids = [r.id for r in routes]
+            for route_id in route_ids:
+                adj_list[route_id].update(route_ids)
+
+    # drop the self loops added above rather than building a new set per route per stop
+    for route_id, connected_route_ids in adj_list.items():
+        connected_route_ids.discard(route_id)
 
     return adj_list
 
@@ -38,28 +52,57 @@ def find_shortest_path(
     :param end: ending vertex for the path
     :return: List of vertices in the path or None if no path exists.
     """
-    # Using queue for O(1) operations
-    edge_queue = deque([(start, [start])])
-    visited = set[str]()
+    return find_shortest_path_between(adj_list, [start], {end})
 
-    while edge_queue:
-        vertex, path = edge_queue.popleft()
 
-        # if we reached the end, we have a shortest path
-        if vertex == end:
+def find_shortest_path_between(
+    adj_list: dict[str, set[str]], starts: Iterable[str], ends: Collection[str]
+) -> list[str] | None:
+    """
+    Multi-source, multi-target breadth-first search: finds a shortest path from any of the starts to any of the ends.
+    Only a parent pointer is stored per vertex, the path is rebuilt once at the end instead of copied on every step.
+    :param adj_list: An adjacency list for the graph of interest, mapping nodes to their respective sets of neighbors.
+    :param starts: vertices the path may start from, earlier starts win ties
+    :param ends: vertices the path may end at
+    :return: List of vertices in the path or None if no path exists.
+    """
+    # parents doubles as the visited set, the starts have no parent
+    parents: dict[str, str | None] = dict.fromkeys(starts)
+    # Using queue for O(1) operations
+    vertex_queue = deque(parents)
+
+    while vertex_queue:
+        vertex = vertex_queue.popleft()
+
+        # if we reached an end, we have a shortest path
+        if vertex in ends:
+            path = []
+            while vertex is not None:
+                path.append(vertex)
+                vertex = parents[vertex]
+            path.reverse()
             return path
 
-        # If we haven't reached the end, explore the adjacent vertices
-        for adjacent in adj_list[vertex]:
-            if adjacent not in visited:
-                # Add adjacent to our visited set so we don't loop or take longer paths
-                visited.add(adjacent)
-                edge_queue.append((adjacent, path + [adjacent]))
+        # If we haven't reached an end, explore the adjacent vertices
+        for adjacent in adj_list.get(vertex, ()):
+            if adjacent not in parents:
+                parents[adjacent] = vertex
+                vertex_queue.append(adjacent)
 
     # if we reach the end of the queue without a path, it's not possible
     return None
 
 
+@cached(maxsize=1)
+def get_subway_transit_graph() -> TransitGraph:
+    """
+    Builds the transit graph once per process from the (cached) stop to routes mapping.
+    """
+    mapping = get_subway_stop_to_routes_mapping()
+    with metrics.phase("transit_graph.build"):
+        return TransitGraph.from_stop_to_routes_mapping(mapping)
+
+
 def find_shortest_subway_path(start_id: str, end_id: str) -> list[str] | None:
     """
     Determines a viable subway route between two stops, given their ids
@@ -67,32 +110,113 @@ def find_shortest_subway_path(start_id: str, end_id: str) -> list[str] | None:
     :param end_id: ID of destination stop.
     :return: List of route names forming the path, or None if no path exists.
     """
-    routes_1 = get_subway_routes_for_stop(start_id)
-    routes_2 = get_subway_routes_for_stop(end_id)
+    return find_shortest_subway_path_between([start_id], [end_id])
 
-    if not (routes_1 and routes_2):
-        raise ValueError("Routes not found for both stops.")
 
-    # Direct connection check
-    common_routes = routes_1.intersection(routes_2)
-    if common_routes:
-        return [next(iter(common_routes)).long_name]
+def find_shortest_subway_path_between(
+    start_ids: list[str], end_ids: list[str]
+) -> list[str] | None:
+    """
+    Determines a viable subway route from any of the start stops to any of the end stops, e.g. when a name is shared by several stops.
+    :param start_ids: IDs of the stops the path may start from.
+    :param end_ids: IDs of the stops the path may end at.
+    :return: List of route names forming the path, or None if no path exists.
+    """
+    graph = get_subway_transit_graph()
+    with metrics.phase("search.routes"):
+        return graph.find_path_between(start_ids, end_ids)
+
+
+def find_subway_paths_between(
+    start_ids: list[str],
+    end_ids: list[str],
+    limit: int | None = None,
+    minimal_only: bool = False,
+    avoid_routes: Iterable[str] = (),
+) -> list[list[str]]:
+    """
+    Determines alternative subway routes from any of the start stops to any of the end stops, fewest transfers first.
+    :param start_ids: IDs of the stops the paths may start from.
+    :param end_ids: IDs of the stops the paths may end at.
+    :param limit: most paths to return, None for every path (which can be a lot of them on a large network).
+    :param minimal_only: only the paths with the fewest transfers.
+    :param avoid_routes: ids or long names of routes the paths may not use, e.g. for a planned outage.
+    :return: the paths as lists of route names, empty if no path exists.
+    """
+    graph = get_subway_transit_graph()
+    with metrics.phase("search.alternatives"):
+        return graph.find_paths_between(
+            start_ids, end_ids, limit, minimal_only, avoid_routes
+        )
+
+
+@cached(maxsize=1)
+def get_subway_stop_graph() -> StopGraph:
+    """
+    Builds the stop-level graph once per process from the (cached) route patterns.
+    """
+    routes, stops, patterns = (
+        get_subway_routes(),
+        get_subway_stops(),
+        get_subway_route_patterns(),
+    )
+    with metrics.phase("stop_graph.build"):
+        return StopGraph(routes, stops, patterns)
+
+
+def find_subway_itinerary(
+    start_ids: list[str], end_ids: list[str], objective: str = "stops"
+) -> Itinerary | None:
+    """
+    Determines the best stop-by-stop subway itinerary from any of the start stops to any of the end stops
+    :param start_ids: IDs of the stops the trip may start from.
+    :param end_ids: IDs of the stops the trip may end at.
+    :param objective: "stops" to ride the fewest stops, "transfers" to make the fewest transfers
+    :return: the itinerary, or None if no path exists.
+    """
+    graph = get_subway_stop_graph()
+    with metrics.phase(f"search.{objective}"):
+        return graph.find_itinerary(start_ids, end_ids, objective)
 
-    # Build route adjacency list
-    adj_list = build_adjacency_list(get_subway_stop_to_routes_mapping())
 
-    # Find a shortest path between routes
-    path = find_shortest_path(
-        adj_list, start=next(iter(routes_1)).id, end=next(iter(routes_2)).id
+@cached(maxsize=2)
+def get_subway_timetable(service_date: date | None = None) -> Timetable:
+    """
+    Builds the timetable once per process (and service date) from the scheduled trips of the GTFS feed.
+    :param service_date: only the trips running on this date, None for every trip in the feed
+    """
+    routes, stops, trips = (
+        get_subway_routes(),
+        get_subway_stops(),
+        get_subway_scheduled_trips(service_date),
     )
-    if not path:
-        return None
+    with metrics.phase("timetable.build"):
+        return Timetable(routes, stops, trips)
+
+
+def find_subway_journeys(
+    start_ids: list[str],
+    end_ids: list[str],
+    depart_at: int,
+    service_date: date | None = None,
+    max_transfers: int = DEFAULT_MAX_TRANSFERS,
+) -> list[Journey]:
+    """
+    Determines the scheduled subway journeys from any of the start stops to any of the end stops leaving at or after a
+    time: the earliest arrival, and every journey with fewer transfers that arrives later.
+    :param start_ids: IDs of the stops the journey may start from.
+    :param end_ids: IDs of the stops the journey may end at.
+    :param depart_at: earliest departure, in seconds since midnight.
+    :param service_date: the day of travel, None to consider every trip in the feed.
+    :param max_transfers: most transfers a journey may make.
+    :return: the journeys, fewest transfers first, empty if there are none.
+    """
+    timetable = get_subway_timetable(service_date)
+    with metrics.phase("search.timetable"):
+        return timetable.earliest_arrivals(start_ids, end_ids, depart_at, max_transfers)
 
-    # Convert route IDs to names
-    id_to_name_mapping = get_subway_route_id_to_name_mapping()
-    try:
-        route_names = [id_to_name_mapping[route_id] for route_id in path]
-    except KeyError as e:
-        raise ValueError(f"Route name could not be resolved from id") from e
 
-    return route_names
+for _builder in (get_subway_transit_graph, get_subway_stop_graph, get_subway_timetable):
+    metrics.register_cache(_builder)
+    # so a graph built from the previous data isn't kept when it is reloaded or comes from another source
+    register_derived_cache(_builder)
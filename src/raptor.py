@@ -0,0 +1,302 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+
+from models import Route, Stop
+
+# gtfs_source pulls in zipfile, which isn't needed to import this module
+if TYPE_CHECKING:
+    from gtfs_source import ScheduledTrip
+
+DEFAULT_TRANSFER_SECONDS = 120
+DEFAULT_MAX_TRANSFERS = 4
+
+_UNREACHED = 2**31 - 1
+
+
+class TimedLeg(NamedTuple):
+    route_id: str
+    route_name: str
+    board_stop_id: str
+    board_stop_name: str
+    departure: int  # seconds since midnight
+    alight_stop_id: str
+    alight_stop_name: str
+    arrival: int
+
+
+class Journey(NamedTuple):
+    departure: int  # when the first leg leaves, or the requested departure if there are no legs
+    arrival: int
+    legs: list[TimedLeg]
+
+    @property
+    def transfers(self) -> int:
+        return max(len(self.legs) - 1, 0)
+
+
+class Timetable:
+    """
+    Scheduled trips grouped into patterns (trips of a route calling at the same stops, that never overtake each other)
+    for RAPTOR (round-based public transit routing, Delling et al.). Everything is stored in flat arrays:
+        * ``pattern_stops`` - the stops of every pattern back to back, pattern ``p`` at ``pattern_stop_start[p]``
+        * ``arrivals``/``departures`` - the times of every trip at every stop of its pattern, stop-major so the
+          departures of a pattern's trips from a stop are contiguous and can be binary searched in place: pattern
+          ``p`` starts at ``pattern_time_start[p]`` and trip ``t`` is at stop ``i`` at ``start + i * trip_count + t``
+        * ``stop_patterns`` - the patterns calling at every stop, stop ``s`` at ``stop_pattern_start[s]``, with the
+          position of the stop in each pattern in ``stop_positions``
+    """
+
+    def __init__(
+        self,
+        routes: list[Route],
+        stops: list[Stop],
+        trips: Iterable["ScheduledTrip"],
+        transfer_seconds: int = DEFAULT_TRANSFER_SECONDS,
+    ):
+        """
+        :param routes: the routes the trips run on
+        :param stops: the stops the trips call at, trips calling at other stops are ignored
+        :param trips: the scheduled trips
+        :param transfer_seconds: minimum time to change between trips at a stop
+        """
+        self.routes = routes
+        self.stops = stops
+        self.transfer_seconds = transfer_seconds
+        self.stop_index = {s.id: i for i, s in enumerate(stops)}
+        route_index = {r.id: i for i, r in enumerate(routes)}
+
+        by_sequence = defaultdict(list)
+        for trip in trips:
+            if trip.route_id in route_index and all(
+                s in self.stop_index for s in trip.stop_ids
+            ):
+                by_sequence[(trip.route_id, trip.stop_ids)].append(trip)
+
+        self.pattern_routes = array("i")
+        self.pattern_stop_start = array("i", [0])
+        self.pattern_stops = array("i")
+        self.pattern_trip_count = array("i")
+        self.pattern_time_start = array("i", [0])
+        self.arrivals = array("i")
+        self.departures = array("i")
+        stop_patterns = defaultdict(list)
+
+        for (route_id, stop_ids), group in by_sequence.items():
+            for pattern_trips in _split_overtaking(group):
+                pattern = len(self.pattern_routes)
+                self.pattern_routes.append(route_index[route_id])
+                for position, stop_id in enumerate(stop_ids):
+                    self.pattern_stops.append(self.stop_index[stop_id])
+                    stop_patterns[self.stop_index[stop_id]].append((pattern, position))
+                self.pattern_stop_start.append(len(self.pattern_stops))
+                for position in range(len(stop_ids)):
+                    self.arrivals.extend(t.arrivals[position] for t in pattern_trips)
+                    self.departures.extend(
+                        t.departures[position] for t in pattern_trips
+                    )
+                self.pattern_trip_count.append(len(pattern_trips))
+                self.pattern_time_start.append(len(self.arrivals))
+
+        self.stop_pattern_start = array("i", [0])
+        self.stop_patterns = array("i")
+        self.stop_positions = array("i")
+        for stop in range(len(stops)):
+            for pattern, position in stop_patterns[stop]:
+                self.stop_patterns.append(pattern)
+                self.stop_positions.append(position)
+            self.stop_pattern_start.append(len(self.stop_patterns))
+
+    def earliest_arrivals(
+        self,
+        start_ids: Iterable[str],
+        end_ids: Iterable[str],
+        depart_at: int,
+        max_transfers: int = DEFAULT_MAX_TRANSFERS,
+    ) -> list[Journey]:
+        """
+        Finds the Pareto set of journeys over arrival time and transfers: the earliest arrival, then every journey with
+        fewer transfers that arrives later. Round k of RAPTOR finds the earliest arrivals using k trips, scanning only
+        the patterns through stops improved in the round before.
+        :param start_ids: IDs of the stops the journey may start from
+        :param end_ids: IDs of the stops the journey may end at
+        :param depart_at: earliest departure, in seconds since midnight of the service day
+        :param max_transfers: most transfers a journey may make
+        :return: the journeys, fewest transfers first (so latest arrival first), empty if there are none
+        :raises ValueError: if none of the start or end stops are in the timetable
+        """
+        origins = {self.stop_index[s] for s in start_ids if s in self.stop_index}
+        targets = {self.stop_index[s] for s in end_ids if s in self.stop_index}
+        if not origins or not targets:
+            raise ValueError("Stop is not served by any scheduled trip")
+        if origins & targets:
+            return [Journey(depart_at, depart_at, [])]
+
+        stop_count = len(self.stops)
+        # earliest arrival at every stop over all rounds so far, for pruning
+        best = [_UNREACHED] * stop_count
+        # time at which a trip can be boarded at every stop, using the trips of the rounds so far
+        ready = [_UNREACHED] * stop_count
+        for origin in origins:
+            best[origin] = ready[origin] = depart_at
+        # per round, stop -> (pattern, trip, boarding position, alighting position) of the stops it improved
+        rounds: list[dict[int, tuple[int, int, int, int]]] = [{}]
+        best_target = _UNREACHED
+        journeys = []
+        marked = origins
+
+        for _ in range(max_transfers + 1):
+            # the earliest marked position of every pattern through a marked stop
+            queue = {}
+            for stop in marked:
+                for i in range(
+                    self.stop_pattern_start[stop], self.stop_pattern_start[stop + 1]
+                ):
+                    pattern, position = self.stop_patterns[i], self.stop_positions[i]
+                    if queue.get(pattern, stop_count) > position:
+                        queue[pattern] = position
+
+            previous_ready = ready
+            ready = list(ready)
+            improved = {}
+            marked = set()
+            for pattern, first_position in queue.items():
+                self._scan_pattern(
+                    pattern,
+                    first_position,
+                    previous_ready,
+                    ready,
+                    best,
+                    best_target,
+                    improved,
+                    marked,
+                )
+                for stop in targets & marked:
+                    best_target = min(best_target, best[stop])
+            rounds.append(improved)
+
+            # with target pruning, reaching a target at all means arriving earlier than with fewer trips
+            arrivals = [(best[t], t) for t in targets if t in improved]
+            if arrivals:
+                journeys.append(self._journey(rounds, min(arrivals)[1], depart_at))
+            if not marked:
+                break
+
+        return journeys
+
+    def _scan_pattern(
+        self,
+        pattern: int,
+        first_position: int,
+        previous_ready: list[int],
+        ready: list[int],
+        best: list[int],
+        best_target: int,
+        improved: dict[int, tuple[int, int, int, int]],
+        marked: set[int],
+    ) -> None:
+        """
+        Rides the pattern from the first marked position, boarding the earliest trip that can be caught so far and
+        switching to an earlier one whenever a later stop can be reached in time for it.
+        """
+        # the hot loop of a query, so everything it touches is a local
+        pattern_stops, arrivals, departures = (
+            self.pattern_stops,
+            self.arrivals,
+            self.departures,
+        )
+        transfer_seconds = self.transfer_seconds
+        stops_start = self.pattern_stop_start[pattern]
+        stop_count = self.pattern_stop_start[pattern + 1] - stops_start
+        trip_count = self.pattern_trip_count[pattern]
+        times = self.pattern_time_start[pattern] + first_position * trip_count
+        trip, board_position = -1, -1
+
+        for position in range(first_position, stop_count):
+            stop = pattern_stops[stops_start + position]
+            if trip >= 0:
+                arrival = arrivals[times + trip]
+                if arrival < best[stop] and arrival < best_target:
+                    best[stop] = arrival
+                    ready[stop] = arrival + transfer_seconds
+                    improved[stop] = (pattern, trip, board_position, position)
+                    marked.add(stop)
+
+            can_board_at = previous_ready[stop]
+            if can_board_at != _UNREACHED and (
+                trip < 0 or can_board_at <= departures[times + trip]
+            ):
+                # the departures from this stop are in trip order, as the trips of a pattern never overtake
+                earlier = (
+                    bisect_left(departures, can_board_at, times, times + trip_count)
+                    - times
+                )
+                if earlier < trip_count and (trip < 0 or earlier < trip):
+                    trip, board_position = earlier, position
+            times += trip_count
+
+    def _journey(
+        self,
+        rounds: list[dict[int, tuple[int, int, int, int]]],
+        target: int,
+        depart_at: int,
+    ) -> Journey:
+        legs = []
+        stop, round_number = target, len(rounds) - 1
+        while round_number > 0:
+            # the label of the stop is from the latest round that improved it
+            while round_number > 0 and stop not in rounds[round_number]:
+                round_number -= 1
+            if round_number == 0:
+                break
+            pattern, trip, board_position, alight_position = rounds[round_number][stop]
+            legs.append(self._make_leg(pattern, trip, board_position, alight_position))
+            stop = self.pattern_stops[self.pattern_stop_start[pattern] + board_position]
+            round_number -= 1
+
+        legs.reverse()
+        return Journey(legs[0].departure if legs else depart_at, legs[-1].arrival, legs)
+
+    def _make_leg(
+        self, pattern: int, trip: int, board_position: int, alight_position: int
+    ) -> TimedLeg:
+        stops_start = self.pattern_stop_start[pattern]
+        trip_count = self.pattern_trip_count[pattern]
+        times = self.pattern_time_start[pattern] + trip
+        route = self.routes[self.pattern_routes[pattern]]
+        board = self.stops[self.pattern_stops[stops_start + board_position]]
+        alight = self.stops[self.pattern_stops[stops_start + alight_position]]
+        return TimedLeg(
+            route_id=route.id,
+            route_name=route.long_name,
+            board_stop_id=board.id,
+            board_stop_name=board.name,
+            departure=self.departures[times + board_position * trip_count],
+            alight_stop_id=alight.id,
+            alight_stop_name=alight.name,
+            arrival=self.arrivals[times + alight_position * trip_count],
+        )
+
+
+def _split_overtaking(
+    trips: list["ScheduledTrip"],
+) -> list[list["ScheduledTrip"]]:
+    """
+    Splits the trips calling at the same stops into groups where no trip overtakes another, as RAPTOR picks the trip
+    to board by binary search over the departures at a stop.
+    :param trips: trips with the same stops
+    :return: the groups, each sorted by departure
+    """
+    groups: list[list["ScheduledTrip"]] = []
+    for trip in sorted(trips, key=lambda t: (t.departures, t.arrivals)):
+        for group in groups:
+            last = group[-1]
+            if all(a <= b for a, b in zip(last.arrivals, trip.arrivals)) and all(
+                a <= b for a, b in zip(last.departures, trip.departures)
+            ):
+                group.append(trip)
+                break
+        else:
+            groups.append([trip])
+    return groups
@@ -0,0 +1,409 @@
+import copy
+import json
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from alerts import AlertSubscriber, DisruptionTracker, close_stops
+from graph_changes import apply_changes, diff_route_stops, update_name_index
+from helpers import find_multi_value_items
+from instrumentation import metrics
+from mbta_client import (
+    expire_caches,
+    get_subway_route_to_stops_mapping,
+    get_subway_routes,
+    get_subway_stop_name_index,
+    get_subway_stop_to_routes_mapping,
+    get_subway_stops,
+)
+from transit_graph import TransitGraph
+from transit_system_info import find_longest_and_shortest_route
+
+DEFAULT_REFRESH_INTERVAL_SECONDS = 60 * 60
+# longest wait before the disruptions are applied again, however far their next start or end is, as the wall clock
+# can jump (e.g. when the machine resumes)
+MAX_DISRUPTION_WAIT_SECONDS = 60.0
+
+
+class ServiceState:
+    """
+    Everything the service needs to answer queries, loaded in one go and not changed once built. A refresh (or an alert
+    event) builds a new state and swaps it in, so in-flight requests keep a consistent view without taking any lock.
+    The graph and name index of a refreshed state are copies of the previous ones updated with just what changed,
+    instead of rebuilds, and a refresh that fails leaves the previous state as it was.
+    """
+
+    def __init__(
+        self,
+        build_graph: bool = True,
+        previous: "ServiceState | None" = None,
+        disruptions: DisruptionTracker | None = None,
+    ):
+        """
+        :param build_graph: build the transit graph, which isn't needed when paths come from a graph snapshot
+        :param previous: the state being refreshed, whose graph and name index are copied and updated with the changes
+        :param disruptions: the disruptions to close stops of on the graph
+        """
+        routes = get_subway_routes()
+        route_to_stops_mapping = get_subway_route_to_stops_mapping()
+        stop_to_routes_mapping = get_subway_stop_to_routes_mapping()
+
+        self.loaded_at = time.time()
+        self.route_to_stops_mapping = route_to_stops_mapping
+        self.route_names = [r.long_name for r in routes]
+
+        result = find_longest_and_shortest_route(route_to_stops_mapping)
+        self.longest_and_shortest = None
+        if result is not None:
+            (most, most_count), (least, least_count) = result
+            self.longest_and_shortest = {
+                "most_stops": {"route": most.long_name, "stops": most_count},
+                "least_stops": {"route": least.long_name, "stops": least_count},
+            }
+        self.multi_route_stops = [
+            {"stop": stop.name, "routes": sorted(r.long_name for r in stop_routes)}
+            for stop, stop_routes in sorted(
+                find_multi_value_items(stop_to_routes_mapping).items()
+            )
+        ]
+
+        self.stops = self.name_index = self.graph = self.changes = None
+        # the stops of every route as loaded, and the ones the disruptions close on the graph
+        self.route_stop_ids = {
+            r.id: {s.id for s in stops} for r, stops in route_to_stops_mapping.items()
+        }
+        self.closed_stops: dict[str, set[str]] = {}
+        if not build_graph:
+            return
+        # the stops the name index is built from
+        self.stops = get_subway_stops()
+        if previous is not None and previous.graph is not None:
+            self.changes = diff_route_stops(
+                previous.route_to_stops_mapping, route_to_stops_mapping
+            )
+            self.graph = previous.graph.copy()
+            self.name_index = previous.name_index.copy()
+            with metrics.phase("transit_graph.apply_changes"):
+                # the changes are from the system as loaded, so the disruptions are applied again on top of them
+                close_stops(self.graph, previous.closed_stops, {})
+                apply_changes(self.changes, route_to_stops_mapping, self.graph)
+                update_name_index(self.name_index, previous.stops, self.stops)
+        else:
+            self.name_index = get_subway_stop_name_index()
+            with metrics.phase("transit_graph.build"):
+                self.graph = TransitGraph.from_stop_to_routes_mapping(
+                    stop_to_routes_mapping
+                )
+            with metrics.phase("transit_graph.precompute_transfers"):
+                self.graph.precompute_transfers()
+        if disruptions is not None:
+            self.closed_stops = disruptions.closures(self.route_stop_ids)
+            close_stops(self.graph, {}, self.closed_stops)
+
+    def with_disruptions(self, disruptions: DisruptionTracker) -> "ServiceState":
+        """
+        :param disruptions: the disruptions to close stops of on the graph
+        :return: this state if the stops they close didn't change, else a new state with a copy of the graph closing
+            (or reopening) only the stops that changed
+        """
+        closed_stops = disruptions.closures(self.route_stop_ids)
+        if closed_stops == self.closed_stops:
+            return self
+        state = copy.copy(self)
+        state.graph = self.graph.copy()
+        close_stops(state.graph, self.closed_stops, closed_stops)
+        state.closed_stops = closed_stops
+        return state
+
+
+class LatencyRecorder:
+    """Thread-safe record of the most recent request latencies per endpoint."""
+
+    def __init__(self, window: int = 10_000):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            self._latencies[endpoint].append(seconds)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        :return: mapping of endpoint to its request count and p50/p99 latency in milliseconds
+        """
+        with self._lock:
+            snapshot = {k: sorted(v) for k, v in self._latencies.items()}
+
+        return {
+            endpoint: {
+                "count": len(latencies),
+                "p50_ms": _percentile(latencies, 50) * 1000,
+                "p99_ms": _percentile(latencies, 99) * 1000,
+            }
+            for endpoint, latencies in snapshot.items()
+        }
+
+
+def _percentile(sorted_values: list[float], percentile: float) -> float:
+    # nearest-rank percentile
+    rank = max(1, -(-len(sorted_values) * percentile // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class QueryService:
+    """
+    Keeps the data and graph warm in memory and answers the CLI questions without any per-request loading.
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL_SECONDS,
+        graph_snapshot: str | None = None,
+        alerts: bool = False,
+    ):
+        """
+        :param refresh_interval: seconds between background reloads of the data, 0 to never reload
+        :param graph_snapshot: path of a graph snapshot to find paths with instead of building the graph, a newer
+            snapshot written to the path is swapped in
+        :param alerts: follow the alerts stream (once started) and close the stops of suspensions and shuttles on
+            the graph, so paths go around them
+        :raises SnapshotFormatError: if the graph snapshot can't be read
+        :raises ValueError: if following the alerts with a graph snapshot, which can't be changed
+        """
+        if alerts and graph_snapshot is not None:
+            raise ValueError("Alerts can't be applied to a graph snapshot")
+        self.refresh_interval = refresh_interval
+        self.latencies = LatencyRecorder()
+        self.snapshot_watcher = None
+        if graph_snapshot is not None:
+            # imported here as most services build their own graph
+            from graph_snapshot import SnapshotWatcher
+
+            self.snapshot_watcher = SnapshotWatcher(graph_snapshot)
+        self.disruptions = DisruptionTracker() if alerts else None
+        self.alert_subscriber = None
+        self.state = ServiceState(
+            build_graph=self.snapshot_watcher is None, disruptions=self.disruptions
+        )
+        # one update of the state at a time (refreshes and alert events), readers never take it
+        self._update_lock = threading.Lock()
+        self._stop_refreshing = threading.Event()
+        self._refresh_thread = None
+        # set when the disruptions changed, so the wait for the next start or end of one is worked out again
+        self._disruptions_changed = threading.Event()
+        self._disruption_thread = None
+        self.max_disruption_wait = MAX_DISRUPTION_WAIT_SECONDS
+
+    def refresh(self) -> None:
+        """
+        Reloads the data and swaps in the new state, readers are never blocked. If it fails the current state is kept.
+        """
+        with self._update_lock:
+            # everything the state is built from is reloaded, including the stops of routes that may no longer exist,
+            # so there are no particular keys to invalidate. The snapshots are revalidated, or a snapshot ttl longer
+            # than the refresh interval would have the refresh load the same data again
+            expire_caches()
+            self.state = ServiceState(
+                build_graph=self.snapshot_watcher is None,
+                previous=self.state,
+                disruptions=self.disruptions,
+            )
+
+    def handle_alert_event(self, event: str, data: str) -> None:
+        """
+        Applies an event of the alerts stream to the graph, closing (or reopening) only the stops it affects.
+        :param event: type of the event
+        :param data: JSON data of the event
+        :raises ValueError: if the data isn't an alert (or list of alerts)
+        """
+        with self._update_lock, metrics.phase("transit_graph.apply_disruptions"):
+            self.disruptions.handle_event(event, data)
+            # also catches the disruptions starting or ending since the last event
+            self.state = self.state.with_disruptions(self.disruptions)
+        self._disruptions_changed.set()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_refreshing.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # nothing was swapped in, so the last good state is still served
+                print(
+                    f"Failed to refresh the data, keeping the last good state: {e}",
+                    file=sys.stderr,
+                )
+
+    def _disruption_loop(self) -> None:
+        # the disruptions starting or ending don't come with an event of the alerts stream
+        while not self._stop_refreshing.is_set():
+            delay = self.disruptions.seconds_to_next_change()
+            timeout = self.max_disruption_wait
+            if delay is not None:
+                timeout = min(delay, timeout)
+            if self._disruptions_changed.wait(timeout):
+                self._disruptions_changed.clear()
+                continue
+            with self._update_lock:
+                self.state = self.state.with_disruptions(self.disruptions)
+
+    def start_refreshing(self) -> None:
+        """
+        Starts reloading the data in the background, and following the alerts stream if enabled, applying the
+        disruptions again as they start and end.
+        """
+        if self.refresh_interval > 0 and self._refresh_thread is None:
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_loop, name="refresh", daemon=True
+            )
+            self._refresh_thread.start()
+        if self.disruptions is not None and self.alert_subscriber is None:
+            self.alert_subscriber = AlertSubscriber(self.handle_alert_event)
+            self.alert_subscriber.start()
+        if self.disruptions is not None and self._disruption_thread is None:
+            self._disruption_thread = threading.Thread(
+                target=self._disruption_loop, name="disruptions", daemon=True
+            )
+            self._disruption_thread.start()
+
+    def stop_refreshing(self) -> None:
+        self._stop_refreshing.set()
+        self._disruptions_changed.set()
+        if self.alert_subscriber is not None:
+            self.alert_subscriber.stop()
+
+    def question_1(self) -> dict:
+        return {"routes": self.state.route_names}
+
+    def question_2(self) -> dict:
+        state = self.state
+        return {
+            **(state.longest_and_shortest or {}),
+            "multi_route_stops": state.multi_route_stops,
+        }
+
+    def find_path(self, start_name: str, end_name: str) -> dict:
+        """
+        :raises UnknownStopError: if either of the stops can't be resolved
+        """
+        if self.snapshot_watcher is not None:
+            snapshot = self.snapshot_watcher.current()
+            start_ids, end_ids = snapshot.name_index.resolve_pair(start_name, end_name)
+            path = snapshot.find_path_between(start_ids, end_ids)
+        else:
+            state = self.state
+            start_ids, end_ids = state.name_index.resolve_pair(start_name, end_name)
+            path = state.graph.find_path_between(start_ids, end_ids)
+        return {"start": start_name, "end": end_name, "path": path}
+
+    def metrics(self) -> dict:
+        state = self.state
+        result = {
+            "loaded_at": state.loaded_at,
+            "latency": self.latencies.summary(),
+        }
+        if state.changes is not None:
+            result["changes"] = state.changes.summary()
+        if self.disruptions is not None:
+            result["alerts"] = self.disruptions.summary(state.closed_stops)
+        if self.snapshot_watcher is not None:
+            result["graph_snapshot_generation"] = (
+                self.snapshot_watcher.current().generation
+            )
+        return result
+
+
+def _make_handler(service: QueryService) -> type[BaseHTTPRequestHandler]:
+    class QueryHandler(BaseHTTPRequestHandler):
+        # keep-alive connections, and don't let Nagle hold back the small JSON responses
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self) -> None:
+            start = time.perf_counter()
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+            try:
+                if url.path == "/question-1":
+                    status, body = 200, service.question_1()
+                elif url.path == "/question-2":
+                    status, body = 200, service.question_2()
+                elif url.path == "/find-path":
+                    if not (params.get("start") and params.get("end")):
+                        status, body = 400, {"error": "start and end are required"}
+                    else:
+                        status, body = 200, service.find_path(
+                            params["start"], params["end"]
+                        )
+                elif url.path == "/metrics":
+                    status, body = 200, service.metrics()
+                else:
+                    status, body = 404, {"error": f"Unknown endpoint {url.path}"}
+            except LookupError as e:
+                status, body = 404, {"error": str(e)}
+            except ValueError as e:
+                status, body = 422, {"error": str(e)}
+            except Exception as e:
+                status, body = 500, {"error": str(e)}
+
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+            if url.path != "/metrics":
+                service.latencies.record(url.path, time.perf_counter() - start)
+
+        def log_message(self, format: str, *args) -> None:
+            # the per-request access log would dominate the latency of these tiny responses
+            pass
+
+    return QueryHandler
+
+
+class _QueryServer(ThreadingHTTPServer):
+    # the default backlog of 5 makes bursts of concurrent clients wait on connect retries
+    request_queue_size = 128
+
+
+def make_server(
+    service: QueryService, host: str = "127.0.0.1", port: int = 8000
+) -> ThreadingHTTPServer:
+    """
+    Creates (but doesn't start) the HTTP server, each request is handled on its own thread.
+    :param service: the warm service to answer queries with
+    :param host: interface to listen on
+    :param port: port to listen on, 0 picks a free port
+    :return: the server
+    """
+    return _QueryServer((host, port), _make_handler(service))
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    refresh_interval: float = DEFAULT_REFRESH_INTERVAL_SECONDS,
+    graph_snapshot: str | None = None,
+    alerts: bool = False,
+) -> None:
+    """
+    Loads the data once, then serves queries until interrupted.
+    """
+    service = QueryService(
+        refresh_interval=refresh_interval, graph_snapshot=graph_snapshot, alerts=alerts
+    )
+    service.start_refreshing()
+    server = make_server(service, host, port)
+    print(f"Serving on http://{host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop_refreshing()
+        server.server_close()
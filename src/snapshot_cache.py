@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+# Bump whenever the on-disk layout changes so stale snapshots are ignored instead of misread
+SNAPSHOT_FORMAT_VERSION = 2
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / ".mbta_cache"
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+
+class SnapshotUnavailableError(Exception):
+    """Raised in offline mode when there is no snapshot to serve a request from."""
+
+
+class SnapshotCache:
+    """
+    Versioned on-disk store for the raw JSON:API documents (``data`` + ``included``) returned by the MBTA API.
+    Snapshots are keyed on the request path + params so every fetcher gets its own file.
+    """
+
+    def __init__(
+        self,
+        directory: Path | str = DEFAULT_CACHE_DIR,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        offline: bool = False,
+        refresh: bool = False,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param directory: where snapshot files are written
+        :param ttl_seconds: how long a snapshot is considered fresh
+        :param offline: serve snapshots regardless of age and never allow a network fetch
+        :param refresh: ignore existing snapshots (but still write new ones)
+        :param clock: time source, injectable for testing
+        """
+        if offline and refresh:
+            raise ValueError("A snapshot cache can't be both offline and refreshing")
+
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.offline = offline
+        self.refresh = refresh
+        self._clock = clock
+        # keys stored since ``expire`` was called, None if it never was
+        self._stored_since_expiry: set[str] | None = None
+
+    @staticmethod
+    def key_for(path: str, params: dict[str, str]) -> str:
+        """
+        Builds a stable, filesystem-safe key for a request.
+        :param path: API path e.g. "/routes"
+        :param params: query params of the request
+        :return: hex digest identifying the request
+        """
+        raw = json.dumps({"path": path, "params": params}, sort_keys=True)
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def _path_for(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read(self, key: str) -> dict[str, Any] | None:
+        try:
+            with open(self._path_for(key), encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get("version") != SNAPSHOT_FORMAT_VERSION
+        ):
+            return None
+        return snapshot
+
+    def load(self, key: str) -> dict[str, Any] | None:
+        """
+        Reads a snapshot if one is usable.
+        :param key: request key from ``key_for``
+        :return: the stored document, or None if the caller should go to the network
+        """
+        if self.refresh:
+            return None
+
+        snapshot = self._read(key)
+        expired = (
+            self._stored_since_expiry is not None
+            and key not in self._stored_since_expiry
+        )
+        usable = snapshot is not None and (
+            self.offline
+            or not expired
+            and self._clock() - snapshot.get("created_at", 0) <= self.ttl_seconds
+        )
+        if usable:
+            return snapshot["document"]
+
+        if self.offline:
+            raise SnapshotUnavailableError(
+                "No snapshot available for this request while offline, re-run without --offline first"
+            )
+        return None
+
+    def expire(self) -> None:
+        """
+        Treats every snapshot stored so far as expired whatever its age, so the next load of each is revalidated with
+        the API (or refetched), e.g. when the data is reloaded to pick up what changed upstream.
+        Doesn't apply offline, where snapshots are served regardless of age.
+        """
+        self._stored_since_expiry = set()
+
+    def load_for_revalidation(
+        self, key: str
+    ) -> tuple[dict[str, Any], dict[str, str]] | None:
+        """
+        Reads an expired snapshot that can be revalidated with the API instead of refetched.
+        :param key: request key from ``key_for``
+        :return: the stored document and its validators (see ``transport.validators_for``),
+            or None if there is no snapshot with validators or the cache is refreshing
+        """
+        if self.refresh:
+            return None
+        snapshot = self._read(key)
+        if snapshot is None or not snapshot.get("validators"):
+            return None
+        return snapshot["document"], snapshot["validators"]
+
+    def store(
+        self,
+        key: str,
+        document: dict[str, Any],
+        validators: dict[str, str] | None = None,
+    ) -> None:
+        """
+        Atomically writes a snapshot - readers see either the old file or the new one, never a partial write.
+        Storing an unchanged document again renews it.
+        :param key: request key from ``key_for``
+        :param document: raw document to store
+        :param validators: validators of the response the document came from, to revalidate it once it expires
+        """
+        import tempfile  # only needed when writing, which a warm start never does
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        snapshot = {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "created_at": self._clock(),
+            "validators": validators or {},
+            "document": document,
+        }
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path_for(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self._stored_since_expiry is not None:
+            self._stored_since_expiry.add(key)
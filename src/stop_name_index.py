@@ -0,0 +1,215 @@
+import copy
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Iterable
+
+from models import Stop
+
+# expanded wherever they appear in a name except "st", which is "saint" at the start of a name (e.g. St. Paul Street)
+_ABBREVIATIONS = {
+    "st": "street",
+    "sq": "square",
+    "ave": "avenue",
+    "av": "avenue",
+    "ctr": "center",
+    "rd": "road",
+    "hwy": "highway",
+    "mt": "mount",
+    "univ": "university",
+}
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]+")
+
+# minimum trigram (Dice) similarity for a name to be suggested
+_MIN_SIMILARITY = 0.3
+
+
+def normalize_stop_name(name: str) -> str:
+    """
+    Normalizes a stop name for lookups: case, punctuation, whitespace and common abbreviations don't matter.
+    e.g. "Park St.", "park street " and "PARK STREET" all normalize to "park street"
+    :param name: stop name
+    :return: normalized name
+    """
+    words = _NON_ALPHANUMERIC.sub(" ", name.lower().replace("'", "")).split()
+    return " ".join(
+        "saint" if i == 0 and word == "st" else _ABBREVIATIONS.get(word, word)
+        for i, word in enumerate(words)
+    )
+
+
+class UnknownStopError(LookupError):
+    """Raised when stop names can't be resolved. Holds the suggested alternatives for each unresolved name."""
+
+    def __init__(self, suggestions: dict[str, list[str]]):
+        self.suggestions = suggestions
+        described = [
+            f"{name} (did you mean {' or '.join(names)}?)" if names else name
+            for name, names in suggestions.items()
+        ]
+        super().__init__(f"Unable to identify the stop(s) {', '.join(described)}")
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class StopNameIndex:
+    """
+    Index of stop names, built once (then updated in place as stops change), for exact, prefix and fuzzy lookups of
+    user provided names.
+    Several stops can share a name, so names resolve to a list of stop ids.
+    """
+
+    def __init__(self, stops: Iterable[Stop]):
+        self._ids: dict[str, list[str]] = defaultdict(list)
+        self._names: dict[str, str] = {}
+        for stop in stops:
+            key = normalize_stop_name(stop.name)
+            if stop.id not in self._ids[key]:
+                self._ids[key].append(stop.id)
+            self._names.setdefault(key, stop.name)
+
+        # sorted keys for prefix search, trigram postings for fuzzy search
+        self._sorted_keys = sorted(self._ids)
+        self._key_trigrams = {key: _trigrams(key) for key in self._sorted_keys}
+        self._postings: dict[str, list[str]] = defaultdict(list)
+        for key, trigrams in self._key_trigrams.items():
+            for trigram in trigrams:
+                self._postings[trigram].append(key)
+
+    def copy(self) -> "StopNameIndex":
+        """
+        :return: an independent copy, to update while this index keeps answering lookups
+        """
+        index = copy.copy(self)
+        index._ids = defaultdict(list, {k: list(ids) for k, ids in self._ids.items()})
+        index._names = dict(self._names)
+        index._sorted_keys = list(self._sorted_keys)
+        # the trigram sets are never changed, only replaced
+        index._key_trigrams = dict(self._key_trigrams)
+        index._postings = defaultdict(
+            list, {t: list(keys) for t, keys in self._postings.items()}
+        )
+        return index
+
+    def add_stop(self, stop: Stop) -> None:
+        """
+        Adds a stop to the index in place, only touching its name's entries.
+        :param stop: the stop
+        """
+        key = normalize_stop_name(stop.name)
+        if key not in self._ids:
+            insort(self._sorted_keys, key)
+            self._key_trigrams[key] = _trigrams(key)
+            for trigram in self._key_trigrams[key]:
+                self._postings[trigram].append(key)
+        if stop.id not in self._ids[key]:
+            self._ids[key].append(stop.id)
+        self._names.setdefault(key, stop.name)
+
+    def remove_stop(self, stop: Stop) -> None:
+        """
+        Removes a stop from the index in place, dropping its name once no other stop has it.
+        :param stop: the stop, with the name it was added with
+        """
+        key = normalize_stop_name(stop.name)
+        if stop.id not in self._ids.get(key, ()):
+            return
+        self._ids[key].remove(stop.id)
+        if self._ids[key]:
+            return
+
+        del self._ids[key], self._names[key]
+        del self._sorted_keys[bisect_left(self._sorted_keys, key)]
+        for trigram in self._key_trigrams.pop(key):
+            self._postings[trigram].remove(key)
+
+    def resolve(self, name: str) -> list[str]:
+        """
+        Resolves a name to stop ids. Falls back to a prefix match when it is unambiguous, e.g. "forest" -> "Forest Hills"
+        :param name: stop name as given by the user
+        :return: ids of the matching stops, empty if the name can't be resolved
+        """
+        key = normalize_stop_name(name)
+        if not key:
+            return []
+        if key in self._ids:
+            return list(self._ids[key])
+
+        prefix_matches = self._prefix_keys(key, limit=2)
+        if len(prefix_matches) == 1:
+            return list(self._ids[prefix_matches[0]])
+        return []
+
+    def _prefix_keys(self, key: str, limit: int) -> list[str]:
+        matches = []
+        i = bisect_left(self._sorted_keys, key)
+        while (
+            i < len(self._sorted_keys)
+            and len(matches) < limit
+            and self._sorted_keys[i].startswith(key)
+        ):
+            matches.append(self._sorted_keys[i])
+            i += 1
+        return matches
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        """
+        :param prefix: start of a stop name
+        :param limit: maximum number of names to return
+        :return: names of the stops starting with the prefix, alphabetically
+        """
+        key = normalize_stop_name(prefix)
+        return [self._names[k] for k in self._prefix_keys(key, limit)] if key else []
+
+    def suggest(self, name: str, limit: int = 5) -> list[str]:
+        """
+        Suggests stop names for a name that didn't resolve, e.g. because of a typo.
+        :param name: stop name as given by the user
+        :param limit: maximum number of suggestions
+        :return: names of the most similar stops, most similar first
+        """
+        key = normalize_stop_name(name)
+        if not key:
+            return []
+
+        query = _trigrams(key)
+        shared = defaultdict(int)
+        for trigram in query:
+            for candidate in self._postings.get(trigram, ()):
+                shared[candidate] += 1
+
+        scored = []
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(query) + len(self._key_trigrams[candidate]))
+            if candidate.startswith(key):
+                similarity += 1  # completions rank above typo corrections
+            if similarity >= _MIN_SIMILARITY:
+                scored.append((-similarity, candidate))
+
+        return [self._names[candidate] for _, candidate in sorted(scored)[:limit]]
+
+    def resolve_pair(
+        self, start_name: str, end_name: str
+    ) -> tuple[list[str], list[str]]:
+        """
+        Resolves the start and end of a trip together so both can be reported if neither resolves.
+        :param start_name: Name of the starting stop
+        :param end_name: Name of the ending stop
+        :return: tuple of the start stop ids and the end stop ids
+        :raises UnknownStopError: if either name can't be resolved
+        """
+        start_ids = self.resolve(start_name)
+        end_ids = self.resolve(end_name)
+        unresolved = [
+            name
+            for name, ids in ((start_name, start_ids), (end_name, end_ids))
+            if not ids
+        ]
+        if unresolved:
+            raise UnknownStopError(
+                {name: self.suggest(name, limit=3) for name in unresolved}
+            )
+        return start_ids, end_ids
@@ -0,0 +1,242 @@
+import heapq
+from array import array
+from typing import Iterable, NamedTuple
+
+from models import Route, RoutePattern, Stop
+from transit_graph import TransferTable
+
+OBJECTIVES = ("stops", "transfers")
+
+# weight of whatever the objective minimizes, the other measure gets a weight of 1 and only breaks ties
+_PRIMARY_WEIGHT = 1000
+
+
+class Leg(NamedTuple):
+    route_id: str
+    route_name: str
+    board_stop_id: str
+    board_stop_name: str
+    alight_stop_id: str
+    alight_stop_name: str
+    stops: int  # number of stops ridden, not counting the boarding stop
+
+
+class Itinerary(NamedTuple):
+    legs: list[Leg]
+
+    @property
+    def stops(self) -> int:
+        return sum(leg.stops for leg in self.legs)
+
+    @property
+    def transfers(self) -> int:
+        return max(len(self.legs) - 1, 0)
+
+    @property
+    def transfer_stop_ids(self) -> list[str]:
+        return [leg.board_stop_id for leg in self.legs[1:]]
+
+
+class StopGraph:
+    """
+    Stop-level graph of the subway built from the ordered stops of every route pattern.
+    Each node is a stop on a route travelling in one direction. Nodes are connected by
+        * ride edges - to the next stop of a route pattern in the same direction
+        * transfer edges - to the other nodes of the same stop (another route, or turning back)
+    Ride edges are stored as compact CSR arrays: the ride neighbors of node n are
+    ``ride_targets[ride_offsets[n]:ride_offsets[n + 1]]``.
+    """
+
+    def __init__(
+        self, routes: list[Route], stops: list[Stop], patterns: list[RoutePattern]
+    ):
+        """
+        :param routes: routes the patterns belong to
+        :param stops: stops the patterns visit, unknown stops are skipped
+        :param patterns: the ordered stops of each route pattern
+        """
+        route_by_id = {r.id: r for r in routes}
+        stop_by_id = {s.id: s for s in stops}
+
+        self.route_ids = sorted({p.route_id for p in patterns} & route_by_id.keys())
+        self.route_names = [route_by_id[r].long_name for r in self.route_ids]
+        route_index = {route_id: i for i, route_id in enumerate(self.route_ids)}
+        self.stop_ids = sorted(
+            {s for p in patterns for s in p.stop_ids} & stop_by_id.keys()
+        )
+        self.stop_names = [stop_by_id[s].name for s in self.stop_ids]
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+
+        node_index = {}
+        self.node_stop = array("i")
+        self.node_route = array("i")
+        self.stop_nodes: list[list[int]] = [[] for _ in self.stop_ids]
+        ride_edges: dict[int, set[int]] = {}
+
+        def node_for(stop: int, route: int, direction_id: int) -> int:
+            key = (stop, route, direction_id)
+            node = node_index.get(key)
+            if node is None:
+                node = node_index[key] = len(self.node_stop)
+                self.node_stop.append(stop)
+                self.node_route.append(route)
+                self.stop_nodes[stop].append(node)
+                ride_edges[node] = set()
+            return node
+
+        for pattern in patterns:
+            route = route_index.get(pattern.route_id)
+            if route is None:
+                continue
+            previous = None
+            for stop_id in pattern.stop_ids:
+                stop = self.stop_index.get(stop_id)
+                if stop is None:
+                    continue
+                node = node_for(stop, route, pattern.direction_id)
+                if previous is not None:
+                    ride_edges[previous].add(node)
+                previous = node
+
+        self.ride_offsets = array("i", [0])
+        self.ride_targets = array("i")
+        for node in range(len(self.node_stop)):
+            self.ride_targets.extend(sorted(ride_edges[node]))
+            self.ride_offsets.append(len(self.ride_targets))
+
+        # route-level transfer distances give A* an admissible lower bound on the transfers still needed
+        route_adjacency = [0] * len(self.route_ids)
+        for nodes in self.stop_nodes:
+            mask = 0
+            for node in nodes:
+                mask |= 1 << self.node_route[node]
+            for node in nodes:
+                route = self.node_route[node]
+                route_adjacency[route] |= mask & ~(1 << route)
+        self.transfer_table = TransferTable(route_adjacency)
+
+    def _transfers_lower_bounds(self, end_stops: set[int]) -> list[int]:
+        """
+        :return: for each route, the fewest transfers to reach a route serving one of the end stops (-1 if impossible)
+        """
+        end_routes = {self.node_route[n] for s in end_stops for n in self.stop_nodes[s]}
+        size = self.transfer_table.size
+        distances = self.transfer_table.distances
+        bounds = []
+        for route in range(size):
+            reachable = [
+                distances[route * size + end]
+                for end in end_routes
+                if distances[route * size + end] >= 0
+            ]
+            bounds.append(min(reachable) if reachable else -1)
+        return bounds
+
+    def find_itinerary(
+        self,
+        start_stop_ids: Iterable[str],
+        end_stop_ids: Iterable[str],
+        objective: str = "stops",
+    ) -> Itinerary | None:
+        """
+        A* search from any of the start stops to any of the end stops.
+        :param start_stop_ids: stops the trip may start from
+        :param end_stop_ids: stops the trip may end at
+        :param objective: "stops" for the fewest stops ridden (then fewest transfers),
+        "transfers" for the fewest transfers (then fewest stops)
+        :return: the best itinerary or None if no path exists
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(
+                f"Unknown objective {objective}, expected one of {OBJECTIVES}"
+            )
+        ride_weight, transfer_weight = (
+            (_PRIMARY_WEIGHT, 1) if objective == "stops" else (1, _PRIMARY_WEIGHT)
+        )
+
+        start_stops = {
+            self.stop_index[s] for s in start_stop_ids if s in self.stop_index
+        }
+        end_stops = {self.stop_index[s] for s in end_stop_ids if s in self.stop_index}
+        if not (start_stops and end_stops):
+            raise ValueError("Stops not found on any route pattern.")
+        if start_stops & end_stops:
+            return Itinerary(legs=[])
+
+        bounds = self._transfers_lower_bounds(end_stops)
+        node_stop, node_route = self.node_stop, self.node_route
+        ride_offsets, ride_targets = self.ride_offsets, self.ride_targets
+        stop_nodes = self.stop_nodes
+
+        costs = {}
+        parents = {}
+        heap = []
+        for stop in sorted(start_stops):
+            for node in stop_nodes[stop]:
+                if bounds[node_route[node]] >= 0:
+                    costs[node] = 0
+                    parents[node] = -1
+                    heap.append((bounds[node_route[node]] * transfer_weight, 0, node))
+        heapq.heapify(heap)
+
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if cost > costs[node]:
+                continue  # stale entry
+            if node_stop[node] in end_stops:
+                return self._build_itinerary(node, parents)
+
+            neighbors = [
+                (ride_targets[i], ride_weight)
+                for i in range(ride_offsets[node], ride_offsets[node + 1])
+            ]
+            neighbors.extend(
+                (other, transfer_weight)
+                for other in stop_nodes[node_stop[node]]
+                if other != node
+            )
+            for neighbor, weight in neighbors:
+                bound = bounds[node_route[neighbor]]
+                new_cost = cost + weight
+                if bound >= 0 and new_cost < costs.get(neighbor, new_cost + 1):
+                    costs[neighbor] = new_cost
+                    parents[neighbor] = node
+                    heapq.heappush(
+                        heap, (new_cost + bound * transfer_weight, new_cost, neighbor)
+                    )
+
+        return None
+
+    def _build_itinerary(self, node: int, parents: dict[int, int]) -> Itinerary:
+        nodes = []
+        while node != -1:
+            nodes.append(node)
+            node = parents[node]
+        nodes.reverse()
+
+        # split the node path into legs at each transfer edge
+        legs = []
+        board = nodes[0]
+        rides = 0
+        for previous, current in zip(nodes, nodes[1:]):
+            if self.node_stop[previous] == self.node_stop[current]:
+                legs.append(self._make_leg(board, previous, rides))
+                board = current
+                rides = 0
+            else:
+                rides += 1
+        legs.append(self._make_leg(board, nodes[-1], rides))
+        return Itinerary(legs=[leg for leg in legs if leg.stops])
+
+    def _make_leg(self, board: int, alight: int, stops: int) -> Leg:
+        route = self.node_route[board]
+        board_stop, alight_stop = self.node_stop[board], self.node_stop[alight]
+        return Leg(
+            route_id=self.route_ids[route],
+            route_name=self.route_names[route],
+            board_stop_id=self.stop_ids[board_stop],
+            board_stop_name=self.stop_names[board_stop],
+            alight_stop_id=self.stop_ids[alight_stop],
+            alight_stop_name=self.stop_names[alight_stop],
+            stops=stops,
+        )
@@ -0,0 +1,509 @@
+import copy
+import heapq
+from array import array
+from collections import deque
+from typing import Iterable, Iterator
+
+from models import Route, Stop
+
+
+def _bits(mask: int):
+    """Yields the indexes of the set bits of ``mask``, lowest first."""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+class TransferTable:
+    """
+    All-pairs minimum transfer table over the routes, from one breadth-first search per route.
+    Stored as two flat ``n x n`` arrays, indexed ``source * n + target``:
+        * ``distances`` - fewest transfers from source to target, -1 if unreachable
+        * ``parents`` - the route before target on a shortest path from source, -1 for the source itself
+    """
+
+    def __init__(self, route_adjacency: list[int]):
+        n = len(route_adjacency)
+        self.size = n
+        self.distances = array("i", [-1]) * (n * n)
+        self.parents = array("i", [-1]) * (n * n)
+
+        for source in range(n):
+            self.compute_row(route_adjacency, source)
+
+    def compute_row(self, route_adjacency: list[int], source: int) -> None:
+        """
+        (Re)computes the transfers from one route with a breadth-first search, e.g. after the adjacency changed.
+        :param route_adjacency: the route adjacency bitsets, for as many routes as the table has
+        :param source: index of the route
+        """
+        n = self.size
+        row = source * n
+        self.distances[row : row + n] = array("i", [-1]) * n
+        self.parents[row : row + n] = array("i", [-1]) * n
+        self.distances[row + source] = 0
+        route_queue = deque([source])
+        while route_queue:
+            route = route_queue.popleft()
+            for adjacent in _bits(route_adjacency[route]):
+                if self.distances[row + adjacent] < 0:
+                    self.distances[row + adjacent] = self.distances[row + route] + 1
+                    self.parents[row + adjacent] = route
+                    route_queue.append(adjacent)
+
+    def copy(self) -> "TransferTable":
+        """
+        :return: an independent copy, whose rows can be recomputed without affecting this table
+        """
+        table = copy.copy(self)
+        table.distances, table.parents = self.distances[:], self.parents[:]
+        return table
+
+    def best_pair(self, start_mask: int, end_mask: int) -> tuple[int, int] | None:
+        """
+        :param start_mask: bitset of the routes the path may start on
+        :param end_mask: bitset of the routes the path may end on
+        :return: the (start, end) route pair with the fewest transfers between them (lowest indexes win ties), or None
+        """
+        best = None
+        best_distance = -1
+        for source in _bits(start_mask):
+            row = source * self.size
+            for target in _bits(end_mask):
+                distance = self.distances[row + target]
+                if distance >= 0 and (best is None or distance < best_distance):
+                    best, best_distance = (source, target), distance
+        return best
+
+    def path(self, source: int, target: int) -> list[int] | None:
+        """
+        :param source: index of the route to start on
+        :param target: index of the route to end on
+        :return: route indexes of a path with the fewest transfers, or None if no path exists
+        """
+        row = source * self.size
+        if self.distances[row + target] < 0:
+            return None
+
+        path = [target]
+        while target != source:
+            target = self.parents[row + target]
+            path.append(target)
+        path.reverse()
+        return path
+
+
+class TransitGraph:
+    """
+    In-memory index of the subway system built once from the stop to routes mapping, so path queries make no network calls.
+    Stop and route ids are interned to dense integers and the route sets are stored as int bitsets:
+        * ``stop_routes[s]`` has bit r set if route r serves stop s
+        * ``route_adjacency[r]`` has bit q set if routes r and q share at least one stop
+    """
+
+    def __init__(
+        self,
+        route_ids: list[str],
+        route_names: list[str],
+        stop_ids: list[str],
+        stop_routes: list[int],
+        route_adjacency: list[int],
+    ):
+        self.route_ids = route_ids
+        self.route_names = route_names
+        self.stop_ids = stop_ids
+        self.stop_routes = stop_routes
+        self.route_adjacency = route_adjacency
+        self.route_index = {route_id: i for i, route_id in enumerate(route_ids)}
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+        self.transfer_table: TransferTable | None = None
+        # the stops of every route, only kept once the graph is updated in place
+        self._route_stops: list[set[int]] | None = None
+
+    @classmethod
+    def from_stop_to_routes_mapping(
+        cls, stop_to_routes_mapping: dict[Stop, set[Route]]
+    ) -> "TransitGraph":
+        """
+        Builds the graph, interning ids in sorted order so the graph (and its answers) don't depend on set iteration order.
+        :param stop_to_routes_mapping: Mapping of stop to its set of route(s)
+        :return: the built graph
+        """
+        routes = {r.id: r for rs in stop_to_routes_mapping.values() for r in rs}
+        route_ids = sorted(routes)
+        route_index = {route_id: i for i, route_id in enumerate(route_ids)}
+        stop_ids = sorted(s.id for s in stop_to_routes_mapping)
+        stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+
+        stop_routes = [0] * len(stop_ids)
+        route_adjacency = [0] * len(route_ids)
+        for stop, stop_route_set in stop_to_routes_mapping.items():
+            mask = 0
+            for route in stop_route_set:
+                mask |= 1 << route_index[route.id]
+            stop_routes[stop_index[stop.id]] = mask
+
+            # every route at the stop is adjacent to every other route at the stop
+            if mask & (mask - 1):
+                for r in _bits(mask):
+                    route_adjacency[r] |= mask
+
+        # a route isn't its own neighbor
+        for r in range(len(route_adjacency)):
+            route_adjacency[r] &= ~(1 << r)
+
+        return cls(
+            route_ids=route_ids,
+            route_names=[routes[route_id].long_name for route_id in route_ids],
+            stop_ids=stop_ids,
+            stop_routes=stop_routes,
+            route_adjacency=route_adjacency,
+        )
+
+    def copy(self) -> "TransitGraph":
+        """
+        :return: an independent copy, to update while this graph keeps answering queries
+        """
+        graph = copy.copy(self)
+        graph.route_ids, graph.route_names = list(self.route_ids), list(
+            self.route_names
+        )
+        graph.stop_ids, graph.stop_routes = list(self.stop_ids), list(self.stop_routes)
+        graph.route_adjacency = list(self.route_adjacency)
+        # not rebuilt from the ids, removed routes aren't in the route index
+        graph.route_index, graph.stop_index = dict(self.route_index), dict(
+            self.stop_index
+        )
+        if self.transfer_table is not None:
+            graph.transfer_table = self.transfer_table.copy()
+        if self._route_stops is not None:
+            graph._route_stops = [set(stops) for stops in self._route_stops]
+        return graph
+
+    def routes_mask_for_stop(self, stop_id: str) -> int:
+        """
+        :param stop_id: id of the stop
+        :return: bitset of the routes serving the stop, 0 for an unknown stop
+        """
+        i = self.stop_index.get(stop_id)
+        return 0 if i is None else self.stop_routes[i]
+
+    def routes_for_stop(self, stop_id: str) -> list[str]:
+        """
+        :param stop_id: id of the stop
+        :return: ids of the routes serving the stop
+        """
+        return [self.route_ids[r] for r in _bits(self.routes_mask_for_stop(stop_id))]
+
+    def update_routes(
+        self,
+        route_names: dict[str, str],
+        removed_route_ids: Iterable[str],
+        route_stop_changes: dict[str, tuple[set[str], set[str]]],
+    ) -> list[str]:
+        """
+        Applies changes to the routes in place, touching only what they affect: the routes of the changed stops, the
+        adjacency of the routes serving them before or after, and the rows of the transfer table (if precomputed)
+        of the routes that could reach those. New routes and stops are interned after the existing ones, and removed
+        routes keep their (now empty) index, so indexes stay stable, but ties between equally good paths can break
+        differently than in a graph built from scratch.
+        :param route_names: long names of new and renamed routes, by route id
+        :param removed_route_ids: ids of the routes that no longer run
+        :param route_stop_changes: the stops added to and removed from routes, by route id
+        :return: ids of the routes whose adjacent routes changed, in index order
+        :raises ValueError: if a route to change or remove isn't in the graph (nothing is changed then)
+        """
+        removed_route_ids = set(removed_route_ids)
+        for route_id in removed_route_ids | route_stop_changes.keys():
+            if route_id not in self.route_index and (
+                route_id in removed_route_ids or route_id not in route_names
+            ):
+                raise ValueError(f"Unknown route {route_id!r}")
+
+        if self._route_stops is None:
+            self._route_stops = [set() for _ in self.route_ids]
+            for stop, mask in enumerate(self.stop_routes):
+                for r in _bits(mask):
+                    self._route_stops[r].add(stop)
+
+        old_route_count = len(self.route_ids)
+        for route_id, name in route_names.items():
+            if route_id in self.route_index:
+                self.route_names[self.route_index[route_id]] = name
+                continue
+            self.route_index[route_id] = len(self.route_ids)
+            self.route_ids.append(route_id)
+            self.route_names.append(name)
+            self.route_adjacency.append(0)
+            self._route_stops.append(set())
+
+        # the routes serving a changed stop, before or after the change
+        affected = set()
+        changes = dict(route_stop_changes)
+        for route_id in removed_route_ids:
+            r = self.route_index[route_id]
+            stop_ids = {self.stop_ids[s] for s in self._route_stops[r]}
+            changes[route_id] = (set(), stop_ids)
+            affected.add(r)
+
+        for route_id, (added_stop_ids, removed_stop_ids) in changes.items():
+            r = self.route_index[route_id]
+            for stop_id in removed_stop_ids:
+                s = self.stop_index.get(stop_id)
+                if s is not None and s in self._route_stops[r]:
+                    affected.update(_bits(self.stop_routes[s]))
+                    self.stop_routes[s] &= ~(1 << r)
+                    self._route_stops[r].discard(s)
+            for stop_id in added_stop_ids:
+                s = self.stop_index.get(stop_id)
+                if s is None:
+                    s = self.stop_index[stop_id] = len(self.stop_ids)
+                    self.stop_ids.append(stop_id)
+                    self.stop_routes.append(0)
+                self.stop_routes[s] |= 1 << r
+                self._route_stops[r].add(s)
+                affected.update(_bits(self.stop_routes[s]))
+
+        for route_id in removed_route_ids:
+            del self.route_index[route_id]
+
+        changed = []
+        for r in sorted(affected):
+            adjacency = 0
+            for s in self._route_stops[r]:
+                adjacency |= self.stop_routes[s]
+            adjacency &= ~(1 << r)
+            if adjacency != self.route_adjacency[r]:
+                self.route_adjacency[r] = adjacency
+                changed.append(r)
+
+        if self.transfer_table is not None and (
+            changed or len(self.route_ids) != old_route_count
+        ):
+            if len(self.route_ids) != old_route_count:
+                # the table is sized for the routes it was built with
+                self.transfer_table = TransferTable(self.route_adjacency)
+            else:
+                # only the routes that could reach a changed route before can have a different row, and any
+                # route reaching one after the change could reach one of its endpoints before it
+                table = self.transfer_table
+                for source in range(table.size):
+                    row = source * table.size
+                    if any(table.distances[row + r] >= 0 for r in changed):
+                        table.compute_row(self.route_adjacency, source)
+
+        return [self.route_ids[r] for r in changed]
+
+    def routes_mask(self, routes: Iterable[str]) -> int:
+        """
+        :param routes: ids or long names of routes (casing does not matter)
+        :return: bitset of the routes
+        :raises ValueError: if a route isn't in the graph
+        """
+        by_name = {}
+        for route_id, i in self.route_index.items():
+            by_name[route_id.casefold()] = by_name[self.route_names[i].casefold()] = i
+
+        mask = 0
+        for route in routes:
+            i = by_name.get(route.casefold())
+            if i is None:
+                raise ValueError(f"Unknown route {route!r}")
+            mask |= 1 << i
+        return mask
+
+    def precompute_transfers(self) -> TransferTable:
+        """
+        Builds the all-pairs transfer table (if not already built) so that path queries become table lookups.
+        Worth it when answering many queries against the same graph.
+        :return: the transfer table
+        """
+        if self.transfer_table is None:
+            self.transfer_table = TransferTable(self.route_adjacency)
+        return self.transfer_table
+
+    def min_transfers(self, start_stop_id: str, end_stop_id: str) -> int | None:
+        """
+        :param start_stop_id: ID of the starting stop.
+        :param end_stop_id: ID of destination stop.
+        :return: the fewest transfers needed between the stops, or None if no path exists
+        """
+        path = self.find_route_path(
+            self.routes_mask_for_stop(start_stop_id),
+            self.routes_mask_for_stop(end_stop_id),
+        )
+        return None if path is None else len(path) - 1
+
+    def find_route_path(self, start_mask: int, end_mask: int) -> list[int] | None:
+        """
+        Finds a path with the fewest transfers from any of the start routes to any of the end routes.
+        Uses the transfer table when it has been precomputed, otherwise a breadth-first search over the route bitsets,
+        one whole level (transfer) at a time.
+        :param start_mask: bitset of the routes the path may start on
+        :param end_mask: bitset of the routes the path may end on
+        :return: route indexes of a path with the fewest transfers, or None if no path exists
+        """
+        if not (start_mask and end_mask):
+            return None
+
+        if self.transfer_table is not None:
+            pair = self.transfer_table.best_pair(start_mask, end_mask)
+            return None if pair is None else self.transfer_table.path(*pair)
+
+        levels = [start_mask]
+        visited = start_mask
+        frontier = start_mask
+        while not frontier & end_mask:
+            next_frontier = 0
+            for r in _bits(frontier):
+                next_frontier |= self.route_adjacency[r]
+            frontier = next_frontier & ~visited
+            if not frontier:
+                return None
+            visited |= frontier
+            levels.append(frontier)
+
+        # walk back through the levels, picking the lowest indexed adjacent route each time
+        route = next(_bits(frontier & end_mask))
+        path = [route]
+        for level in reversed(levels[:-1]):
+            route = next(_bits(self.route_adjacency[route] & level))
+            path.append(route)
+        path.reverse()
+        return path
+
+    def find_path(self, start_stop_id: str, end_stop_id: str) -> list[str] | None:
+        """
+        Finds a path with the fewest transfers between two stops.
+        :param start_stop_id: ID of the starting stop.
+        :param end_stop_id: ID of destination stop.
+        :return: List of route names forming the path, or None if no path exists.
+        """
+        return self.find_path_between([start_stop_id], [end_stop_id])
+
+    def find_path_between(
+        self, start_stop_ids: Iterable[str], end_stop_ids: Iterable[str]
+    ) -> list[str] | None:
+        """
+        Finds a path with the fewest transfers from any of the start stops to any of the end stops,
+        e.g. when a name is shared by several stops.
+        :param start_stop_ids: IDs of the stops the path may start from.
+        :param end_stop_ids: IDs of the stops the path may end at.
+        :return: List of route names forming the path, or None if no path exists.
+        """
+        start_mask = 0
+        for stop_id in start_stop_ids:
+            start_mask |= self.routes_mask_for_stop(stop_id)
+        end_mask = 0
+        for stop_id in end_stop_ids:
+            end_mask |= self.routes_mask_for_stop(stop_id)
+        if not (start_mask and end_mask):
+            raise ValueError("Routes not found for both stops.")
+
+        path = self.find_route_path(start_mask, end_mask)
+        if path is None:
+            return None
+        return [self.route_names[r] for r in path]
+
+    def iter_route_paths(
+        self, start_mask: int, end_mask: int, avoid_mask: int = 0
+    ) -> Iterator[list[int]]:
+        """
+        Enumerates the route sequences from any of the start routes to any of the end routes, fewest transfers first.
+        Only sensible sequences are enumerated: no route is ridden twice, only the first route is a start route and only
+        the last one an end route (otherwise the rider could have boarded, or got off, earlier).
+        A best-first search over partial sequences, ranked by their transfers so far plus the fewest transfers left to
+        reach an end route (from one breadth-first search back from the end routes), so a sequence is only extended
+        with routes that can still reach the end and the sequences come out in order without being ranked afterwards.
+        :param start_mask: bitset of the routes the sequences may start on
+        :param end_mask: bitset of the routes the sequences may end on
+        :param avoid_mask: bitset of the routes the sequences may not use, e.g. for a planned outage
+        :return: generator of route index sequences, ties in the order of their route indexes
+        """
+        start_mask &= ~avoid_mask
+        end_mask &= ~avoid_mask
+        if not (start_mask and end_mask):
+            return
+
+        # fewest transfers from every route to an end route, through routes that can be in the middle of a sequence
+        interior_mask = ~(avoid_mask | start_mask)
+        frontier = visited = end_mask & interior_mask
+        remaining = {r: 0 for r in _bits(frontier)}
+        level = 0
+        while frontier:
+            level += 1
+            next_frontier = 0
+            for r in _bits(frontier):
+                next_frontier |= self.route_adjacency[r]
+            frontier = next_frontier & interior_mask & ~visited
+            visited |= frontier
+            for r in _bits(frontier):
+                remaining[r] = level
+
+        def lower_bound(route: int) -> int | None:
+            if end_mask >> route & 1:
+                return 0
+            # start routes only ever begin a sequence, so they were left out of the search above
+            neighbours = [
+                remaining[r]
+                for r in _bits(self.route_adjacency[route])
+                if r in remaining
+            ]
+            return min(neighbours) + 1 if neighbours else None
+
+        heap = []
+        for route in _bits(start_mask):
+            bound = lower_bound(route)
+            if bound is not None:
+                heap.append((bound, (route,)))
+        heapq.heapify(heap)
+
+        while heap:
+            _, path = heapq.heappop(heap)
+            last = path[-1]
+            if end_mask >> last & 1:
+                yield list(path)
+                continue
+            for adjacent in _bits(self.route_adjacency[last] & interior_mask):
+                if adjacent in remaining and adjacent not in path:
+                    heapq.heappush(
+                        heap, (len(path) + remaining[adjacent], path + (adjacent,))
+                    )
+
+    def find_paths_between(
+        self,
+        start_stop_ids: Iterable[str],
+        end_stop_ids: Iterable[str],
+        limit: int | None = None,
+        minimal_only: bool = False,
+        avoid_routes: Iterable[str] = (),
+    ) -> list[list[str]]:
+        """
+        Finds alternative paths from any of the start stops to any of the end stops, fewest transfers first.
+        :param start_stop_ids: IDs of the stops the paths may start from.
+        :param end_stop_ids: IDs of the stops the paths may end at.
+        :param limit: most paths to return, None for no limit
+        :param minimal_only: only the paths with the fewest transfers
+        :param avoid_routes: ids or long names of routes the paths may not use
+        :return: the paths as lists of route names, empty if no path exists.
+        :raises ValueError: if either stop has no routes, or an avoided route is unknown
+        """
+        start_mask = 0
+        for stop_id in start_stop_ids:
+            start_mask |= self.routes_mask_for_stop(stop_id)
+        end_mask = 0
+        for stop_id in end_stop_ids:
+            end_mask |= self.routes_mask_for_stop(stop_id)
+        if not (start_mask and end_mask):
+            raise ValueError("Routes not found for both stops.")
+        avoid_mask = self.routes_mask(avoid_routes) if avoid_routes else 0
+
+        paths = []
+        for path in self.iter_route_paths(start_mask, end_mask, avoid_mask):
+            if limit is not None and len(paths) >= limit:
+                break
+            if minimal_only and paths and len(path) > len(paths[0]):
+                break
+            paths.append(path)
+        return [[self.route_names[r] for r in path] for path in paths]
@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from typing import Callable
+
+from requests import ConnectionError, Response, Session, Timeout
+from requests.adapters import HTTPAdapter
+
+from instrumentation import metrics
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_SECONDS = 0.5
+DEFAULT_MAX_BACKOFF_SECONDS = 30.0
+# below this many requests left in the rate limit window, requests are spread out over the rest of the window
+DEFAULT_THROTTLE_THRESHOLD = 10
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def validators_for(response: Response) -> dict[str, str]:
+    """
+    :param response: a successful response
+    :return: the cache validators (``ETag``/``Last-Modified``) to revalidate the response with later, if any
+    """
+    validators = {}
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+    return validators
+
+
+class MbtaTransport:
+    """
+    The one HTTP client every request to the MBTA API goes through. It provides:
+        * a pooled session, so connections are kept alive and reused across requests and threads
+        * throttling driven by the ``x-ratelimit-remaining``/``x-ratelimit-reset`` headers, so the quota is spread
+          over the rest of its window instead of being run into
+        * retries with jittered exponential backoff on connection errors, 429s and 5xxs
+        * conditional requests, so unchanged resources come back as bodiless 304s
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        pool_size: int = 8,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        max_backoff_seconds: float = DEFAULT_MAX_BACKOFF_SECONDS,
+        throttle_threshold: int = DEFAULT_THROTTLE_THRESHOLD,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        jitter: Callable[[float, float], float] = random.uniform,
+    ):
+        """
+        :param api_key: MBTA API key, sent with every request when set
+        :param pool_size: connections kept open, should be at least the number of concurrent requests
+        :param max_retries: retries after the first attempt before giving up
+        :param backoff_seconds: base of the exponential backoff between retries
+        :param max_backoff_seconds: cap on the backoff between retries
+        :param throttle_threshold: remaining requests in the rate limit window below which requests are spaced out
+        :param clock: wall clock (the rate limit reset header is a unix timestamp), injectable for testing
+        :param sleep: injectable for testing
+        :param jitter: draws a random delay between its two arguments, injectable for testing
+        """
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.throttle_threshold = throttle_threshold
+        self._clock = clock
+        self._sleep = sleep
+        self._jitter = jitter
+
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if api_key:
+            self.session.headers["x-api-key"] = api_key
+
+        self._lock = threading.Lock()
+        self._remaining: int | None = None
+        self._reset_at = 0.0
+        self._next_request_at = 0.0
+
+    def get(
+        self,
+        url: str,
+        params: dict[str, str] | None = None,
+        validators: dict[str, str] | None = None,
+        stream: bool = False,
+        headers: dict[str, str] | None = None,
+    ) -> Response:
+        """
+        Sends a GET request, waiting out the rate limit and retrying transient failures.
+        :param url: URL to request
+        :param params: query params for the request
+        :param validators: validators of a cached copy from ``validators_for``, to make the request conditional
+        :param stream: don't read the body up front (the caller must consume or close the response)
+        :param headers: extra headers for the request e.g. ``Accept``
+        :return: the final response, which is a 304 if the cached copy is still valid. Error statuses aren't raised
+        :raises requests.ConnectionError: if the API can't be reached after every retry
+        """
+        headers = dict(headers or {})
+        if validators:
+            if "etag" in validators:
+                headers["If-None-Match"] = validators["etag"]
+            if "last_modified" in validators:
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        attempt = 0
+        while True:
+            self._wait_for_turn()
+            try:
+                response = self.session.get(
+                    url, params=params, headers=headers, stream=stream
+                )
+            except (ConnectionError, Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                metrics.increment("http.retries")
+                self._sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+
+            self._record_rate_limit(response)
+            if (
+                response.status_code not in RETRYABLE_STATUS_CODES
+                or attempt >= self.max_retries
+            ):
+                return response
+
+            response.close()
+            metrics.increment("http.retries")
+            self._sleep(max(self._backoff(attempt), self._retry_after(response)))
+            attempt += 1
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": spreads out the retries of concurrent requests that failed together
+        ceiling = min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt)
+        return self._jitter(0, ceiling)
+
+    def _retry_after(self, response: Response) -> float:
+        retry_after = response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+        if response.status_code == 429:
+            with self._lock:
+                return max(0.0, self._reset_at - self._clock())
+        return 0.0
+
+    def _record_rate_limit(self, response: Response) -> None:
+        try:
+            remaining = int(response.headers["x-ratelimit-remaining"])
+            reset_at = float(response.headers["x-ratelimit-reset"])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            self._remaining = remaining
+            self._reset_at = reset_at
+
+    def _wait_for_turn(self) -> None:
+        """
+        Spaces requests out evenly over the rest of the rate limit window once the remaining quota runs low.
+        Each caller reserves the next slot under the lock, then sleeps outside it.
+        """
+        with self._lock:
+            now = self._clock()
+            if self._remaining is None or now >= self._reset_at:
+                return
+            if self._remaining >= self.throttle_threshold:
+                return
+            interval = (self._reset_at - now) / (self._remaining + 1)
+            send_at = max(now, self._next_request_at)
+            if self._remaining == 0:
+                send_at = max(send_at, self._reset_at)
+            self._next_request_at = send_at + interval
+            # counts against the quota until a response reports the real figure
+            self._remaining = max(self._remaining - 1, 0)
+        if send_at > now:
+            metrics.increment("http.throttled")
+            self._sleep(send_at - now)
+
+    def close(self) -> None:
+        self.session.close()
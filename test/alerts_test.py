@@ -0,0 +1,361 @@
+import json
+import threading
+
+import pytest
+
+from alerts import (
+    AlertSubscriber,
+    Disruption,
+    DisruptionTracker,
+    close_stops,
+    iter_server_sent_events,
+)
+from fake_clock import FakeClock
+from fake_mbta_server import FakeMbtaServer
+from models import Route, Stop
+from server import QueryService
+from transit_graph import TransitGraph
+
+RED = Route(id="Red", long_name="Red Line")
+ORANGE = Route(id="Orange", long_name="Orange Line")
+BLUE = Route(id="Blue", long_name="Blue Line")
+GREEN = Route(id="Green", long_name="Green Line")
+
+# Green also connects Red and Blue, the long way round
+ROUTE_STOPS = {
+    "Red": {"alewife", "dtx", "park"},
+    "Orange": {"dtx", "state"},
+    "Blue": {"state", "wonderland", "gov"},
+    "Green": {"park", "gov"},
+}
+ROUTES = {r.id: r for r in (RED, ORANGE, BLUE, GREEN)}
+
+
+def _graph() -> TransitGraph:
+    stop_to_routes = {}
+    for route_id, stop_ids in ROUTE_STOPS.items():
+        for stop_id in stop_ids:
+            stop_to_routes.setdefault(Stop(id=stop_id, name=stop_id), set()).add(
+                ROUTES[route_id]
+            )
+    graph = TransitGraph.from_stop_to_routes_mapping(stop_to_routes)
+    graph.precompute_transfers()
+    return graph
+
+
+class ClosedGraph:
+    """A graph with the stops closed by a tracker's disruptions, as the service keeps them."""
+
+    def __init__(self, tracker: DisruptionTracker):
+        self.tracker = tracker
+        self.graph = _graph()
+        self.closed_stops = {}
+
+    def apply(self) -> list[str]:
+        closed_stops = self.tracker.closures(ROUTE_STOPS)
+        changed = close_stops(self.graph, self.closed_stops, closed_stops)
+        self.closed_stops = closed_stops
+        return changed
+
+
+def alert(
+    alert_id: str,
+    entities: list[dict],
+    effect: str = "SUSPENSION",
+    active_period: list[dict] | None = None,
+) -> dict:
+    return {
+        "id": alert_id,
+        "type": "alert",
+        "attributes": {
+            "effect": effect,
+            "header": "Shuttle buses replace service",
+            "informed_entity": [{"route_type": 1, **e} for e in entities],
+            "active_period": active_period or [],
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    ("test_id", "lines", "expected"),
+    [
+        (
+            "should parse typed events",
+            ["event: reset", "data: []", "", "event: remove", 'data: {"id": "1"}', ""],
+            [("reset", "[]"), ("remove", '{"id": "1"}')],
+        ),
+        (
+            "should join data lines and skip comments",
+            [": keep-alive", "data:[1,", "data: 2]", ""],
+            [("message", "[1,\n2]")],
+        ),
+        (
+            "should not dispatch an unfinished event",
+            ["event: add", "data: {}"],
+            [],
+        ),
+    ],
+)
+def test_iter_server_sent_events(test_id: str, lines: list[str], expected) -> None:
+    assert list(iter_server_sent_events(lines)) == expected
+
+
+@pytest.mark.parametrize(
+    ("test_id", "data", "expected"),
+    [
+        (
+            "should read stops of routes, whole routes and whole stops",
+            alert(
+                "1",
+                [
+                    {"route": "Red", "stop": "park"},
+                    {"route": "Orange"},
+                    {"stop": "state"},
+                ],
+                active_period=[{"start": "2026-10-18T05:00:00-04:00", "end": None}],
+            ),
+            Disruption(
+                id="1",
+                effect="SUSPENSION",
+                routes=frozenset({"Orange"}),
+                route_stops=frozenset({("Red", "park")}),
+                stops=frozenset({"state"}),
+                active_periods=((1792314000.0, None),),
+            ),
+        ),
+        (
+            "should ignore alerts that don't take stops out of service",
+            alert("2", [{"route": "Red"}], effect="DELAY"),
+            None,
+        ),
+    ],
+)
+def test_disruption_from_mbta_json(test_id: str, data: dict, expected) -> None:
+    assert Disruption.from_mbta_json(data) == expected
+
+
+def test_disruption_from_unexpected_json_raises() -> None:
+    with pytest.raises(ValueError):
+        Disruption.from_mbta_json({"id": "1", "attributes": {"effect": "SHUTTLE"}})
+
+
+def test_disruptions_close_and_reopen_stops() -> None:
+    tracker = DisruptionTracker()
+    closed = ClosedGraph(tracker)
+    graph = closed.graph
+    assert closed.apply() == []
+    assert graph.min_transfers("alewife", "state") == 1
+
+    # Orange is suspended through Downtown Crossing, so the trip goes round by Green
+    suspension = alert("1", [{"route": "Orange", "stop": "dtx"}])
+    assert tracker.handle_event("reset", json.dumps([suspension]))
+    assert closed.apply() == ["Orange", "Red"]
+    assert graph.find_path("alewife", "wonderland") == [
+        "Red Line",
+        "Green Line",
+        "Blue Line",
+    ]
+    assert graph.routes_for_stop("dtx") == ["Red"]
+    assert graph.min_transfers("alewife", "state") == 2
+
+    # and Park Street closes on every route
+    closure = alert("2", [{"stop": "park"}], effect="SHUTTLE")
+    tracker.handle_event("add", json.dumps(closure))
+    closed.apply()
+    assert graph.find_path("alewife", "wonderland") is None
+    assert tracker.summary(closed.closed_stops) == {
+        "disruptions": {"1": "SUSPENSION", "2": "SHUTTLE"},
+        "closed_stops": {"Green": ["park"], "Orange": ["dtx"], "Red": ["park"]},
+    }
+
+    # an update that turns the suspension into a delay lifts it
+    tracker.handle_event("update", json.dumps(alert("1", [], effect="DELAY")))
+    tracker.handle_event("remove", json.dumps({"id": "2", "type": "alert"}))
+    assert not tracker.handle_event("remove", json.dumps({"id": "2"}))
+    closed.apply()
+    assert graph.routes_for_stop("park") == ["Green", "Red"]
+    assert graph.min_transfers("alewife", "state") == 1
+    assert closed.closed_stops == {}
+
+
+def test_disruptions_apply_during_their_active_periods() -> None:
+    clock = FakeClock(now=1000.0)
+    tracker = DisruptionTracker(clock)
+    closed = ClosedGraph(tracker)
+
+    tracker.handle_event(
+        "add",
+        json.dumps(
+            alert(
+                "1",
+                [{"route": "Orange"}],
+                active_period=[
+                    {
+                        "start": "1970-01-01T00:20:00+00:00",
+                        "end": "1970-01-01T00:30:00+00:00",
+                    }
+                ],
+            )
+        ),
+    )
+    closed.apply()
+    assert closed.graph.routes_for_stop("state") == ["Blue", "Orange"]
+
+    clock.now = 1500.0
+    closed.apply()
+    assert closed.graph.routes_for_stop("state") == ["Blue"]
+
+    clock.now = 1800.0
+    closed.apply()
+    assert closed.graph.routes_for_stop("state") == ["Blue", "Orange"]
+
+
+@pytest.mark.parametrize(
+    ("test_id", "event", "data"),
+    [
+        ("should reject data that isn't JSON", "add", "not json"),
+        ("should reject a removal of a list", "remove", '[{"id": "1"}]'),
+        ("should reject a removal without an id", "remove", '{"type": "alert"}'),
+        ("should reject a removal with a non string id", "remove", '{"id": ["1"]}'),
+    ],
+)
+def test_malformed_events_raise(test_id: str, event: str, data: str) -> None:
+    tracker = DisruptionTracker()
+    tracker.handle_event("reset", json.dumps([alert("1", [{"route": "Orange"}])]))
+
+    with pytest.raises(ValueError):
+        tracker.handle_event(event, data)
+    assert list(tracker.disruptions) == ["1"]
+
+
+def test_subscriber_reconnects() -> None:
+    events = []
+    connections = []
+    done = threading.Event()
+
+    def open_stream():
+        connections.append(len(connections))
+        if len(connections) == 1:
+            raise ConnectionError("dropped")
+        yield "reset", "[]"
+        yield "remove", "not json"
+        done.set()
+
+    def on_event(event: str, data: str) -> None:
+        json.loads(data)
+        events.append(event)
+
+    subscriber = AlertSubscriber(on_event, open_stream, reconnect_seconds=0.01)
+    subscriber.start()
+    assert done.wait(5)
+    subscriber.stop()
+
+    # the malformed event is skipped without dropping the connection
+    assert events[0] == "reset" and len(connections) >= 2
+
+
+def test_service_applies_disruptions_across_refreshes(
+    fake_mbta: FakeMbtaServer, monkeypatch
+) -> None:
+    service = QueryService(refresh_interval=0, alerts=True)
+    suspension = alert("1", [{"route": "Orange", "stop": "place-dwnxg"}])
+    service.handle_alert_event("reset", json.dumps([suspension]))
+    assert service.find_path("wonderland", "alewife")["path"] is None
+
+    # the Blue Line is extended to Park Street, the suspension still holds after the reload
+    monkeypatch.setitem(
+        fake_mbta.system.routes,
+        "Blue",
+        ("Blue Line", [["place-wondl", "place-state", "place-pktrm"]]),
+    )
+    service.refresh()
+    assert service.find_path("wonderland", "alewife")["path"] == [
+        "Blue Line",
+        "Red Line",
+    ]
+    assert service.find_path("forest hills", "alewife")["path"] == [
+        "Orange Line",
+        "Blue Line",
+        "Red Line",
+    ]
+    assert service.metrics()["alerts"]["closed_stops"] == {"Orange": ["place-dwnxg"]}
+
+    service.handle_alert_event("remove", json.dumps({"id": "1"}))
+    assert service.find_path("forest hills", "alewife")["path"] == [
+        "Orange Line",
+        "Red Line",
+    ]
+
+
+def test_service_follows_the_alerts_stream(fake_mbta: FakeMbtaServer) -> None:
+    service = QueryService(refresh_interval=0, alerts=True)
+    loaded_requests = list(fake_mbta.requests)
+    service.start_refreshing()
+    try:
+        suspension = alert("1", [{"route": "Orange"}])
+        fake_mbta.alert_events.put(("reset", "[]"))
+        fake_mbta.alert_events.put(("add", json.dumps(suspension)))
+        for _ in range(500):
+            if service.find_path("wonderland", "alewife")["path"] is None:
+                break
+            threading.Event().wait(0.01)
+        assert service.find_path("wonderland", "alewife")["path"] is None
+
+        # only the stream was opened, nothing was polled again
+        assert fake_mbta.requests == [*loaded_requests, "/alerts"]
+    finally:
+        service.stop_refreshing()
+        fake_mbta.alert_events.put(None)
+
+
+def test_service_applies_disruptions_as_they_start_and_end(
+    fake_mbta: FakeMbtaServer,
+) -> None:
+    clock = FakeClock(now=1000.0)
+    service = QueryService(refresh_interval=0, alerts=True)
+    service.disruptions = DisruptionTracker(clock)
+    service.max_disruption_wait = 0.01
+    suspension = alert(
+        "1",
+        [{"route": "Orange"}],
+        active_period=[
+            {
+                "start": "1970-01-01T00:20:00+00:00",
+                "end": "1970-01-01T00:30:00+00:00",
+            }
+        ],
+    )
+    service.handle_alert_event("reset", json.dumps([suspension]))
+    assert service.disruptions.seconds_to_next_change() == 200
+    service.start_refreshing()
+    try:
+
+        def path() -> list[str] | None:
+            return service.find_path("wonderland", "alewife")["path"]
+
+        assert path() is not None
+
+        # no event comes in when the suspension starts, or when it ends
+        clock.now = 1200.0
+        for _ in range(500):
+            if path() is None:
+                break
+            threading.Event().wait(0.01)
+        assert path() is None
+        assert service.disruptions.seconds_to_next_change() == 600
+
+        clock.now = 1800.0
+        for _ in range(500):
+            if path() is not None:
+                break
+            threading.Event().wait(0.01)
+        assert path() is not None
+        assert service.disruptions.seconds_to_next_change() is None
+    finally:
+        service.stop_refreshing()
+        fake_mbta.alert_events.put(None)
+
+
+def test_alerts_cant_change_a_graph_snapshot() -> None:
+    with pytest.raises(ValueError):
+        QueryService(refresh_interval=0, graph_snapshot="graph.bin", alerts=True)
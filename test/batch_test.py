@@ -0,0 +1,78 @@
+import io
+import json
+
+import pytest
+
+from batch import parse_pair, run_batch
+from models import Route, Stop
+from stop_name_index import StopNameIndex
+from transit_graph import TransitGraph
+
+RED = Route(id="Red", long_name="Red Line")
+ORANGE = Route(id="Orange", long_name="Orange Line")
+
+STOP_TO_ROUTES = {
+    Stop(id="alewife", name="Alewife"): {RED},
+    Stop(id="dtx", name="Downtown Crossing"): {RED, ORANGE},
+    Stop(id="oak_grove", name="Oak Grove"): {ORANGE},
+}
+GRAPH = TransitGraph.from_stop_to_routes_mapping(STOP_TO_ROUTES)
+NAME_INDEX = StopNameIndex(STOP_TO_ROUTES)
+
+
+@pytest.mark.parametrize(
+    ("test_id", "line", "expected"),
+    [
+        ("should parse a JSON line", '{"start": "a", "end": "b"}', ("a", "b")),
+        ("should parse a tab separated line", "a\tb\n", ("a", "b")),
+    ],
+)
+def test_parse_pair(test_id: str, line: str, expected: tuple[str, str]) -> None:
+    assert parse_pair(line) == expected
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        '{"start": "a"}',
+        '{"start": null, "end": "b"}',
+        '{"start": "a", "end": 1}',
+        '{"start": " ", "end": "b"}',
+        "{not json",
+        "just one name",
+    ],
+)
+def test_parse_pair_rejects_bad_lines(line: str) -> None:
+    with pytest.raises(ValueError):
+        parse_pair(line)
+
+
+def test_run_batch_reports_errors_per_line() -> None:
+    lines = [
+        '{"start": "alewife", "end": "oak grove"}\n',
+        "\n",
+        "Alewife\tOak Grov\n",
+        "Alewife\tNowhere\n",
+        "garbage\n",
+        "Downtown Crossing\tOak Grove\n",
+    ]
+    output = io.StringIO()
+
+    count, seconds = run_batch(lines, output, NAME_INDEX, GRAPH)
+
+    assert count == 5
+    assert seconds >= 0
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert results[0] == {
+        "line": 1,
+        "start": "alewife",
+        "end": "oak grove",
+        "path": ["Red Line", "Orange Line"],
+    }
+    assert results[1]["line"] == 3
+    assert results[1]["path"] == ["Red Line", "Orange Line"]
+    assert results[2]["line"] == 4
+    assert results[2]["error"] == "Unable to identify the stop(s) Nowhere"
+    assert results[2]["suggestions"] == {"Nowhere": []}
+    assert results[3]["line"] == 5 and "error" in results[3]
+    assert results[4]["path"] == ["Orange Line"]
@@ -0,0 +1,114 @@
+import pytest
+
+from bulk_loader import (
+    build_route_stop_mappings,
+    parse_route_patterns,
+    route_stop_sequences,
+)
+from models import Route, Stop
+
+
+def _pattern(route_id: str, trip_id: str) -> dict:
+    return {
+        "type": "route_pattern",
+        "id": f"{route_id}-{trip_id}",
+        "relationships": {
+            "route": {"data": {"type": "route", "id": route_id}},
+            "representative_trip": {"data": {"type": "trip", "id": trip_id}},
+        },
+    }
+
+
+def _trip(trip_id: str, stop_ids: list[str]) -> dict:
+    return {
+        "type": "trip",
+        "id": trip_id,
+        "relationships": {
+            "stops": {"data": [{"type": "stop", "id": s} for s in stop_ids]}
+        },
+    }
+
+
+def _platform(stop_id: str, station_id: str | None) -> dict:
+    return {
+        "type": "stop",
+        "id": stop_id,
+        "relationships": {
+            "parent_station": {
+                "data": {"type": "stop", "id": station_id} if station_id else None
+            }
+        },
+    }
+
+
+DOCUMENT = {
+    "data": [_pattern("Red", "t1"), _pattern("Red", "t2"), _pattern("Orange", "t3")],
+    "included": [
+        _trip("t1", ["p1", "p2"]),
+        _trip("t2", ["p2", "p1"]),
+        _trip("t3", ["p3", "p4"]),
+        _platform("p1", "place-a"),
+        _platform("p2", "place-b"),
+        _platform("p3", "place-b"),
+        _platform("p4", None),
+    ],
+}
+
+
+def test_route_stop_sequences() -> None:
+    actual = route_stop_sequences(parse_route_patterns(DOCUMENT))
+    assert actual == {
+        "Red": [["place-a", "place-b"], ["place-b", "place-a"]],
+        "Orange": [["place-b", "p4"]],
+    }
+
+
+def test_parse_route_patterns_rejects_unexpected_format() -> None:
+    with pytest.raises(ValueError):
+        parse_route_patterns({"data": [{"relationships": {}}]})
+
+
+@pytest.mark.parametrize(
+    ("test_id", "sequences", "expected_route_to_stops", "expected_stop_to_routes"),
+    [
+        (
+            "should keep routes without patterns and ignore unknown stops",
+            {"route_1": [["stop_a", "unknown"]]},
+            {
+                Route(id="route_1", long_name="1"): {Stop(id="stop_a", name="A")},
+                Route(id="route_2", long_name="2"): set(),
+            },
+            {Stop(id="stop_a", name="A"): {Route(id="route_1", long_name="1")}},
+        ),
+        (
+            "should build both directions for shared stops",
+            {"route_1": [["stop_a", "stop_b"]], "route_2": [["stop_b"]]},
+            {
+                Route(id="route_1", long_name="1"): {
+                    Stop(id="stop_a", name="A"),
+                    Stop(id="stop_b", name="B"),
+                },
+                Route(id="route_2", long_name="2"): {Stop(id="stop_b", name="B")},
+            },
+            {
+                Stop(id="stop_a", name="A"): {Route(id="route_1", long_name="1")},
+                Stop(id="stop_b", name="B"): {
+                    Route(id="route_1", long_name="1"),
+                    Route(id="route_2", long_name="2"),
+                },
+            },
+        ),
+    ],
+)
+def test_build_route_stop_mappings(
+    test_id: str,
+    sequences: dict[str, list[list[str]]],
+    expected_route_to_stops: dict[Route, set[Stop]],
+    expected_stop_to_routes: dict[Stop, set[Route]],
+) -> None:
+    routes = [Route(id="route_1", long_name="1"), Route(id="route_2", long_name="2")]
+    stops = [Stop(id="stop_a", name="A"), Stop(id="stop_b", name="B")]
+
+    route_to_stops, stop_to_routes = build_route_stop_mappings(routes, stops, sequences)
+    assert route_to_stops == expected_route_to_stops
+    assert stop_to_routes == expected_stop_to_routes
@@ -0,0 +1,294 @@
+import asyncio
+import threading
+
+import pytest
+
+import mbta_client
+import path_finding
+from caching import cached
+from fake_clock import FakeClock
+from fake_mbta_server import FakeMbtaServer
+
+
+class Fetcher:
+    """Counts its calls, and holds them until released when gated."""
+
+    def __init__(self, gated: bool = False):
+        self.calls = []
+        self.gate = threading.Event()
+        if not gated:
+            self.gate.set()
+        self.fail = False
+
+    def __call__(self, key: str) -> str:
+        self.calls.append(key)
+        self.gate.wait(5)
+        if self.fail:
+            raise ValueError(key)
+        return f"{key}{len(self.calls)}"
+
+
+def _wait_for(condition) -> None:
+    for _ in range(500):
+        if condition():
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError("timed out")
+
+
+def test_hits_misses_and_lru_eviction() -> None:
+    fetch = cached(maxsize=2)(Fetcher())
+
+    assert [fetch("a"), fetch("b"), fetch("a"), fetch("c"), fetch("b")] == [
+        "a1",
+        "b2",
+        "a1",
+        "c3",
+        "b4",  # b was the least recently used when c was added
+    ]
+    info = fetch.cache_info()
+    assert (info.hits, info.misses, info.maxsize, info.currsize) == (1, 4, 2, 2)
+
+    fetch.cache_clear()
+    assert fetch.cache_info() == (0, 0, 2, 0, 0)
+
+
+def test_keyword_arguments_are_part_of_the_key() -> None:
+    calls = []
+
+    @cached()
+    def add(a: int, b: int = 0) -> int:
+        calls.append((a, b))
+        return a + b
+
+    assert add(1, b=2) == add(1, b=2) == 3
+    assert add(1) == 1
+    assert calls == [(1, 2), (1, 0)]
+
+
+def test_concurrent_callers_share_one_call() -> None:
+    fetcher = Fetcher(gated=True)
+    fetch = cached()(fetcher)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(fetch("a"))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: fetch.cache_info().coalesced == 7)
+    fetcher.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert fetcher.calls == ["a"]
+    assert results == ["a1"] * 8
+
+
+def test_errors_are_shared_but_not_cached() -> None:
+    fetcher = Fetcher(gated=True)
+    fetcher.fail = True
+    fetch = cached()(fetcher)
+    errors = []
+
+    def call() -> None:
+        try:
+            fetch("a")
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    _wait_for(lambda: fetch.cache_info().coalesced == 2)
+    fetcher.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 3 and fetcher.calls == ["a"]
+    fetcher.fail = False
+    assert fetch("a") == "a2"
+
+
+def test_values_expire_after_the_ttl() -> None:
+    clock = FakeClock()
+    fetch = cached(ttl=60, clock=clock)(Fetcher())
+
+    assert fetch("a") == "a1"
+    clock.now += 59
+    assert fetch("a") == "a1"
+    clock.now += 1
+    assert fetch("a") == "a2"
+
+
+def test_stale_values_are_served_while_revalidating() -> None:
+    clock = FakeClock()
+    fetcher = Fetcher()
+    fetch = cached(ttl=60, stale_ttl=30, clock=clock)(fetcher)
+    assert fetch("a") == "a1"
+
+    fetcher.gate.clear()
+    clock.now += 70
+    # expired, but within the stale window: answered right away while a single refresh runs
+    assert [fetch("a") for _ in range(3)] == ["a1"] * 3
+    _wait_for(lambda: len(fetcher.calls) == 2)
+    fetcher.gate.set()
+    _wait_for(lambda: fetch("a") == "a2")
+    assert len(fetcher.calls) == 2
+
+    # past the stale window callers wait for the call
+    clock.now += 100
+    assert fetch("a") == "a3"
+
+
+def test_failed_revalidation_backs_off() -> None:
+    clock = FakeClock()
+    fetcher = Fetcher()
+    fetch = cached(ttl=60, stale_ttl=30, clock=clock)(fetcher)
+    assert fetch("a") == "a1"
+
+    fetcher.fail = True
+    clock.now += 61
+    assert fetch("a") == "a1"
+    _wait_for(lambda: fetch._entries[("a",)].revalidation_failed_at is not None)
+
+    # the stale value is served without making the failing call again until the cooldown is over
+    assert [fetch("a") for _ in range(5)] == ["a1"] * 5
+    assert len(fetcher.calls) == 2
+
+    fetcher.fail = False
+    clock.now += fetch.revalidation_cooldown
+    assert fetch("a") == "a1"
+    _wait_for(lambda: len(fetcher.calls) == 3)
+    _wait_for(lambda: fetch("a") == "a3")
+
+
+def test_reload_callbacks_run_when_an_expired_value_changes() -> None:
+    clock = FakeClock()
+    values = {"a": 1}
+    fetch = cached(ttl=60, clock=clock)(values.get)
+    reloads = []
+    fetch.add_reload_callback(lambda: reloads.append(fetch("a")))
+
+    assert fetch("a") == 1
+    clock.now += 60
+    assert fetch("a") == 1
+    values["a"] = 2
+    clock.now += 60
+    assert fetch("a") == 2
+    fetch.cache_invalidate("a")
+    values["a"] = 3
+    assert fetch("a") == 3
+
+    # not for the first load, an unchanged value, or one reloaded after being dropped
+    assert reloads == [2]
+
+
+def test_clear_and_invalidate_drop_calls_in_flight() -> None:
+    fetcher = Fetcher(gated=True)
+    fetch = cached()(fetcher)
+    first = []
+    thread = threading.Thread(target=lambda: first.append(fetch("a")))
+    thread.start()
+    _wait_for(lambda: fetcher.calls)
+    fetch.cache_clear()
+    fetcher.gate.set()
+    thread.join()
+
+    # the caller still got its answer, but it wasn't kept
+    assert first == ["a1"]
+    assert fetch.cache_info().currsize == 0
+
+    assert fetch("a") == "a2" and fetch("b") == "b3"
+    assert fetch.cache_invalidate("a")
+    assert not fetch.cache_invalidate("c")
+    assert [fetch("a"), fetch("b")] == ["a4", "b3"]
+
+
+def test_async_callers_share_one_call() -> None:
+    fetcher = Fetcher(gated=True)
+    fetch = cached()(fetcher)
+
+    async def main() -> list[str]:
+        calls = asyncio.gather(*(fetch.call_async("a") for _ in range(5)))
+        # the event loop isn't blocked while the call is in flight
+        await asyncio.sleep(0.05)
+        fetcher.gate.set()
+        return await calls
+
+    assert asyncio.run(main()) == ["a1"] * 5
+    assert fetcher.calls == ["a"]
+    assert asyncio.run(fetch.call_async("a")) == "a1"
+
+
+def test_concurrent_cold_loads_make_one_set_of_requests(
+    fake_mbta: FakeMbtaServer,
+) -> None:
+    mbta_client.get_subway_route_to_stops_mapping()
+    expected_requests = sorted(fake_mbta.requests)
+    mbta_client.clear_caches()
+    fake_mbta.requests.clear()
+
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(
+                mbta_client.get_subway_route_to_stops_mapping()
+            )
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(fake_mbta.requests) == expected_requests
+    assert all(r is results[0] for r in results)
+
+
+@pytest.mark.parametrize(
+    ("test_id", "stale_ttl"),
+    [
+        ("should rebuild the graph once the data expires", 0),
+        ("should rebuild the graph once the stale data is reloaded", 30),
+    ],
+)
+def test_graphs_are_rebuilt_from_expired_data(
+    fake_mbta: FakeMbtaServer, monkeypatch, test_id: str, stale_ttl: float
+) -> None:
+    clock = FakeClock()
+    for cached_function in (
+        *mbta_client._CACHED_FETCHERS,
+        *mbta_client._derived_caches,
+    ):
+        monkeypatch.setattr(cached_function, "_clock", clock)
+    mbta_client.configure_cache_ttl(60, stale_ttl)
+    try:
+        graph = path_finding.get_subway_transit_graph()
+        monkeypatch.setitem(
+            fake_mbta.system.routes, "Silver", ("Silver Line", [["place-state"]])
+        )
+        clock.now += 30
+        assert path_finding.get_subway_transit_graph() is graph
+
+        clock.now += 31
+        _wait_for(lambda: "Silver" in path_finding.get_subway_transit_graph().route_ids)
+        assert mbta_client.get_subway_stop_name_index().resolve("state") == [
+            "place-state"
+        ]
+    finally:
+        mbta_client.configure_cache_ttl(None)
+
+
+@pytest.mark.parametrize(
+    ("test_id", "ttl", "stale_ttl"),
+    [
+        ("should reject a ttl that isn't positive", 0, 0),
+        ("should reject a negative stale ttl", 60, -1),
+    ],
+)
+def test_configure_cache_ttl_validates(
+    test_id: str, ttl: float, stale_ttl: float
+) -> None:
+    with pytest.raises(ValueError):
+        mbta_client.configure_cache_ttl(ttl, stale_ttl)
@@ -0,0 +1,25 @@
+import importlib.util
+from pathlib import Path
+
+from fake_mbta_server import FakeMbtaServer
+
+BENCHMARK_PATH = (
+    Path(__file__).resolve().parent.parent / "benchmarks" / "cli_benchmark.py"
+)
+
+
+def test_benchmark_runs_on_the_small_network(
+    fake_mbta: FakeMbtaServer, monkeypatch
+) -> None:
+    spec = importlib.util.spec_from_file_location("cli_benchmark", BENCHMARK_PATH)
+    benchmark = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(benchmark)
+    # a smoke test, the timings don't matter
+    monkeypatch.setattr(benchmark, "QUERY_SECONDS", 0.01)
+    monkeypatch.setattr(benchmark, "ROUNDS", 1)
+
+    results = benchmark.benchmark_network()
+
+    baseline = benchmark.json.loads(benchmark.BASELINE_PATH.read_text())
+    assert results.keys() == baseline["small"].keys()
+    assert all(metric["value"] >= 0 for metric in results.values())
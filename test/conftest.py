@@ -1,7 +1,45 @@
 import pytest
 
+import mbta_client
+import path_finding
+from fake_gtfs_feed import write_feed
+from fake_mbta_server import (
+    SMALL_SYSTEM_ROUTES,
+    SMALL_SYSTEM_STOPS,
+    FakeMbtaServer,
+    FakeMbtaSystem,
+)
+
 
 # Don't need to have an api key set for testing
 @pytest.fixture(autouse=True)
 def set_api_key(monkeypatch):
     monkeypatch.setenv("MBTA_API_KEY", "test_key")
+
+
+@pytest.fixture
+def fake_mbta(monkeypatch):
+    """
+    Points mbta_client at a local stand-in for the MBTA API serving a small subway system, with no snapshot cache.
+    """
+    system = FakeMbtaSystem(SMALL_SYSTEM_ROUTES, SMALL_SYSTEM_STOPS)
+    original_cache = mbta_client._snapshot_cache
+    with FakeMbtaServer(system) as server:
+        monkeypatch.setattr(mbta_client, "MBTA_API_BASE_URL", server.url)
+        mbta_client.configure_snapshot_cache(None)
+        yield server
+    mbta_client.configure_snapshot_cache(original_cache)
+
+
+@pytest.fixture
+def gtfs_feed(tmp_path):
+    """
+    Points mbta_client at a GTFS static feed of the same small subway system, instead of the API.
+    """
+    system = FakeMbtaSystem(SMALL_SYSTEM_ROUTES, SMALL_SYSTEM_STOPS)
+    path = write_feed(system, tmp_path / "gtfs.zip", trips_per_pattern=3)
+    mbta_client.configure_gtfs_feed(path)
+    path_finding.get_subway_timetable.cache_clear()
+    yield path
+    mbta_client.configure_gtfs_feed(None)
+    path_finding.get_subway_timetable.cache_clear()
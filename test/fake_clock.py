@@ -0,0 +1,13 @@
+class FakeClock:
+    """A clock that only moves when told to (or slept on), for testing time dependent code."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
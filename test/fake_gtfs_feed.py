@@ -0,0 +1,99 @@
+"""
+Writes a GTFS static feed for a ``FakeMbtaSystem``, with the same routes, stations and platforms the fake API serves.
+"""
+
+import csv
+import io
+import zipfile
+from pathlib import Path
+
+from fake_mbta_server import FakeMbtaSystem
+
+# minutes between consecutive stops of a trip, and between consecutive trips of a pattern
+MINUTES_BETWEEN_STOPS = 2
+HEADWAY_MINUTES = 10
+FIRST_DEPARTURE_MINUTES = 6 * 60
+
+
+def _time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+def _csv(rows: list[list]) -> str:
+    out = io.StringIO()
+    csv.writer(out, lineterminator="\n").writerows(rows)
+    return out.getvalue()
+
+
+def feed_tables(system: FakeMbtaSystem, trips_per_pattern: int = 1) -> dict[str, str]:
+    """
+    :param system: the system to describe
+    :param trips_per_pattern: trips run on every stop sequence in each direction
+    :return: mapping of file name to contents. There is also a bus route, which isn't part of the subway
+    """
+    routes = [["route_id", "route_type", "route_long_name", "route_short_name"]]
+    trips = [["route_id", "service_id", "trip_id", "direction_id"]]
+    stop_times = [
+        ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"]
+    ]
+    stops = [["stop_id", "stop_name", "location_type", "parent_station"]]
+
+    platforms = set()
+    for route_id, (name, sequences) in system.routes.items():
+        routes.append([route_id, 1, name, ""])
+        directed = [
+            (direction_id, sequence[::step])
+            for sequence in sequences
+            for direction_id, step in ((0, 1), (1, -1))
+        ]
+        for i, (direction_id, sequence) in enumerate(directed):
+            for n in range(trips_per_pattern):
+                trip_id = f"{route_id}-{i}-{n}"
+                trips.append([route_id, "weekday", trip_id, direction_id])
+                departure = FIRST_DEPARTURE_MINUTES + n * HEADWAY_MINUTES
+                for position, stop_id in enumerate(sequence):
+                    time = _time(departure + position * MINUTES_BETWEEN_STOPS)
+                    platform_id = f"{stop_id}-{route_id}"
+                    stop_times.append(
+                        [trip_id, time, time, platform_id, (position + 1) * 10]
+                    )
+                    platforms.add((platform_id, stop_id))
+
+    routes.append(["bus-1", 3, "", "1"])
+    trips.append(["bus-1", "weekday", "bus-1-0", 0])
+    stop_times.append(["bus-1-0", _time(420), _time(420), "bus-stop", 1])
+    stops.append(["bus-stop", "Bus Stop", 0, ""])
+
+    for stop_id, name in system.stops.items():
+        stops.append([stop_id, name, 1, ""])
+    for platform_id, stop_id in sorted(platforms):
+        stops.append([platform_id, system.stops[stop_id], 0, stop_id])
+
+    # every trip runs on weekdays
+    calendar = [
+        ["service_id", "monday", "tuesday", "wednesday", "thursday", "friday"]
+        + ["saturday", "sunday", "start_date", "end_date"],
+        ["weekday", 1, 1, 1, 1, 1, 0, 0, "20200101", "20991231"],
+    ]
+
+    return {
+        "calendar.txt": _csv(calendar),
+        "routes.txt": _csv(routes),
+        "trips.txt": _csv(trips),
+        "stop_times.txt": _csv(stop_times),
+        "stops.txt": _csv(stops),
+    }
+
+
+def write_feed(system: FakeMbtaSystem, path: Path, trips_per_pattern: int = 1) -> Path:
+    """
+    Writes the feed of a system as a zip.
+    :param system: the system to describe
+    :param path: where to write the zip
+    :param trips_per_pattern: trips run on every stop sequence in each direction
+    :return: the path of the zip
+    """
+    with zipfile.ZipFile(path, "w") as feed:
+        for name, contents in feed_tables(system, trips_per_pattern).items():
+            feed.writestr(name, contents)
+    return path
@@ -0,0 +1,300 @@
+"""
+A local stand-in for the MBTA v3 API, serving just the endpoints mbta_client uses from an in-memory transit system,
+and the streaming (server-sent events) alerts endpoint from a queue of events.
+"""
+
+import hashlib
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# route id -> (long name, stop id sequence of each route pattern)
+SMALL_SYSTEM_ROUTES = {
+    "Blue": ("Blue Line", [["place-wondl", "place-state"]]),
+    "Green-B": (
+        "Green Line B",
+        [["place-haecl", "place-gover", "place-kencl", "place-bucen"]],
+    ),
+    "Mattapan": ("Mattapan Trolley", [["place-matt", "place-asmnl"]]),
+    "Orange": (
+        "Orange Line",
+        [["place-forhl", "place-dwnxg", "place-state", "place-haecl"]],
+    ),
+    "Red": (
+        "Red Line",
+        [
+            ["place-alfcl", "place-pktrm", "place-dwnxg", "place-asmnl"],
+            ["place-alfcl", "place-pktrm", "place-dwnxg", "place-brntn"],
+        ],
+    ),
+}
+SMALL_SYSTEM_STOPS = {
+    "place-alfcl": "Alewife",
+    "place-asmnl": "Ashmont",
+    "place-brntn": "Braintree",
+    "place-bucen": "Boston University Central",
+    "place-dwnxg": "Downtown Crossing",
+    "place-forhl": "Forest Hills",
+    "place-gover": "Government Center",
+    "place-haecl": "Haymarket",
+    "place-kencl": "Kenmore",
+    "place-matt": "Mattapan",
+    "place-pktrm": "Park Street",
+    "place-state": "State",
+    "place-wondl": "Wonderland",
+}
+
+
+class FakeMbtaSystem:
+    """Builds the JSON:API documents for a transit system, in the same shape the real API returns them."""
+
+    def __init__(
+        self,
+        routes: dict[str, tuple[str, list[list[str]]]],
+        stops: dict[str, str],
+    ):
+        self.routes = routes
+        self.stops = stops
+
+    def routes_document(self) -> dict:
+        return {
+            "data": [
+                {"type": "route", "id": route_id, "attributes": {"long_name": name}}
+                for route_id, (name, _) in sorted(
+                    self.routes.items(), key=lambda item: item[1][0]
+                )
+            ]
+        }
+
+    def stops_document(self, route_id: str | None = None) -> dict:
+        if route_id is None:
+            stop_ids = list(self.stops)
+        else:
+            stop_ids = list(
+                dict.fromkeys(s for seq in self.routes[route_id][1] for s in seq)
+            )
+        return {
+            "data": [
+                {"type": "stop", "id": s, "attributes": {"name": self.stops[s]}}
+                for s in stop_ids
+            ]
+        }
+
+    def route_patterns_document(self, route_ids: list[str]) -> dict:
+        patterns, included = [], []
+        platforms = set()
+        for route_id in route_ids:
+            # every sequence is run in both directions
+            directed_sequences = [
+                (direction_id, sequence[::step])
+                for sequence in self.routes[route_id][1]
+                for direction_id, step in ((0, 1), (1, -1))
+            ]
+            for i, (direction_id, sequence) in enumerate(directed_sequences):
+                trip_id = f"{route_id}-trip-{i}"
+                patterns.append(
+                    {
+                        "type": "route_pattern",
+                        "id": f"{route_id}-{i}",
+                        "attributes": {"direction_id": direction_id},
+                        "relationships": {
+                            "route": {"data": {"type": "route", "id": route_id}},
+                            "representative_trip": {
+                                "data": {"type": "trip", "id": trip_id}
+                            },
+                        },
+                    }
+                )
+                # trips stop at platforms, which belong to the parent stations
+                included.append(
+                    {
+                        "type": "trip",
+                        "id": trip_id,
+                        "relationships": {
+                            "stops": {
+                                "data": [
+                                    {"type": "stop", "id": f"{s}-{route_id}"}
+                                    for s in sequence
+                                ]
+                            }
+                        },
+                    }
+                )
+                platforms.update((s, route_id) for s in sequence)
+
+        included.extend(
+            {
+                "type": "stop",
+                "id": f"{s}-{route_id}",
+                "relationships": {
+                    "parent_station": {"data": {"type": "stop", "id": s}}
+                },
+            }
+            for s, route_id in sorted(platforms)
+        )
+        return {"data": patterns, "included": included}
+
+    def document_for(self, path: str, params: dict[str, str]) -> dict | None:
+        if path == "/routes":
+            return self.routes_document()
+        if path == "/stops":
+            return self.stops_document(params.get("filter[route]"))
+        if path == "/route_patterns":
+            return self.route_patterns_document(params["filter[route]"].split(","))
+        return None
+
+
+def paginate(document: dict, url: str, params: dict[str, str]) -> dict:
+    """
+    Slices the data of a document to the requested page and adds the pagination links, like the real API does.
+    :param document: the whole document
+    :param url: URL of the request, without the query
+    :param params: query params of the request
+    :return: the page
+    """
+    if "page[limit]" not in params:
+        return document
+
+    limit = int(params["page[limit]"])
+    offset = int(params.get("page[offset]", 0))
+    total = len(document["data"])
+
+    def link(page_offset: int) -> str:
+        query = {**params, "page[offset]": str(page_offset)}
+        return f"{url}?{urlencode(query)}"
+
+    links = {
+        "first": link(0),
+        "last": link(max(total - 1, 0) // limit * limit),
+    }
+    if offset + limit < total:
+        links["next"] = link(offset + limit)
+    if offset > 0:
+        links["prev"] = link(max(offset - limit, 0))
+    return {
+        **document,
+        "data": document["data"][offset : offset + limit],
+        "links": links,
+    }
+
+
+class FakeMbtaServer:
+    """
+    Serves a ``FakeMbtaSystem`` over HTTP on a free local port. Use as a context manager.
+    """
+
+    def __init__(self, system: FakeMbtaSystem, latency: float = 0.0):
+        """
+        :param system: the transit system to serve
+        :param latency: seconds to wait before answering each request, to simulate the network
+        """
+        self.system = system
+        self.latency = latency
+        self.requests: list[str] = []
+        # status of every response sent, in order
+        self.statuses: list[int] = []
+        # error statuses to answer the next requests with, before serving them normally
+        self.failures: list[int] = []
+        # error statuses to answer the next requests for a page after the first with
+        self.page_failures: list[int] = []
+        # sent with every response e.g. the x-ratelimit-* headers
+        self.headers: dict[str, str] = {}
+        # (type, JSON data) of the events to stream to /alerts, None ends the stream
+        self.alert_events: queue.Queue[tuple[str, str] | None] = queue.Queue()
+        self._closing = threading.Event()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                fake.requests.append(url.path)
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                if fake.failures:
+                    self._respond(fake.failures.pop(0), b'{"errors": []}')
+                    return
+                if fake.page_failures and params.get("page[offset]", "0") != "0":
+                    self._respond(fake.page_failures.pop(0), b'{"errors": []}')
+                    return
+                if url.path == "/alerts":
+                    self._stream_alerts()
+                    return
+
+                document = fake.system.document_for(url.path, params)
+                if document is None:
+                    self._respond(404, b'{"errors": []}')
+                    return
+                payload = json.dumps(
+                    paginate(document, fake.url + url.path, params)
+                ).encode()
+                etag = f'"{hashlib.sha1(payload).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self._respond(304, b"", {"ETag": etag})
+                else:
+                    self._respond(200, payload, {"ETag": etag})
+
+            def _respond(
+                self,
+                status: int,
+                payload: bytes,
+                headers: dict[str, str] | None = None,
+            ) -> None:
+                fake.statuses.append(status)
+                self.send_response(status)
+                for name, value in {**fake.headers, **(headers or {})}.items():
+                    self.send_header(name, value)
+                if status != 304:
+                    self.send_header("Content-Type", "application/vnd.api+json")
+                    self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _stream_alerts(self) -> None:
+                # chunked, as the real API does, so every event is sent as soon as it's written
+                self.protocol_version = "HTTP/1.1"
+                self.close_connection = True
+                fake.statuses.append(200)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                while not fake._closing.is_set():
+                    try:
+                        item = fake.alert_events.get(timeout=0.05)
+                    except queue.Empty:
+                        continue
+                    if item is None:
+                        break
+                    event = f"event: {item[0]}\ndata: {item[1]}\n\n".encode()
+                    self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "FakeMbtaServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._closing.set()
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from fetch_engine import FetchError, failures, fetch_concurrently
+
+
+def test_results_keep_key_order_regardless_of_completion_order() -> None:
+    # later keys finish first
+    def fetch(key: int) -> int:
+        time.sleep((5 - key) * 0.01)
+        return key * 10
+
+    actual = fetch_concurrently(fetch, [1, 2, 3, 4], max_concurrency=4)
+    assert list(actual.items()) == [(1, 10), (2, 20), (3, 30), (4, 40)]
+
+
+def test_concurrency_is_bounded() -> None:
+    lock = threading.Lock()
+    in_flight = 0
+    most_in_flight = 0
+
+    def fetch(key: int) -> int:
+        nonlocal in_flight, most_in_flight
+        with lock:
+            in_flight += 1
+            most_in_flight = max(most_in_flight, in_flight)
+        time.sleep(0.01)
+        with lock:
+            in_flight -= 1
+        return key
+
+    fetch_concurrently(fetch, range(20), max_concurrency=3)
+    assert most_in_flight <= 3
+
+
+def test_errors_are_reported_per_key() -> None:
+    def fetch(key: str) -> str:
+        if key in {"b", "d"}:
+            raise RuntimeError(f"boom {key}")
+        return key
+
+    with pytest.raises(FetchError) as exc_info:
+        fetch_concurrently(fetch, ["a", "b", "c", "d"])
+
+    assert list(exc_info.value.errors) == ["b", "d"]
+    assert str(exc_info.value.errors["b"]) == "boom b"
+    assert exc_info.value.__cause__ is exc_info.value.errors["b"]
+    assert failures(exc_info.value) == list(exc_info.value.errors.values())
+
+
+def test_a_single_error_is_raised_as_is() -> None:
+    def fetch(key: str) -> str:
+        if key == "b":
+            raise LookupError(key)
+        return key
+
+    with pytest.raises(LookupError) as exc_info:
+        fetch_concurrently(fetch, ["a", "b", "c"])
+
+    assert failures(exc_info.value) == [exc_info.value]
+
+
+@pytest.mark.parametrize(
+    ("test_id", "keys", "expected"),
+    [
+        ("should return an empty dict for no keys", [], {}),
+        ("should only fetch duplicate keys once", ["a", "a"], {"a": "A"}),
+    ],
+)
+def test_fetch_concurrently_edge_cases(
+    test_id: str, keys: list[str], expected: dict[str, str]
+) -> None:
+    assert fetch_concurrently(str.upper, keys) == expected
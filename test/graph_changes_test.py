@@ -0,0 +1,287 @@
+import random
+from pathlib import Path
+
+import pytest
+
+import mbta_client
+import server
+from fake_mbta_server import FakeMbtaServer
+from graph_changes import apply_changes, diff_route_stops, update_name_index
+from models import Route, Stop
+from server import QueryService
+from snapshot_cache import SnapshotCache
+from stop_name_index import StopNameIndex
+from transit_graph import TransitGraph
+
+RED = Route(id="Red", long_name="Red Line")
+ORANGE = Route(id="Orange", long_name="Orange Line")
+BLUE = Route(id="Blue", long_name="Blue Line")
+ALEWIFE = Stop(id="alewife", name="Alewife")
+DTX = Stop(id="dtx", name="Downtown Crossing")
+STATE = Stop(id="state", name="State")
+WONDERLAND = Stop(id="wonderland", name="Wonderland")
+
+OLD = {RED: {ALEWIFE, DTX}, ORANGE: {DTX, STATE}, BLUE: {STATE, WONDERLAND}}
+
+
+def _stop_to_routes(route_to_stops: dict) -> dict:
+    mapping = {}
+    for route, stops in route_to_stops.items():
+        for stop in stops:
+            mapping.setdefault(stop, set()).add(route)
+    return mapping
+
+
+@pytest.mark.parametrize(
+    ("test_id", "new", "expected"),
+    [
+        ("should report nothing when nothing changed", OLD, {}),
+        (
+            "should report stops added to and removed from routes",
+            {RED: {ALEWIFE, DTX, STATE}, ORANGE: {DTX}, BLUE: {STATE, WONDERLAND}},
+            {
+                "route_stops": {
+                    "Orange": {"added": [], "removed": ["state"]},
+                    "Red": {"added": ["state"], "removed": []},
+                }
+            },
+        ),
+        (
+            "should report added and removed routes and stops",
+            {
+                RED: {ALEWIFE, DTX},
+                ORANGE: {DTX, STATE},
+                Route(id="Silver", long_name="Silver Line"): {
+                    STATE,
+                    Stop(id="airport", name="Airport"),
+                },
+            },
+            {
+                "added_routes": ["Silver"],
+                "removed_routes": ["Blue"],
+                "added_stops": ["airport"],
+                "removed_stops": ["wonderland"],
+            },
+        ),
+        (
+            "should report renames",
+            {
+                Route(id="Red", long_name="Red"): {ALEWIFE, DTX},
+                ORANGE: {Stop(id="dtx", name="DTX"), STATE},
+                BLUE: {STATE, WONDERLAND},
+            },
+            {"renamed_routes": {"Red": "Red"}, "renamed_stops": {"dtx": "DTX"}},
+        ),
+    ],
+)
+def test_diff_route_stops(test_id: str, new: dict, expected: dict) -> None:
+    report = diff_route_stops(OLD, new)
+
+    assert {k: v for k, v in report.summary().items() if v} == expected
+    assert report.is_empty == (not expected)
+
+
+def test_apply_changes() -> None:
+    graph = TransitGraph.from_stop_to_routes_mapping(_stop_to_routes(OLD))
+    name_index = StopNameIndex(_stop_to_routes(OLD))
+    assert graph.find_path("alewife", "wonderland") == [
+        "Red Line",
+        "Orange Line",
+        "Blue Line",
+    ]
+
+    # the Blue Line is extended to Downtown Crossing
+    new = {RED: {ALEWIFE, DTX}, ORANGE: {DTX, STATE}, BLUE: {DTX, STATE, WONDERLAND}}
+    changed = apply_changes(diff_route_stops(OLD, new), new, graph)
+
+    assert changed == ["Blue", "Red"]
+    assert graph.find_path("alewife", "wonderland") == ["Red Line", "Blue Line"]
+
+    # and the Orange Line replaced by a Silver Line to the airport
+    silver = Route(id="Silver", long_name="Silver Line")
+    airport = Stop(id="airport", name="Logan Airport")
+    newer = {RED: {ALEWIFE, DTX}, BLUE: {DTX, STATE, WONDERLAND}, silver: {airport}}
+    changed = apply_changes(diff_route_stops(new, newer), newer, graph)
+    update_name_index(name_index, _stop_to_routes(new), _stop_to_routes(newer))
+
+    assert changed == ["Blue", "Orange", "Red"]
+    assert graph.routes_for_stop("state") == ["Blue"]
+    assert graph.find_path("alewife", "airport") is None
+    assert name_index.resolve("logan") == ["airport"]
+    with pytest.raises(ValueError):
+        graph.routes_mask(["Orange"])
+
+
+def test_update_routes_removes_routes_given_by_a_generator() -> None:
+    graph = TransitGraph.from_stop_to_routes_mapping(_stop_to_routes(OLD))
+
+    graph.update_routes({}, (r for r in ["Blue"]), {})
+
+    assert graph.routes_for_stop("wonderland") == []
+    assert graph.routes_for_stop("state") == ["Orange"]
+
+
+@pytest.mark.parametrize(
+    ("test_id", "removed_route_ids", "route_stop_changes"),
+    [
+        ("should reject removing an unknown route", ["Silver"], {}),
+        (
+            "should reject changing the stops of an unknown route",
+            [],
+            {"Red": ({"state"}, set()), "Silver": ({"airport"}, set())},
+        ),
+    ],
+)
+def test_update_routes_with_unknown_route_raises(
+    test_id: str, removed_route_ids: list, route_stop_changes: dict
+) -> None:
+    graph = TransitGraph.from_stop_to_routes_mapping(_stop_to_routes(OLD))
+
+    with pytest.raises(ValueError):
+        graph.update_routes({}, removed_route_ids, route_stop_changes)
+
+    # nothing was changed
+    assert graph.routes_for_stop("state") == ["Blue", "Orange"]
+    assert graph.stop_ids == ["alewife", "dtx", "state", "wonderland"]
+
+
+def _random_network(rng: random.Random, stop_count: int) -> dict:
+    stops = [Stop(id=f"s{i}", name=f"Stop {i}") for i in range(stop_count)]
+    return {
+        Route(id=f"r{i}", long_name=f"Route {i}"): set(rng.sample(stops, 4))
+        for i in range(rng.randrange(5, 12))
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_updates_agree_with_a_rebuild(seed: int) -> None:
+    rng = random.Random(seed)
+    current = _random_network(rng, 30)
+    graph = TransitGraph.from_stop_to_routes_mapping(_stop_to_routes(current))
+    graph.precompute_transfers()
+    name_index = StopNameIndex(_stop_to_routes(current))
+
+    for _ in range(5):
+        new = _random_network(rng, 30)
+        apply_changes(diff_route_stops(current, new), new, graph)
+        update_name_index(name_index, _stop_to_routes(current), _stop_to_routes(new))
+        current = new
+
+        rebuilt = TransitGraph.from_stop_to_routes_mapping(_stop_to_routes(current))
+        rebuilt_index = StopNameIndex(_stop_to_routes(current))
+        for start in rebuilt.stop_ids:
+            assert sorted(graph.routes_for_stop(start)) == rebuilt.routes_for_stop(
+                start
+            )
+            assert name_index.resolve(f"stop {start[1:]}") == [start]
+            for end in rebuilt.stop_ids:
+                # the precomputed table of the updated graph against a search of the rebuilt one
+                assert graph.min_transfers(start, end) == rebuilt.min_transfers(
+                    start, end
+                )
+        assert name_index.complete("stop") == rebuilt_index.complete("stop")
+
+
+def test_service_refresh_applies_changes(
+    fake_mbta: FakeMbtaServer, monkeypatch
+) -> None:
+    service = QueryService(refresh_interval=0)
+    state = service.state
+    assert service.find_path("wonderland", "alewife")["path"] == [
+        "Blue Line",
+        "Orange Line",
+        "Red Line",
+    ]
+
+    monkeypatch.setitem(
+        fake_mbta.system.routes,
+        "Blue",
+        ("Blue Line", [["place-wondl", "place-state", "place-pktrm"]]),
+    )
+    service.refresh()
+
+    assert service.find_path("wonderland", "alewife")["path"] == [
+        "Blue Line",
+        "Red Line",
+    ]
+    assert service.metrics()["changes"]["route_stops"] == {
+        "Blue": {"added": ["place-pktrm"], "removed": []}
+    }
+    # the graph was updated on a copy, requests still holding the previous state see it as it was
+    assert state.graph.routes_for_stop("place-pktrm") == ["Red"]
+    assert service.state.graph.routes_for_stop("place-pktrm") == ["Blue", "Red"]
+
+
+def test_failed_refresh_keeps_the_previous_state(
+    fake_mbta: FakeMbtaServer, monkeypatch
+) -> None:
+    service = QueryService(refresh_interval=0)
+    state = service.state
+
+    def fail(*args) -> None:
+        raise RuntimeError("interrupted")
+
+    # fails once the graph was already updated with the changes
+    monkeypatch.setattr(server, "update_name_index", fail)
+    monkeypatch.setitem(
+        fake_mbta.system.routes,
+        "Blue",
+        ("Blue Line", [["place-wondl", "place-state", "place-pktrm"]]),
+    )
+    with pytest.raises(RuntimeError):
+        service.refresh()
+
+    assert service.state is state
+    assert state.graph.routes_for_stop("place-pktrm") == ["Red"]
+    assert service.find_path("wonderland", "alewife")["path"] == [
+        "Blue Line",
+        "Orange Line",
+        "Red Line",
+    ]
+
+
+def test_refreshed_name_index_agrees_with_a_rebuild(
+    fake_mbta: FakeMbtaServer, monkeypatch
+) -> None:
+    service = QueryService(refresh_interval=0)
+
+    # a stop no route serves yet, and a renamed one
+    monkeypatch.setitem(fake_mbta.system.stops, "place-new", "Science Park")
+    monkeypatch.setitem(fake_mbta.system.stops, "place-state", "State Street")
+    service.refresh()
+
+    name_index = service.state.name_index
+    rebuilt = StopNameIndex(mbta_client.get_subway_stops())
+    assert name_index.resolve("science park") == ["place-new"]
+    assert name_index.resolve("state street") == ["place-state"]
+    for prefix in ("s", "st", "a", "w"):
+        assert name_index.complete(prefix) == rebuilt.complete(prefix)
+
+
+def test_refresh_applies_upstream_changes_through_the_snapshot_cache(
+    fake_mbta: FakeMbtaServer, tmp_path: Path, monkeypatch
+) -> None:
+    mbta_client.configure_snapshot_cache(SnapshotCache(tmp_path))
+    service = QueryService(refresh_interval=0)
+    graph = service.state.graph
+
+    # the Blue Line is extended to a new stop at Park Street, while the snapshots are still fresh
+    monkeypatch.setitem(fake_mbta.system.stops, "place-new", "Science Park")
+    monkeypatch.setitem(
+        fake_mbta.system.routes,
+        "Blue",
+        ("Blue Line", [["place-wondl", "place-state", "place-pktrm", "place-new"]]),
+    )
+    service.refresh()
+
+    state = service.state
+    assert state.graph is not graph
+    assert state.changes.summary()["route_stops"] == {
+        "Blue": {"added": ["place-new", "place-pktrm"], "removed": []}
+    }
+    assert state.graph.routes_for_stop("place-new") == ["Blue"]
+    assert state.name_index.resolve("science park") == ["place-new"]
+    assert service.find_path("science park", "alewife")["path"] == [
+        "Blue Line",
+        "Red Line",
+    ]
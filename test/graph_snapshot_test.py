@@ -0,0 +1,163 @@
+import struct
+from pathlib import Path
+
+import pytest
+
+import graph_snapshot
+import mbta_client
+from fake_mbta_server import FakeMbtaServer
+from graph_snapshot import (
+    FORMAT_VERSION,
+    GraphSnapshot,
+    SnapshotFormatError,
+    SnapshotWatcher,
+    read_generation,
+    write_snapshot,
+)
+from models import Route, Stop
+from path_finding import get_subway_transit_graph
+from server import QueryService
+from stop_name_index import UnknownStopError
+from transit_graph import TransitGraph
+
+RED = Route(id="Red", long_name="Red Line")
+ORANGE = Route(id="Orange", long_name="Orange Line")
+BLUE = Route(id="Blue", long_name="Blue Line")
+
+STOP_TO_ROUTES = {
+    Stop(id="alewife", name="Alewife"): {RED},
+    Stop(id="dtx", name="Downtown Crossing"): {RED, ORANGE},
+    Stop(id="oak_grove", name="Oak Grove"): {ORANGE},
+    Stop(id="state", name="State"): {ORANGE, BLUE},
+    Stop(id="wonderland", name="Wonderland"): {BLUE},
+}
+
+
+def write(path: Path, stop_to_routes: dict, generation: int) -> Path:
+    graph = TransitGraph.from_stop_to_routes_mapping(stop_to_routes)
+    write_snapshot(path, graph, stop_to_routes, generation)
+    return path
+
+
+def test_answers_like_the_graph_on_the_subway(
+    fake_mbta: FakeMbtaServer, tmp_path: Path
+) -> None:
+    graph = get_subway_transit_graph()
+    stops = mbta_client.get_subway_stops()
+    name_index = mbta_client.get_subway_stop_name_index()
+    write_snapshot(tmp_path / "graph.bin", graph, stops)
+
+    with GraphSnapshot(tmp_path / "graph.bin") as snapshot:
+        assert list(snapshot.route_ids) == graph.route_ids
+        assert list(snapshot.route_names) == graph.route_names
+        assert list(snapshot.stop_ids) == graph.stop_ids
+        for start in graph.stop_ids:
+            assert snapshot.routes_for_stop(start) == graph.routes_for_stop(start)
+            for end in graph.stop_ids:
+                assert snapshot.find_path(start, end) == graph.find_path(start, end)
+
+        for name in ["Alewife", "park st.", "forest", "harvard", "nowhere", ""]:
+            assert snapshot.name_index.resolve(name) == name_index.resolve(name)
+        assert snapshot.name_index.complete("a") == name_index.complete("a")
+        assert snapshot.name_index.suggest("alewfe") == name_index.suggest("alewfe")
+
+
+def test_resolve_pair_reports_suggestions(tmp_path: Path) -> None:
+    with GraphSnapshot(write(tmp_path / "graph.bin", STOP_TO_ROUTES, 1)) as snapshot:
+        assert snapshot.name_index.resolve_pair("alewife", "oak") == (
+            ["alewife"],
+            ["oak_grove"],
+        )
+        with pytest.raises(UnknownStopError) as e:
+            snapshot.name_index.resolve_pair("alewfe", "oak")
+
+    assert e.value.suggestions == {"alewfe": ["Alewife"]}
+
+
+def test_find_path_with_unknown_stop_raises(tmp_path: Path) -> None:
+    with GraphSnapshot(write(tmp_path / "graph.bin", STOP_TO_ROUTES, 1)) as snapshot:
+        with pytest.raises(ValueError):
+            snapshot.find_path("unknown", "alewife")
+        assert snapshot.routes_for_stop("unknown") == []
+
+
+@pytest.mark.parametrize(
+    ("test_id", "contents", "message"),
+    [
+        ("should reject an empty file", b"", "Truncated"),
+        ("should reject another kind of file", b"x" * 64, "Not a graph snapshot"),
+        (
+            "should reject another format version",
+            struct.pack("<8sIQIII", b"MBTAGRPH", FORMAT_VERSION + 1, 1, 0, 0, 0),
+            "format version",
+        ),
+    ],
+)
+def test_rejects_unreadable_files(
+    test_id: str, contents: bytes, message: str, tmp_path: Path
+) -> None:
+    path = tmp_path / "graph.bin"
+    path.write_bytes(contents)
+
+    with pytest.raises(SnapshotFormatError, match=message):
+        GraphSnapshot(path)
+
+
+def test_watcher_swaps_in_newer_snapshots(tmp_path: Path) -> None:
+    path = write(tmp_path / "graph.bin", STOP_TO_ROUTES, 1)
+    watcher = SnapshotWatcher(path)
+    first = watcher.current()
+    assert first.find_path("alewife", "wonderland") == [
+        "Red Line",
+        "Orange Line",
+        "Blue Line",
+    ]
+
+    # Blue now also stops at Downtown Crossing
+    changed = dict(STOP_TO_ROUTES)
+    changed[Stop(id="dtx", name="Downtown Crossing")] = {RED, ORANGE, BLUE}
+    write(path, changed, 2)
+    assert read_generation(path) == 2
+    second = watcher.current()
+    assert second.generation == 2
+    assert second.find_path("alewife", "wonderland") == ["Red Line", "Blue Line"]
+    # queries that started on the previous snapshot keep their view
+    assert first.find_path("alewife", "wonderland") == [
+        "Red Line",
+        "Orange Line",
+        "Blue Line",
+    ]
+
+    # an older generation, or a broken file, doesn't replace it
+    write(path, STOP_TO_ROUTES, 1)
+    assert watcher.current() is second
+    path.write_bytes(b"broken")
+    assert watcher.current() is second
+
+
+def test_service_finds_paths_with_a_snapshot(
+    fake_mbta: FakeMbtaServer, tmp_path: Path
+) -> None:
+    path = write(tmp_path / "graph.bin", STOP_TO_ROUTES, 1)
+    service = QueryService(refresh_interval=0, graph_snapshot=str(path))
+
+    assert service.state.graph is None
+    assert service.find_path("oak grove", "wonderland")["path"] == [
+        "Orange Line",
+        "Blue Line",
+    ]
+    assert service.metrics()["graph_snapshot_generation"] == 1
+
+
+def test_failed_write_keeps_the_previous_snapshot(tmp_path: Path, monkeypatch) -> None:
+    path = write(tmp_path / "graph.bin", STOP_TO_ROUTES, 1)
+
+    def fail(*args) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(graph_snapshot.os, "replace", fail)
+    with pytest.raises(OSError):
+        write(path, STOP_TO_ROUTES, 2)
+
+    assert read_generation(path) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["graph.bin"]
@@ -0,0 +1,176 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+import mbta_client
+from fake_gtfs_feed import feed_tables, write_feed
+from fake_mbta_server import (
+    SMALL_SYSTEM_ROUTES,
+    SMALL_SYSTEM_STOPS,
+    FakeMbtaServer,
+    FakeMbtaSystem,
+)
+from gtfs_source import load_feed
+from helpers import parse_time
+from models import RoutePattern
+
+SMALL_SYSTEM = FakeMbtaSystem(SMALL_SYSTEM_ROUTES, SMALL_SYSTEM_STOPS)
+
+
+def _write_tables(directory: Path, tables: dict[str, str]) -> Path:
+    directory.mkdir()
+    for name, contents in tables.items():
+        (directory / name).write_text(contents)
+    return directory
+
+
+def test_feed_matches_the_api(fake_mbta: FakeMbtaServer, tmp_path: Path) -> None:
+    from_api = (
+        mbta_client.get_subway_routes(),
+        set(mbta_client.get_subway_stops()),
+        mbta_client.get_subway_route_to_stops_mapping(),
+        mbta_client.get_subway_stop_to_routes_mapping(),
+    )
+
+    requests_to_api = len(fake_mbta.requests)
+    mbta_client.configure_gtfs_feed(write_feed(SMALL_SYSTEM, tmp_path / "gtfs.zip"))
+    try:
+        from_feed = (
+            mbta_client.get_subway_routes(),
+            set(mbta_client.get_subway_stops()),
+            mbta_client.get_subway_route_to_stops_mapping(),
+            mbta_client.get_subway_stop_to_routes_mapping(),
+        )
+    finally:
+        mbta_client.configure_gtfs_feed(None)
+
+    assert from_feed == from_api
+    assert len(fake_mbta.requests) == requests_to_api
+
+
+def test_only_subway_routes_are_loaded(tmp_path: Path) -> None:
+    network = load_feed(write_feed(SMALL_SYSTEM, tmp_path / "gtfs.zip"))
+
+    assert [r.long_name for r in network.routes] == sorted(
+        name for name, _ in SMALL_SYSTEM_ROUTES.values()
+    )
+    assert "bus-stop" not in {s.id for s in network.stops}
+
+
+def test_route_patterns_resolve_platforms_to_stations(tmp_path: Path) -> None:
+    network = load_feed(write_feed(SMALL_SYSTEM, tmp_path / "gtfs.zip", 3))
+
+    red = [p for p in network.route_patterns if p.route_id == "Red"]
+    assert red == [
+        RoutePattern(
+            route_id="Red",
+            direction_id=0,
+            stop_ids=("place-alfcl", "place-pktrm", "place-dwnxg", "place-asmnl"),
+        ),
+        RoutePattern(
+            route_id="Red",
+            direction_id=0,
+            stop_ids=("place-alfcl", "place-pktrm", "place-dwnxg", "place-brntn"),
+        ),
+        RoutePattern(
+            route_id="Red",
+            direction_id=1,
+            stop_ids=("place-asmnl", "place-dwnxg", "place-pktrm", "place-alfcl"),
+        ),
+        RoutePattern(
+            route_id="Red",
+            direction_id=1,
+            stop_ids=("place-brntn", "place-dwnxg", "place-pktrm", "place-alfcl"),
+        ),
+    ]
+
+
+@pytest.mark.parametrize(
+    "test_id, service_date, trips",
+    [
+        ("Every trip without a date", None, 24),
+        ("Should load the weekday trips on a Monday", date(2026, 10, 19), 24),
+        ("Should load nothing on a Sunday", date(2026, 10, 18), 0),
+    ],
+)
+def test_trips_run_on_their_service_days(
+    test_id: str, service_date: date | None, trips: int, tmp_path: Path
+) -> None:
+    network = load_feed(
+        write_feed(SMALL_SYSTEM, tmp_path / "gtfs.zip", 2),
+        service_date=service_date,
+        include_trips=True,
+    )
+    assert len(network.trips) == trips
+
+
+def test_trip_schedules_are_loaded_by_station(tmp_path: Path) -> None:
+    tables = feed_tables(SMALL_SYSTEM)
+    # a dwell at the first stop of a Blue Line trip, and only the ends of a Green Line trip are timepoints
+    tables["stop_times.txt"] = tables["stop_times.txt"].replace(
+        "Blue-0-0,06:00:00,06:00:00,place-wondl-Blue,10",
+        "Blue-0-0,06:00:00,06:01:00,place-wondl-Blue,10",
+    )
+    for time in ("06:02:00", "06:04:00"):
+        tables["stop_times.txt"] = tables["stop_times.txt"].replace(
+            f"Green-B-0-0,{time},{time},", "Green-B-0-0,,,"
+        )
+    network = load_feed(_write_tables(tmp_path / "feed", tables), include_trips=True)
+    trips = {trip.trip_id: trip for trip in network.trips}
+
+    blue = trips["Blue-0-0"]
+    assert blue.stop_ids == ("place-wondl", "place-state")
+    assert blue.departures[0] == parse_time("6:01")
+    green = trips["Green-B-0-0"]
+    assert green.arrivals == tuple(
+        parse_time(t) for t in ("6:00", "6:02", "6:04", "6:06")
+    )
+
+
+def test_stop_times_dont_need_to_be_grouped_or_ordered(tmp_path: Path) -> None:
+    tables = feed_tables(SMALL_SYSTEM, trips_per_pattern=2)
+    header, *rows = tables["stop_times.txt"].splitlines()
+    shuffled = rows[::2] + rows[1::2][::-1]
+    tables_shuffled = {**tables, "stop_times.txt": "\n".join([header, *shuffled])}
+
+    assert load_feed(
+        _write_tables(tmp_path / "shuffled", tables_shuffled)
+    ) == load_feed(_write_tables(tmp_path / "feed", tables))
+
+
+@pytest.mark.parametrize(
+    "test_id, tables, message",
+    [
+        ("missing table", {"stop_times.txt": None}, "no stop_times.txt"),
+        (
+            "missing column",
+            {"trips.txt": "route_id,direction_id\nRed,0\n"},
+            "trips.txt has no trip_id column",
+        ),
+    ],
+)
+def test_incomplete_feeds_are_rejected(
+    test_id: str, tables: dict, message: str, tmp_path: Path
+) -> None:
+    tables = {**feed_tables(SMALL_SYSTEM), **tables}
+    tables = {name: contents for name, contents in tables.items() if contents}
+
+    with pytest.raises(ValueError, match=message):
+        load_feed(_write_tables(tmp_path / "feed", tables))
+
+
+def test_not_a_zip_is_rejected(tmp_path: Path) -> None:
+    path = tmp_path / "gtfs.zip"
+    path.write_text("route_id\n")
+
+    with pytest.raises(ValueError, match="not a GTFS feed zip"):
+        load_feed(path)
+
+
+def test_cli_runs_from_a_feed(gtfs_feed: Path, capsys) -> None:
+    import main
+
+    main.run_command(None, main.argparse.Namespace(command="question-1"))
+
+    assert "Red Line" in capsys.readouterr().out
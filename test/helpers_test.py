@@ -2,7 +2,7 @@ from typing import Any
 
 import pytest
 
-from helpers import find_multi_value_items
+from helpers import find_multi_value_items, format_time, parse_time
 
 
 @pytest.mark.parametrize(
@@ -25,3 +25,22 @@ def test_finding_multi_value_items(
 ) -> None:
     actual = find_multi_value_items(mapping)
     assert actual == expected
+
+
+@pytest.mark.parametrize(
+    ("test_id", "text", "expected", "formatted"),
+    [
+        ("Should parse hours and minutes", "7:05", 7 * 3600 + 5 * 60, "07:05"),
+        ("Should parse seconds", "07:05:30", 7 * 3600 + 5 * 60 + 30, "07:05"),
+        ("Should allow times past midnight", "25:00:00", 25 * 3600, "25:00"),
+    ],
+)
+def test_parsing_times(test_id: str, text: str, expected: int, formatted: str) -> None:
+    assert parse_time(text) == expected
+    assert format_time(expected) == formatted
+
+
+@pytest.mark.parametrize("text", ["7", "7:xx", "7:00:00:00", ""])
+def test_invalid_times_are_rejected(text: str) -> None:
+    with pytest.raises(ValueError):
+        parse_time(text)
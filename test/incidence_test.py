@@ -0,0 +1,84 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import incidence  # noqa: E402
+import mbta_client  # noqa: E402
+from fake_mbta_server import FakeMbtaServer  # noqa: E402
+from helpers import find_multi_value_items  # noqa: E402
+from incidence import IncidenceMatrix  # noqa: E402
+from models import Route, Stop  # noqa: E402
+from path_finding import build_adjacency_list  # noqa: E402
+from transit_system_info import find_longest_and_shortest_route  # noqa: E402
+
+A, B, C, D, E = (Stop(id=s, name=s.upper()) for s in "abcde")
+ROUTE_1 = Route(id="1", long_name="One")
+ROUTE_2 = Route(id="2", long_name="Two")
+ROUTE_3 = Route(id="3", long_name="Three")
+ROUTE_4 = Route(id="4", long_name="Four")
+
+
+@pytest.mark.parametrize(
+    "test_id, mapping",
+    [
+        ("Should handle an empty network", {}),
+        ("Should handle a single route", {ROUTE_1: {A, B}}),
+        (
+            "Should handle ties and disconnected routes",
+            {ROUTE_1: {A, B}, ROUTE_2: {B, C}, ROUTE_3: {D, E}, ROUTE_4: {E}},
+        ),
+    ],
+)
+def test_matches_the_dict_implementations(test_id: str, mapping: dict) -> None:
+    matrix = IncidenceMatrix(mapping)
+    stop_to_routes = {}
+    for route, stops in mapping.items():
+        for stop in stops:
+            stop_to_routes.setdefault(stop, set()).add(route)
+
+    assert matrix.longest_and_shortest_route() == find_longest_and_shortest_route(
+        mapping
+    )
+    assert matrix.multi_route_stops() == find_multi_value_items(stop_to_routes)
+    assert matrix.adjacency_list() == build_adjacency_list(stop_to_routes)
+
+
+def test_matches_the_dict_implementations_on_the_subway(
+    fake_mbta: FakeMbtaServer,
+) -> None:
+    mapping = mbta_client.get_subway_route_to_stops_mapping()
+    stop_to_routes = mbta_client.get_subway_stop_to_routes_mapping()
+    matrix = IncidenceMatrix(mapping)
+
+    assert matrix.longest_and_shortest_route() == find_longest_and_shortest_route(
+        mapping
+    )
+    assert matrix.multi_route_stops() == find_multi_value_items(stop_to_routes)
+    assert matrix.adjacency_list() == build_adjacency_list(stop_to_routes)
+    assert matrix.route_sizes().tolist() == [len(s) for s in mapping.values()]
+
+
+def test_components() -> None:
+    matrix = IncidenceMatrix(
+        {ROUTE_1: {A}, ROUTE_2: {A, B}, ROUTE_3: {B, C}, ROUTE_4: {D}}
+    )
+
+    assert matrix.components() == [[ROUTE_1, ROUTE_2, ROUTE_3], [ROUTE_4]]
+
+
+def test_needs_numpy(monkeypatch) -> None:
+    monkeypatch.setattr(incidence, "np", None)
+
+    with pytest.raises(ImportError, match="analytics"):
+        IncidenceMatrix({ROUTE_1: {A}})
+
+
+def test_route_adjacency() -> None:
+    matrix = IncidenceMatrix({ROUTE_1: {A, B}, ROUTE_2: {A, B, C}, ROUTE_3: {D}})
+
+    assert matrix.to_dense().sum() == 6
+    assert matrix.route_adjacency().tolist() == [
+        [False, True, False],
+        [True, False, False],
+        [False, False, False],
+    ]
@@ -0,0 +1,82 @@
+from functools import lru_cache
+
+import pytest
+
+from fake_mbta_server import FakeMbtaServer
+from instrumentation import MetricsRegistry, metrics
+from path_finding import find_shortest_subway_path, get_subway_transit_graph
+
+
+def test_phases_and_counters() -> None:
+    registry = MetricsRegistry()
+    for _ in range(2):
+        with registry.phase("graph.build"):
+            pass
+    with pytest.raises(ValueError):
+        with registry.phase("search"):
+            raise ValueError()
+    registry.increment("retries")
+    registry.increment("retries", 2)
+
+    report = registry.report()
+
+    assert report["phases"]["graph.build"]["count"] == 2
+    assert report["phases"]["search"]["count"] == 1
+    assert report["counters"] == {"retries": 3}
+
+
+def test_requests_keep_totals_beyond_the_window() -> None:
+    registry = MetricsRegistry(window=2)
+    for i in range(3):
+        registry.record_request(f"/stops/{i}", 200, 0.5, 100)
+
+    requests = registry.report()["requests"]
+
+    assert requests["count"] == 3
+    assert requests["total_seconds"] == 1.5
+    assert requests["total_bytes"] == 300
+    assert [r["path"] for r in requests["recent"]] == ["/stops/1", "/stops/2"]
+
+
+def test_cache_stats_and_hooks() -> None:
+    registry = MetricsRegistry()
+    events = []
+    registry.add_hook(lambda kind, event: events.append((kind, event)))
+
+    @lru_cache
+    def square(n: int) -> int:
+        return n * n
+
+    registry.register_cache(square)
+    square(2), square(2), square(3)
+    registry.record_request("/routes", 200, 0.1, 10)
+
+    caches = registry.report()["caches"]
+    assert list(caches.values()) == [{"hits": 1, "misses": 2, "size": 2}]
+    assert events == [
+        ("request", {"path": "/routes", "status": 200, "seconds": 0.1, "bytes": 10})
+    ]
+
+    registry.reset()
+    assert registry.report()["requests"]["count"] == 0
+
+
+def test_client_reports_requests_and_phases(fake_mbta: FakeMbtaServer) -> None:
+    get_subway_transit_graph.cache_clear()
+    metrics.reset()
+
+    find_shortest_subway_path("place-alfcl", "place-kencl")
+    find_shortest_subway_path("place-alfcl", "place-forhl")
+
+    report = metrics.report()
+    assert report["requests"]["count"] == len(fake_mbta.requests)
+    assert {r["path"] for r in report["requests"]["recent"]} == {
+        "/routes",
+        "/stops",
+        "/route_patterns",
+    }
+    assert all(r["bytes"] > 0 for r in report["requests"]["recent"])
+    assert report["phases"]["transit_graph.build"]["count"] == 1
+    assert report["phases"]["search.routes"]["count"] == 2
+    assert report["caches"]["path_finding.get_subway_transit_graph"]["hits"] >= 1
+    assert "mbta_client.get_subway_routes" in report["caches"]
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from json_stream import JsonApiStream
+
+DOCUMENT = {
+    "data": [
+        {"type": "stop", "id": f"place-{i}", "attributes": {"name": "Ståtion ☃"}}
+        for i in range(50)
+    ],
+    "included": [{"type": "route", "id": "Red"}],
+    "links": {"next": None},
+    "count": 12345,
+}
+RAW = json.dumps(DOCUMENT, ensure_ascii=False).encode()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, len(RAW)])
+def test_stream_across_chunk_boundaries(chunk_size: int) -> None:
+    stream = JsonApiStream(
+        RAW[i : i + chunk_size] for i in range(0, len(RAW), chunk_size)
+    )
+
+    assert list(stream) == DOCUMENT["data"]
+    assert stream.members == {k: v for k, v in DOCUMENT.items() if k != "data"}
+
+
+def test_records_are_yielded_before_the_document_ends() -> None:
+    def chunks():
+        yield b'{"data": [{"id": "a"}, '
+        raise AssertionError("read past the first record")
+
+    assert next(iter(JsonApiStream(chunks()))) == {"id": "a"}
+
+
+@pytest.mark.parametrize(
+    ("test_id", "raw"),
+    [
+        ("should reject a truncated document", b'{"data": [1, 2'),
+        ("should reject a missing separator", b'{"data": [1 2]}'),
+        ("should reject a document that isn't an object", b"[1, 2]"),
+        ("should reject trailing data", b'{"data": []} x'),
+        ("should reject a truncated member", b'{"links": {"next": '),
+    ],
+)
+def test_malformed_documents(test_id: str, raw: bytes) -> None:
+    with pytest.raises(ValueError):
+        list(JsonApiStream([raw]))
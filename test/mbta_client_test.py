@@ -0,0 +1,102 @@
+from pathlib import Path
+
+import pytest
+
+import mbta_client
+from fake_clock import FakeClock
+from fake_mbta_server import SMALL_SYSTEM_STOPS, FakeMbtaServer
+from snapshot_cache import SnapshotCache
+
+
+@pytest.fixture
+def page_limit():
+    mbta_client.configure_page_limit(3)
+    yield 3
+    mbta_client.configure_page_limit(None)
+
+
+def test_iter_subway_stops_streams_every_stop(fake_mbta: FakeMbtaServer) -> None:
+    stops = mbta_client.iter_subway_stops()
+    assert next(stops).id == "place-alfcl"
+    assert [s.id for s in stops] == list(SMALL_SYSTEM_STOPS)[1:]
+
+
+def test_pages_are_followed(fake_mbta: FakeMbtaServer, page_limit: int) -> None:
+    stops = list(mbta_client.iter_subway_stops())
+
+    assert [s.id for s in stops] == list(SMALL_SYSTEM_STOPS)
+    pages = -(-len(SMALL_SYSTEM_STOPS) // page_limit)
+    assert fake_mbta.requests == ["/stops"] * pages
+
+
+def test_pages_keep_included_records(
+    fake_mbta: FakeMbtaServer, page_limit: int
+) -> None:
+    mbta_client.configure_page_limit(None)
+    unpaged = mbta_client.get_subway_route_patterns()
+    mbta_client.clear_caches()
+    mbta_client.configure_page_limit(page_limit)
+
+    assert mbta_client.get_subway_route_patterns() == unpaged
+
+
+def test_rejected_page_falls_back_to_the_stops_of_every_route(
+    fake_mbta: FakeMbtaServer, page_limit: int
+) -> None:
+    expected = mbta_client.get_subway_route_to_stops_mapping()
+    mbta_client.clear_caches()
+    fake_mbta.requests.clear()
+
+    # a page of the route patterns after the first is rejected
+    fake_mbta.page_failures.append(400)
+    assert mbta_client.get_subway_route_to_stops_mapping() == expected
+    assert 400 in fake_mbta.statuses
+    assert fake_mbta.requests.count("/stops") > fake_mbta.requests.count(
+        "/route_patterns"
+    )
+
+
+def test_remaining_page_offsets() -> None:
+    links = {
+        "next": "https://api/stops?page%5Boffset%5D=3&page%5Blimit%5D=3",
+        "last": "https://api/stops?page%5Boffset%5D=12&page%5Blimit%5D=3",
+    }
+    assert mbta_client._remaining_page_offsets(links) == ([3, 6, 9, 12], 3)
+    assert mbta_client._remaining_page_offsets({"next": links["next"]}) is None
+    assert mbta_client._remaining_page_offsets({}) is None
+
+
+def test_expired_snapshots_are_revalidated(
+    fake_mbta: FakeMbtaServer, tmp_path: Path
+) -> None:
+    clock = FakeClock()
+    mbta_client.configure_snapshot_cache(
+        SnapshotCache(tmp_path, ttl_seconds=60, clock=clock)
+    )
+    stops = mbta_client.get_subway_stops()
+
+    clock.now += 120
+    mbta_client.clear_caches()
+    assert mbta_client.get_subway_stops() == stops
+    assert fake_mbta.statuses == [200, 304]
+
+    # the 304 renews the snapshot
+    mbta_client.clear_caches()
+    mbta_client.get_subway_stops()
+    assert fake_mbta.statuses == [200, 304]
+
+
+def test_paginated_snapshots_are_refetched(
+    fake_mbta: FakeMbtaServer, tmp_path: Path, page_limit: int
+) -> None:
+    clock = FakeClock()
+    mbta_client.configure_snapshot_cache(
+        SnapshotCache(tmp_path, ttl_seconds=60, clock=clock)
+    )
+    mbta_client.get_subway_stops()
+    pages = len(fake_mbta.statuses)
+
+    clock.now += 120
+    mbta_client.clear_caches()
+    mbta_client.get_subway_stops()
+    assert fake_mbta.statuses == [200] * pages * 2
@@ -0,0 +1,60 @@
+import pickle
+
+import pytest
+
+import models
+from models import Route, RoutePattern, Stop
+
+
+def test_models_hash_on_id_and_compare_every_field() -> None:
+    stop = Stop(id="place-pktrm", name="Park Street")
+
+    assert stop == Stop(id="place-pktrm", name="Park Street")
+    assert hash(stop) == hash(Stop(id="place-pktrm", name="Park Street Station"))
+    assert stop != Stop(id="place-pktrm", name="Park Street Station")
+    assert stop != Route(id="place-pktrm", long_name="Park Street")
+    assert {stop: 1}[Stop(id="place-pktrm", name="Park Street")] == 1
+
+
+def test_models_are_immutable() -> None:
+    route = Route(id="Red", long_name="Red Line")
+    with pytest.raises(AttributeError):
+        route.long_name = "Blue Line"
+    with pytest.raises(AttributeError):
+        del route.id
+    with pytest.raises(AttributeError):
+        route.color = "red"
+
+
+@pytest.mark.parametrize(
+    ("test_id", "model"),
+    [
+        ("should round trip a route", Route(id="Red", long_name="Red Line")),
+        ("should round trip a stop", Stop(id="place-pktrm", name="Park Street")),
+        (
+            "should round trip a route pattern",
+            RoutePattern(route_id="Red", direction_id=1, stop_ids=("a", "b")),
+        ),
+    ],
+)
+def test_models_pickle(test_id: str, model: object) -> None:
+    assert pickle.loads(pickle.dumps(model)) == model
+
+
+def test_set_validation() -> None:
+    with pytest.raises(ValueError):
+        Stop(id="place-pktrm", name=None)
+
+    models.set_validation(False)
+    try:
+        assert Stop(id="place-pktrm", name=None).name is None
+    finally:
+        models.set_validation(True)
+
+
+def test_from_mbta_json() -> None:
+    assert Route.from_mbta_json(
+        {"id": "Red", "attributes": {"long_name": "Red Line"}}
+    ) == Route(id="Red", long_name="Red Line")
+    with pytest.raises(ValueError):
+        Stop.from_mbta_json({"id": "place-pktrm", "attributes": {}})
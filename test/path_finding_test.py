@@ -1,6 +1,22 @@
+from pathlib import Path
+
 import pytest
 
-from path_finding import build_adjacency_list, find_shortest_path
+import mbta_client
+from fake_gtfs_feed import write_feed
+from fake_mbta_server import (
+    SMALL_SYSTEM_ROUTES,
+    SMALL_SYSTEM_STOPS,
+    FakeMbtaServer,
+    FakeMbtaSystem,
+)
+from path_finding import (
+    build_adjacency_list,
+    find_shortest_path,
+    find_shortest_path_between,
+    get_subway_stop_graph,
+    get_subway_transit_graph,
+)
 from models import Stop, Route
 
 
@@ -32,6 +48,13 @@ from models import Stop, Route
             "c",  # end
             ["a", "b", "c"],  # expected
         ),
+        (
+            "should return None if no path exists",
+            {"a": {"b"}, "b": {"a"}, "c": set()},
+            "a",  # start
+            "c",  # end
+            None,  # expected
+        ),
     ],
 )
 def test_find_shortest_path(
@@ -45,6 +68,44 @@ def test_find_shortest_path(
     assert actual == expected
 
 
+@pytest.mark.parametrize(
+    ("test_id", "starts", "ends", "expected"),
+    [
+        (
+            "should not transfer if a start is also an end",
+            ["a", "c"],  # starts
+            {"c", "d"},  # ends
+            ["c"],  # expected
+        ),
+        (
+            "should start from whichever start is closest to an end",
+            ["a", "c"],  # starts
+            {"e"},  # ends
+            ["c", "d", "e"],  # expected
+        ),
+        (
+            "should stop at the closest end",
+            ["a"],  # starts
+            {"b", "e"},  # ends
+            ["a", "b"],  # expected
+        ),
+    ],
+)
+def test_find_shortest_path_between(
+    test_id: str, starts: list[str], ends: set[str], expected: list[str] | None
+) -> None:
+    # a - b - c - d - e
+    graph = {
+        "a": {"b"},
+        "b": {"a", "c"},
+        "c": {"b", "d"},
+        "d": {"c", "e"},
+        "e": {"d"},
+    }
+    actual = find_shortest_path_between(graph, starts, ends)
+    assert actual == expected
+
+
 @pytest.mark.parametrize(
     ("test_id", "stop_to_route_mapping", "expected"),
     [
@@ -85,3 +146,25 @@ def test_adjacency_list(
 ) -> None:
     actual = build_adjacency_list(stop_to_route_mapping)
     assert actual == expected
+
+
+def test_graphs_are_rebuilt_when_the_source_changes(
+    fake_mbta: FakeMbtaServer, tmp_path: Path
+) -> None:
+    mbta_client.clear_caches()
+    from_api = get_subway_transit_graph()
+    assert "Mattapan" in from_api.route_ids
+
+    # a feed of the system without the Mattapan Trolley
+    routes = {k: v for k, v in SMALL_SYSTEM_ROUTES.items() if k != "Mattapan"}
+    feed = write_feed(FakeMbtaSystem(routes, SMALL_SYSTEM_STOPS), tmp_path / "gtfs.zip")
+    mbta_client.configure_gtfs_feed(feed)
+    try:
+        from_feed = get_subway_transit_graph()
+        assert from_feed is not from_api
+        assert "Mattapan" not in from_feed.route_ids
+        assert "Mattapan Trolley" not in get_subway_stop_graph().route_names
+    finally:
+        mbta_client.configure_gtfs_feed(None)
+
+    assert "Mattapan" in get_subway_transit_graph().route_ids
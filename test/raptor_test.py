@@ -0,0 +1,164 @@
+import pytest
+
+from gtfs_source import ScheduledTrip
+from helpers import parse_time
+from models import Route, Stop
+from path_finding import find_subway_journeys
+from raptor import Journey, TimedLeg, Timetable
+
+ROUTES = [
+    Route(id="fast", long_name="Fast"),
+    Route(id="link", long_name="Link"),
+    Route(id="slow", long_name="Slow"),
+]
+STOPS = [Stop(id="a", name="A"), Stop(id="b", name="B"), Stop(id="c", name="C")]
+
+
+def _trip(trip_id: str, route_id: str, *calls: tuple[str, str]) -> ScheduledTrip:
+    times = tuple(parse_time(t) for _, t in calls)
+    return ScheduledTrip(
+        trip_id=trip_id,
+        route_id=route_id,
+        stop_ids=tuple(s for s, _ in calls),
+        arrivals=times,
+        departures=times,
+    )
+
+
+# the slow route goes straight from a to c, the fast one needs a change at b onto the link
+TRIPS = [
+    _trip("slow-1", "slow", ("a", "8:00"), ("c", "9:00")),
+    _trip("fast-1", "fast", ("a", "8:00"), ("b", "8:10")),
+    _trip("fast-2", "fast", ("a", "8:30"), ("b", "8:40")),
+    _trip("link-1", "link", ("b", "8:11"), ("c", "8:21")),
+    _trip("link-2", "link", ("b", "8:15"), ("c", "8:25")),
+    _trip("link-3", "link", ("b", "8:45"), ("c", "8:55")),
+]
+
+
+def _leg(route: str, board: str, departure: str, alight: str, arrival: str):
+    return TimedLeg(
+        route_id=route,
+        route_name=route.title(),
+        board_stop_id=board,
+        board_stop_name=board.upper(),
+        departure=parse_time(departure),
+        alight_stop_id=alight,
+        alight_stop_name=alight.upper(),
+        arrival=parse_time(arrival),
+    )
+
+
+@pytest.fixture
+def timetable() -> Timetable:
+    return Timetable(ROUTES, STOPS, TRIPS, transfer_seconds=120)
+
+
+@pytest.mark.parametrize(
+    "test_id, depart_at, expected",
+    [
+        (
+            "Should give the direct journey and the faster one with a transfer",
+            "7:55",
+            [
+                Journey(
+                    parse_time("8:00"),
+                    parse_time("9:00"),
+                    [_leg("slow", "a", "8:00", "c", "9:00")],
+                ),
+                Journey(
+                    parse_time("8:00"),
+                    parse_time("8:25"),
+                    [
+                        _leg("fast", "a", "8:00", "b", "8:10"),
+                        _leg("link", "b", "8:15", "c", "8:25"),
+                    ],
+                ),
+            ],
+        ),
+        (
+            "Should board the next trip once the first has left",
+            "8:01",
+            [
+                Journey(
+                    parse_time("8:30"),
+                    parse_time("8:55"),
+                    [
+                        _leg("fast", "a", "8:30", "b", "8:40"),
+                        _leg("link", "b", "8:45", "c", "8:55"),
+                    ],
+                )
+            ],
+        ),
+        ("Should find nothing after the last trip", "8:31", []),
+    ],
+)
+def test_earliest_arrivals(
+    test_id: str, depart_at: str, expected: list[Journey], timetable: Timetable
+) -> None:
+    assert timetable.earliest_arrivals(["a"], ["c"], parse_time(depart_at)) == expected
+
+
+def test_transfers_can_be_capped(timetable: Timetable) -> None:
+    journeys = timetable.earliest_arrivals(["a"], ["c"], parse_time("7:55"), 0)
+    assert [j.transfers for j in journeys] == [0]
+
+
+def test_starting_at_the_end_needs_no_trips(timetable: Timetable) -> None:
+    assert timetable.earliest_arrivals(["a", "b"], ["b"], 100) == [
+        Journey(100, 100, [])
+    ]
+
+
+def test_unserved_stops_are_rejected(timetable: Timetable) -> None:
+    with pytest.raises(ValueError):
+        timetable.earliest_arrivals(["a"], ["nowhere"], 0)
+
+
+def test_express_trips_overtaking_locals_are_boarded() -> None:
+    trips = [
+        _trip("local", "slow", ("a", "8:00"), ("b", "8:30"), ("c", "9:00")),
+        _trip("express", "slow", ("a", "8:05"), ("b", "8:15"), ("c", "8:20")),
+    ]
+    timetable = Timetable(ROUTES, STOPS, trips)
+
+    [journey] = timetable.earliest_arrivals(["a"], ["c"], parse_time("8:00"))
+    assert journey.arrival == parse_time("8:20")
+
+
+def test_journeys_from_a_feed(gtfs_feed) -> None:
+    journeys = find_subway_journeys(
+        ["place-forhl"], ["place-alfcl"], parse_time("6:00")
+    )
+
+    assert [
+        (leg.route_name, leg.board_stop_name, leg.alight_stop_name)
+        for journey in journeys
+        for leg in journey.legs
+    ] == [
+        ("Orange Line", "Forest Hills", "Downtown Crossing"),
+        ("Red Line", "Downtown Crossing", "Alewife"),
+    ]
+    # the next Red Line train after changing at Downtown Crossing is at 6:12
+    assert journeys[0].arrival == parse_time("6:16")
+
+
+def test_cli_prints_journeys(gtfs_feed, capsys) -> None:
+    import main
+
+    args = main.argparse.Namespace(
+        start="forest hills",
+        end="alewife",
+        depart=parse_time("6:00"),
+        date=None,
+        by="routes",
+        graph_snapshot=None,
+    )
+    main.question_3(args)
+
+    assert capsys.readouterr().out.splitlines() == [
+        "Forest Hills to Alewife, leaving from 06:00:",
+        "Arrive at 06:16, 1 transfer(s)",
+        " - 06:00 Orange Line from Forest Hills to Downtown Crossing, arriving 06:02",
+        " - 06:12 Red Line from Downtown Crossing to Alewife, arriving 06:16",
+    ]
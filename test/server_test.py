@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+import requests
+
+import mbta_client
+from fake_mbta_server import FakeMbtaServer
+from server import QueryService, make_server
+from snapshot_cache import SnapshotCache
+
+
+@pytest.fixture
+def service_url(fake_mbta: FakeMbtaServer):
+    service = QueryService(refresh_interval=0)
+    server = make_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_data_is_loaded_once(fake_mbta: FakeMbtaServer, service_url: str) -> None:
+    requests_at_startup = len(fake_mbta.requests)
+    for _ in range(3):
+        requests.get(f"{service_url}/question-1").raise_for_status()
+        requests.get(f"{service_url}/find-path?start=alewife&end=kenmore")
+    assert len(fake_mbta.requests) == requests_at_startup
+
+
+def test_question_1(service_url: str) -> None:
+    response = requests.get(f"{service_url}/question-1")
+    assert response.status_code == 200
+    assert response.json() == {
+        "routes": [
+            "Blue Line",
+            "Green Line B",
+            "Mattapan Trolley",
+            "Orange Line",
+            "Red Line",
+        ]
+    }
+
+
+def test_question_2(service_url: str) -> None:
+    body = requests.get(f"{service_url}/question-2").json()
+    assert body["most_stops"] == {"route": "Red Line", "stops": 5}
+    assert body["least_stops"] == {"route": "Blue Line", "stops": 2}
+    assert {"stop": "Downtown Crossing", "routes": ["Orange Line", "Red Line"]} in body[
+        "multi_route_stops"
+    ]
+
+
+@pytest.mark.parametrize(
+    ("test_id", "query", "expected_status", "expected_path"),
+    [
+        (
+            "should find a path",
+            "start=mattapan&end=kenmore",
+            200,
+            ["Mattapan Trolley", "Red Line", "Orange Line", "Green Line B"],
+        ),
+        ("should 404 on unknown stops", "start=nowhere&end=kenmore", 404, None),
+        ("should 400 on missing stops", "start=kenmore", 400, None),
+    ],
+)
+def test_find_path(
+    service_url: str,
+    test_id: str,
+    query: str,
+    expected_status: int,
+    expected_path: list[str] | None,
+) -> None:
+    response = requests.get(f"{service_url}/find-path?{query}")
+    assert response.status_code == expected_status
+    assert response.json().get("path") == expected_path
+
+
+def test_concurrent_requests_and_latency_metrics(service_url: str) -> None:
+    def query(_: int) -> int:
+        return requests.get(
+            f"{service_url}/find-path?start=alewife&end=wonderland"
+        ).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(query, range(40)))
+    assert statuses == [200] * 40
+
+    latency = requests.get(f"{service_url}/metrics").json()["latency"]["/find-path"]
+    assert latency["count"] == 40
+    assert 0 < latency["p50_ms"] <= latency["p99_ms"]
+
+
+@pytest.mark.parametrize(
+    ("test_id", "use_snapshot_cache"),
+    [
+        ("should reload from the API", False),
+        ("should revalidate fresh snapshots", True),
+    ],
+)
+def test_refresh_swaps_in_new_data(
+    fake_mbta: FakeMbtaServer,
+    tmp_path: Path,
+    monkeypatch,
+    test_id: str,
+    use_snapshot_cache: bool,
+) -> None:
+    if use_snapshot_cache:
+        # snapshots that are still fresh when the refresh comes
+        mbta_client.configure_snapshot_cache(SnapshotCache(tmp_path))
+    service = QueryService(refresh_interval=0)
+    monkeypatch.setitem(
+        fake_mbta.system.routes, "Silver", ("Silver Line", [["place-state"]])
+    )
+    assert "Silver Line" not in service.question_1()["routes"]
+
+    service.refresh()
+    assert "Silver Line" in service.question_1()["routes"]
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import pytest
+
+from fake_clock import FakeClock
+from snapshot_cache import (
+    SNAPSHOT_FORMAT_VERSION,
+    SnapshotCache,
+    SnapshotUnavailableError,
+)
+
+DOCUMENT = {"data": [{"id": "Red", "attributes": {"long_name": "Red Line"}}]}
+
+
+def test_key_is_stable_regardless_of_param_order() -> None:
+    key_1 = SnapshotCache.key_for("/routes", {"a": "1", "b": "2"})
+    key_2 = SnapshotCache.key_for("/routes", {"b": "2", "a": "1"})
+    assert key_1 == key_2
+    assert key_1 != SnapshotCache.key_for("/stops", {"a": "1", "b": "2"})
+
+
+@pytest.mark.parametrize(
+    ("test_id", "elapsed", "offline", "refresh", "expected"),
+    [
+        ("should serve a fresh snapshot", 10, False, False, DOCUMENT),
+        ("should not serve an expired snapshot", 100, False, False, None),
+        ("should serve an expired snapshot when offline", 100, True, False, DOCUMENT),
+        ("should skip the snapshot when refreshing", 10, False, True, None),
+    ],
+)
+def test_load(
+    tmp_path: Path,
+    test_id: str,
+    elapsed: float,
+    offline: bool,
+    refresh: bool,
+    expected: dict | None,
+) -> None:
+    clock = FakeClock()
+    SnapshotCache(tmp_path, ttl_seconds=50, clock=clock).store("key", DOCUMENT)
+    clock.now += elapsed
+
+    cache = SnapshotCache(
+        tmp_path, ttl_seconds=50, offline=offline, refresh=refresh, clock=clock
+    )
+    assert cache.load("key") == expected
+
+
+def test_expired_snapshots_are_loaded_once_stored_again(tmp_path: Path) -> None:
+    validators = {"If-None-Match": '"1"'}
+    cache = SnapshotCache(tmp_path)
+    cache.store("key", DOCUMENT, validators)
+    cache.store("other", DOCUMENT)
+
+    cache.expire()
+    assert cache.load("key") is None
+    assert cache.load_for_revalidation("key") == (DOCUMENT, validators)
+    cache.store("key", DOCUMENT)
+    assert cache.load("key") == DOCUMENT
+    assert cache.load("other") is None
+
+    # offline, snapshots are served whatever their age
+    offline = SnapshotCache(tmp_path, offline=True)
+    offline.expire()
+    assert offline.load("other") == DOCUMENT
+
+
+def test_offline_miss_raises(tmp_path: Path) -> None:
+    with pytest.raises(SnapshotUnavailableError):
+        SnapshotCache(tmp_path, offline=True).load("missing")
+
+
+def test_other_versions_are_ignored(tmp_path: Path) -> None:
+    cache = SnapshotCache(tmp_path)
+    cache.store("key", DOCUMENT)
+    (tmp_path / "key.json").write_text(
+        f'{{"version": {SNAPSHOT_FORMAT_VERSION + 1}, "created_at": 0, "document": {{}}}}'
+    )
+    assert cache.load("key") is None
+
+
+def test_store_leaves_no_temp_files(tmp_path: Path) -> None:
+    cache = SnapshotCache(tmp_path)
+    cache.store("key", DOCUMENT)
+    cache.store("key", DOCUMENT)
+    assert [p.name for p in tmp_path.iterdir()] == ["key.json"]
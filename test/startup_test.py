@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import mbta_client
+from fake_mbta_server import FakeMbtaServer
+from snapshot_cache import SnapshotCache
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+# slow to import and only needed by some commands, or on a cold start
+HEAVY_MODULES = ["requests", "dotenv", "http.server", "concurrent.futures", "cProfile"]
+
+# runs main.py with the given args, then reports which of the heavy modules it imported on the last line of stderr
+RUN_MAIN = f"""
+import runpy, sys
+sys.argv = ["main.py", *sys.argv[1:]]
+try:
+    runpy.run_path("main.py", run_name="__main__")
+finally:
+    print([m for m in {HEAVY_MODULES!r} if m in sys.modules], file=sys.stderr)
+"""
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=SRC_DIR,
+        env={**os.environ, "MBTA_API_BASE_URL": "http://127.0.0.1:9"},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+@pytest.mark.parametrize(
+    "test_id, module",
+    [
+        ("main", "main"),
+        ("mbta_client", "mbta_client"),
+        ("path_finding", "path_finding"),
+    ],
+)
+def test_import_has_no_side_effects(test_id: str, module: str) -> None:
+    result = _python(
+        "-c",
+        f"import sys, {module}; print([m for m in {HEAVY_MODULES!r} if m in sys.modules])",
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "[]\n"
+    assert result.stderr == ""
+
+
+def test_warm_start_only_imports_what_it_needs(
+    fake_mbta: FakeMbtaServer, tmp_path: Path
+) -> None:
+    mbta_client.clear_caches()
+    mbta_client.configure_snapshot_cache(SnapshotCache(tmp_path))
+    mbta_client.get_subway_routes()
+    mbta_client.clear_caches()
+
+    result = _python(
+        "-c", RUN_MAIN, "--offline", "--cache-dir", str(tmp_path), "question-1"
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "Red Line" in result.stdout
+    assert result.stderr == "[]\n"
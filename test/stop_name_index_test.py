@@ -0,0 +1,89 @@
+import pytest
+
+from models import Stop
+from stop_name_index import StopNameIndex, UnknownStopError, normalize_stop_name
+
+STOPS = [
+    Stop(id="place-pktrm", name="Park Street"),
+    Stop(id="place-harsq", name="Harvard"),
+    Stop(id="place-hwsst", name="Harvard"),  # shared name, e.g. a bus and a subway stop
+    Stop(id="place-harvd", name="Harvard Avenue"),
+    Stop(id="place-forhl", name="Forest Hills"),
+    Stop(id="place-sougr", name="South Street"),
+    Stop(id="place-stpul", name="Saint Paul Street"),
+    Stop(id="place-cntsq", name="Central"),
+    Stop(id="place-kencl", name="Kenmore"),
+]
+
+
+@pytest.fixture
+def index() -> StopNameIndex:
+    return StopNameIndex(STOPS)
+
+
+@pytest.mark.parametrize(
+    ("test_id", "name", "expected"),
+    [
+        ("should lowercase and trim", "  PARK street ", "park street"),
+        ("should expand abbreviations", "Park St.", "park street"),
+        ("should treat a leading st as saint", "St. Paul St", "saint paul street"),
+        ("should drop apostrophes", "Saint Mary's Street", "saint marys street"),
+        ("should collapse punctuation", "JFK/UMass", "jfk umass"),
+    ],
+)
+def test_normalize_stop_name(test_id: str, name: str, expected: str) -> None:
+    assert normalize_stop_name(name) == expected
+
+
+@pytest.mark.parametrize(
+    ("test_id", "name", "expected"),
+    [
+        ("should resolve an exact name", "Kenmore", ["place-kencl"]),
+        ("should resolve a normalized name", "park st", ["place-pktrm"]),
+        (
+            "should keep every stop sharing a name",
+            "harvard",
+            ["place-harsq", "place-hwsst"],
+        ),
+        ("should resolve an unambiguous prefix", "forest", ["place-forhl"]),
+        ("should not resolve an ambiguous prefix", "harv", []),
+        ("should not guess at typos", "Kenmoor", []),
+        ("should not resolve an empty name", "  ", []),
+    ],
+)
+def test_resolve(
+    index: StopNameIndex, test_id: str, name: str, expected: list[str]
+) -> None:
+    assert index.resolve(name) == expected
+
+
+def test_complete(index: StopNameIndex) -> None:
+    assert index.complete("harv") == ["Harvard", "Harvard Avenue"]
+    assert index.complete("s", limit=1) == ["Saint Paul Street"]
+
+
+@pytest.mark.parametrize(
+    ("test_id", "name", "expected_first"),
+    [
+        ("should correct a typo", "Kenmoor", "Kenmore"),
+        ("should correct a dropped letter", "Forst Hills", "Forest Hills"),
+        ("should rank completions first", "harv", "Harvard"),
+    ],
+)
+def test_suggest(
+    index: StopNameIndex, test_id: str, name: str, expected_first: str
+) -> None:
+    assert index.suggest(name)[0] == expected_first
+
+
+def test_suggest_nothing_similar(index: StopNameIndex) -> None:
+    assert index.suggest("xyz") == []
+
+
+def test_resolve_pair_reports_every_unknown_name(index: StopNameIndex) -> None:
+    with pytest.raises(UnknownStopError) as exc_info:
+        index.resolve_pair("Kenmoor", "xyz")
+
+    assert list(exc_info.value.suggestions) == ["Kenmoor", "xyz"]
+    assert exc_info.value.suggestions["Kenmoor"][0] == "Kenmore"
+    assert "did you mean Kenmore" in str(exc_info.value)
@@ -0,0 +1,125 @@
+import pytest
+
+from models import Route, RoutePattern, Stop
+from stop_routing import StopGraph
+
+ROUTES = [
+    Route(id="Red", long_name="Red Line"),
+    Route(id="Orange", long_name="Orange Line"),
+    Route(id="Green", long_name="Green Line"),
+    Route(id="Blue", long_name="Blue Line"),
+]
+STOPS = [Stop(id=s, name=s.upper()) for s in "abcdefghxyz"]
+
+
+def _both_directions(route_id: str, stop_ids: str) -> list[RoutePattern]:
+    return [
+        RoutePattern(route_id=route_id, direction_id=0, stop_ids=tuple(stop_ids)),
+        RoutePattern(route_id=route_id, direction_id=1, stop_ids=tuple(stop_ids[::-1])),
+    ]
+
+
+# Red:    a - b - c - d - e - f
+# Orange:     b - g - h - e
+# Green:          g ------- x
+# Blue:                         y - z
+PATTERNS = [
+    *_both_directions("Red", "abcdef"),
+    *_both_directions("Orange", "bghe"),
+    *_both_directions("Green", "gx"),
+    *_both_directions("Blue", "yz"),
+]
+
+
+@pytest.fixture
+def graph() -> StopGraph:
+    return StopGraph(ROUTES, STOPS, PATTERNS)
+
+
+def _summary(itinerary) -> list[tuple[str, str, str, int]]:
+    return [
+        (leg.route_name, leg.board_stop_id, leg.alight_stop_id, leg.stops)
+        for leg in itinerary.legs
+    ]
+
+
+@pytest.mark.parametrize(
+    ("test_id", "start", "end", "objective", "expected"),
+    [
+        (
+            "should ride a single route",
+            "a",
+            "d",
+            "stops",
+            [("Red Line", "a", "d", 3)],
+        ),
+        (
+            "should ride against the pattern order using the other direction",
+            "f",
+            "c",
+            "stops",
+            [("Red Line", "f", "c", 3)],
+        ),
+        (
+            "should report the transfer stop",
+            "a",
+            "x",
+            "stops",
+            [
+                ("Red Line", "a", "b", 1),
+                ("Orange Line", "b", "g", 1),
+                ("Green Line", "g", "x", 1),
+            ],
+        ),
+        (
+            "should prefer fewer stops even with a transfer",
+            "b",
+            "h",
+            "stops",
+            [("Orange Line", "b", "h", 2)],
+        ),
+    ],
+)
+def test_find_itinerary(
+    graph: StopGraph,
+    test_id: str,
+    start: str,
+    end: str,
+    objective: str,
+    expected: list[tuple[str, str, str, int]],
+) -> None:
+    assert _summary(graph.find_itinerary([start], [end], objective)) == expected
+
+
+def test_objectives_trade_off_stops_and_transfers() -> None:
+    # Red is a long way round from a to f, Orange + Green is a shortcut with a transfer at x
+    graph = StopGraph(
+        ROUTES,
+        STOPS,
+        [
+            *_both_directions("Red", "abcdef"),
+            *_both_directions("Orange", "ax"),
+            *_both_directions("Green", "xf"),
+        ],
+    )
+
+    fewest_stops = graph.find_itinerary(["a"], ["f"], "stops")
+    assert (fewest_stops.stops, fewest_stops.transfers) == (2, 1)
+    assert fewest_stops.transfer_stop_ids == ["x"]
+
+    fewest_transfers = graph.find_itinerary(["a"], ["f"], "transfers")
+    assert (fewest_transfers.stops, fewest_transfers.transfers) == (5, 0)
+
+
+def test_find_itinerary_edge_cases(graph: StopGraph) -> None:
+    assert graph.find_itinerary(["a"], ["a"]).legs == []
+    assert graph.find_itinerary(["a"], ["z"]) is None
+    with pytest.raises(ValueError):
+        graph.find_itinerary(["unknown"], ["a"])
+    with pytest.raises(ValueError):
+        graph.find_itinerary(["a"], ["b"], objective="fastest")
+
+
+def test_multiple_start_stops(graph: StopGraph) -> None:
+    itinerary = graph.find_itinerary(["a", "g"], ["x"])
+    assert _summary(itinerary) == [("Green Line", "g", "x", 1)]
@@ -0,0 +1,203 @@
+import pytest
+
+from models import Route, Stop
+from transit_graph import TransitGraph
+
+RED = Route(id="Red", long_name="Red Line")
+ORANGE = Route(id="Orange", long_name="Orange Line")
+GREEN = Route(id="Green-B", long_name="Green Line B")
+BLUE = Route(id="Blue", long_name="Blue Line")
+MATTAPAN = Route(id="Mattapan", long_name="Mattapan Trolley")
+
+# Mattapan - Red - Orange - Green, Blue is on its own
+STOP_TO_ROUTES = {
+    Stop(id="mattapan", name="Mattapan"): {MATTAPAN},
+    Stop(id="ashmont", name="Ashmont"): {RED, MATTAPAN},
+    Stop(id="dtx", name="Downtown Crossing"): {RED, ORANGE},
+    Stop(id="haymarket", name="Haymarket"): {ORANGE, GREEN},
+    Stop(id="forest_hills", name="Forest Hills"): {ORANGE},
+    Stop(id="kenmore", name="Kenmore"): {GREEN},
+    Stop(id="wonderland", name="Wonderland"): {BLUE},
+}
+
+
+@pytest.fixture
+def graph() -> TransitGraph:
+    return TransitGraph.from_stop_to_routes_mapping(STOP_TO_ROUTES)
+
+
+def test_ids_are_interned_in_sorted_order(graph: TransitGraph) -> None:
+    assert graph.route_ids == ["Blue", "Green-B", "Mattapan", "Orange", "Red"]
+    assert graph.routes_for_stop("dtx") == ["Orange", "Red"]
+    assert graph.routes_for_stop("unknown") == []
+
+
+def test_route_adjacency(graph: TransitGraph) -> None:
+    adjacency = {
+        graph.route_ids[r]: {
+            graph.route_ids[q]
+            for q in range(len(graph.route_ids))
+            if graph.route_adjacency[r] >> q & 1
+        }
+        for r in range(len(graph.route_ids))
+    }
+    assert adjacency == {
+        "Blue": set(),
+        "Green-B": {"Orange"},
+        "Mattapan": {"Red"},
+        "Orange": {"Green-B", "Red"},
+        "Red": {"Mattapan", "Orange"},
+    }
+
+
+@pytest.mark.parametrize(
+    ("test_id", "start", "end", "expected"),
+    [
+        (
+            "should return a single route when both stops share one",
+            "forest_hills",
+            "haymarket",
+            ["Orange Line"],
+        ),
+        (
+            "should not transfer when the start stop is served by several routes",
+            "dtx",
+            "forest_hills",
+            ["Orange Line"],
+        ),
+        (
+            "should find a path across several transfers",
+            "mattapan",
+            "kenmore",
+            ["Mattapan Trolley", "Red Line", "Orange Line", "Green Line B"],
+        ),
+        ("should return None if no path exists", "kenmore", "wonderland", None),
+    ],
+)
+def test_find_path(
+    graph: TransitGraph,
+    test_id: str,
+    start: str,
+    end: str,
+    expected: list[str] | None,
+) -> None:
+    assert graph.find_path(start, end) == expected
+
+
+def test_find_path_with_unknown_stop_raises(graph: TransitGraph) -> None:
+    with pytest.raises(ValueError):
+        graph.find_path("unknown", "kenmore")
+
+
+def test_transfer_table_agrees_with_search(graph: TransitGraph) -> None:
+    pairs = [(s, e) for s in graph.stop_ids for e in graph.stop_ids]
+    expected = {pair: graph.min_transfers(*pair) for pair in pairs}
+
+    graph.precompute_transfers()
+    assert {pair: graph.min_transfers(*pair) for pair in pairs} == expected
+    assert graph.find_path("mattapan", "kenmore") == [
+        "Mattapan Trolley",
+        "Red Line",
+        "Orange Line",
+        "Green Line B",
+    ]
+    assert graph.find_path("kenmore", "wonderland") is None
+
+
+def test_transfer_table_lookup(graph: TransitGraph) -> None:
+    table = graph.precompute_transfers()
+    red, green = graph.route_index["Red"], graph.route_index["Green-B"]
+    assert table.distances[red * table.size + green] == 2
+    assert [graph.route_ids[r] for r in table.path(red, green)] == [
+        "Red",
+        "Orange",
+        "Green-B",
+    ]
+
+
+# Red and Blue are both connected to Orange and Green, which are connected to each other
+DIAMOND = {
+    Stop(id="alewife", name="Alewife"): {RED},
+    Stop(id="dtx", name="Downtown Crossing"): {RED, ORANGE},
+    Stop(id="park", name="Park Street"): {RED, GREEN},
+    Stop(id="haymarket", name="Haymarket"): {ORANGE, GREEN},
+    Stop(id="state", name="State"): {ORANGE, BLUE},
+    Stop(id="government", name="Government Center"): {GREEN, BLUE},
+    Stop(id="wonderland", name="Wonderland"): {BLUE},
+}
+
+
+@pytest.mark.parametrize(
+    ("test_id", "kwargs", "expected"),
+    [
+        (
+            "should list every path, fewest transfers first",
+            {},
+            [
+                ["Red Line", "Green Line B", "Blue Line"],
+                ["Red Line", "Orange Line", "Blue Line"],
+                ["Red Line", "Green Line B", "Orange Line", "Blue Line"],
+                ["Red Line", "Orange Line", "Green Line B", "Blue Line"],
+            ],
+        ),
+        (
+            "should stop at the limit",
+            {"limit": 3},
+            [
+                ["Red Line", "Green Line B", "Blue Line"],
+                ["Red Line", "Orange Line", "Blue Line"],
+                ["Red Line", "Green Line B", "Orange Line", "Blue Line"],
+            ],
+        ),
+        (
+            "should only list the paths with the fewest transfers",
+            {"minimal_only": True},
+            [
+                ["Red Line", "Green Line B", "Blue Line"],
+                ["Red Line", "Orange Line", "Blue Line"],
+            ],
+        ),
+        (
+            "should avoid routes by id or name",
+            {"avoid_routes": ["green-b"]},
+            [["Red Line", "Orange Line", "Blue Line"]],
+        ),
+        (
+            "should return nothing when the avoided routes disconnect the stops",
+            {"avoid_routes": ["Orange Line", "Green-B"]},
+            [],
+        ),
+    ],
+)
+def test_find_paths_between(test_id: str, kwargs: dict, expected: list) -> None:
+    graph = TransitGraph.from_stop_to_routes_mapping(DIAMOND)
+
+    assert graph.find_paths_between(["alewife"], ["wonderland"], **kwargs) == expected
+
+
+def test_find_paths_between_does_not_reboard_start_or_end_routes() -> None:
+    graph = TransitGraph.from_stop_to_routes_mapping(DIAMOND)
+
+    # both Red and Orange serve Downtown Crossing, so no path starts on one and transfers to the other
+    assert graph.find_paths_between(["dtx"], ["government"]) == [
+        ["Orange Line", "Blue Line"],
+        ["Orange Line", "Green Line B"],
+        ["Red Line", "Green Line B"],
+    ]
+
+
+def test_find_paths_between_agrees_with_find_path(graph: TransitGraph) -> None:
+    for start in graph.stop_ids:
+        for end in graph.stop_ids:
+            paths = graph.find_paths_between([start], [end], minimal_only=True)
+            shortest = graph.find_path(start, end)
+            if shortest is None:
+                assert paths == []
+            else:
+                assert shortest in paths
+                assert {len(p) for p in paths} == {len(shortest)}
+
+
+def test_find_paths_between_with_unknown_route_raises(graph: TransitGraph) -> None:
+    with pytest.raises(ValueError, match="Purple"):
+        graph.find_paths_between(["dtx"], ["kenmore"], avoid_routes=["Purple"])
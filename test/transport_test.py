@@ -0,0 +1,116 @@
+import pytest
+import requests
+
+from fake_clock import FakeClock
+from fake_mbta_server import FakeMbtaServer
+from transport import MbtaTransport, validators_for
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+def _transport(clock: FakeClock, **kwargs) -> MbtaTransport:
+    return MbtaTransport(
+        clock=clock,
+        sleep=clock.sleep,
+        jitter=lambda low, high: high,  # the worst case, so delays are predictable
+        **kwargs,
+    )
+
+
+@pytest.mark.parametrize(
+    ("test_id", "failures", "expected_statuses", "expected_sleeps"),
+    [
+        ("should not retry a success", [], [200], []),
+        ("should retry server errors", [503, 500], [503, 500, 200], [0.5, 1.0]),
+        ("should retry a 429", [429], [429, 200], [0.5]),
+        ("should not retry a 404", [404], [404], []),
+        (
+            "should give up after the max retries",
+            [503, 503, 503, 503],
+            [503, 503, 503, 503],
+            [0.5, 1.0, 2.0],
+        ),
+    ],
+)
+def test_retries(
+    fake_mbta: FakeMbtaServer,
+    clock: FakeClock,
+    test_id: str,
+    failures: list[int],
+    expected_statuses: list[int],
+    expected_sleeps: list[float],
+) -> None:
+    fake_mbta.failures.extend(failures)
+
+    response = _transport(clock).get(f"{fake_mbta.url}/routes")
+
+    assert response.status_code == expected_statuses[-1]
+    assert fake_mbta.statuses == expected_statuses
+    assert clock.sleeps == expected_sleeps
+
+
+def test_backoff_is_capped(clock: FakeClock) -> None:
+    transport = _transport(clock, max_backoff_seconds=3)
+    assert [transport._backoff(attempt) for attempt in range(5)] == [
+        0.5,
+        1.0,
+        2.0,
+        3,
+        3,
+    ]
+
+
+def test_connection_errors_are_retried_then_raised(clock: FakeClock) -> None:
+    transport = _transport(clock, max_retries=2)
+    with pytest.raises(requests.ConnectionError):
+        # nothing listens on port 9 (discard) locally
+        transport.get("http://127.0.0.1:9/routes")
+    assert clock.sleeps == [0.5, 1.0]
+
+
+def test_throttles_when_the_quota_runs_low(
+    fake_mbta: FakeMbtaServer, clock: FakeClock
+) -> None:
+    transport = _transport(clock, throttle_threshold=5)
+    fake_mbta.headers = {
+        "x-ratelimit-remaining": "3",
+        "x-ratelimit-reset": str(clock.now + 8),
+    }
+
+    transport.get(f"{fake_mbta.url}/routes")
+    assert clock.sleeps == []
+
+    # 3 requests left over the next 8 seconds, so 1 every 2 seconds
+    for _ in range(3):
+        transport.get(f"{fake_mbta.url}/routes")
+    assert clock.sleeps == [2.0, 2.0]
+
+
+def test_waits_for_the_reset_once_the_quota_is_used_up(
+    fake_mbta: FakeMbtaServer, clock: FakeClock
+) -> None:
+    transport = _transport(clock)
+    fake_mbta.headers = {
+        "x-ratelimit-remaining": "0",
+        "x-ratelimit-reset": str(clock.now + 30),
+    }
+
+    transport.get(f"{fake_mbta.url}/routes")
+    transport.get(f"{fake_mbta.url}/routes")
+
+    assert clock.sleeps == [30]
+
+
+def test_conditional_requests(fake_mbta: FakeMbtaServer, clock: FakeClock) -> None:
+    transport = _transport(clock)
+    response = transport.get(f"{fake_mbta.url}/routes")
+    validators = validators_for(response)
+    assert "etag" in validators
+
+    revalidated = transport.get(f"{fake_mbta.url}/routes", validators=validators)
+
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""